@@ -0,0 +1,9 @@
+"""Benchmarking of the data file engine.
+
+* `generate`: synthetic Netrics data files, in either the local or the
+  S3 layout
+* `scenario`: timed (cold and warm) queries of the dashboard API
+
+See also the command: `bench`.
+
+"""
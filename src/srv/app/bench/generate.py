@@ -0,0 +1,191 @@
+"""Generation of synthetic Netrics data files.
+
+Data files resemble those written by Netrics measurements -- ping,
+Ookla and ndt7 -- each a JSON object of `Measurements` (under the
+measurement's topic) and of `Meta` (including the measurement `Time`).
+
+Files are laid out either as by a local Netrics installation (see:
+`write_local`) or as by the Netrics S3 data store (see: `write_s3`).
+
+"""
+import datetime
+import json
+import random
+
+
+ONE_DAY_S = 60 * 60 * 24
+
+PING_TARGETS = ('google', 'amazon', 'wikipedia', 'facebook', 'youtube', 'netflix', 'tiktok')
+
+PING_STATS = ('rtt_min_ms', 'rtt_max_ms', 'rtt_avg_ms', 'rtt_mdev_ms', 'packet_loss_pct')
+
+DEVICE_ID = 'dd1c2a4b'
+
+#
+# default seconds between measurements of each kind
+#
+INTERVALS = {
+    'ping': 300,
+    'ookla': 3600 * 2,
+    'ndt7': 3600 * 2,
+}
+
+
+def make_meta(timestamp, rng=random):
+    return {
+        'Id': DEVICE_ID,
+        'Time': timestamp + rng.random(),
+    }
+
+
+def make_ping(timestamp, rng=random):
+    return {
+        'Measurements': {
+            'ping_latency': {
+                f'{target}_{stat}': (
+                    rng.choice((0.0, 0.0, 0.0, 10.0)) if stat == 'packet_loss_pct'
+                    else round(rng.uniform(5, 80), 3)
+                )
+                for target in PING_TARGETS
+                for stat in PING_STATS
+            },
+        },
+        'Meta': make_meta(timestamp, rng),
+    }
+
+
+def make_ookla(timestamp, rng=random):
+    return {
+        'Measurements': {
+            'ookla': {
+                'speedtest_ookla_download': round(rng.uniform(50, 900), 3),
+                'speedtest_ookla_upload': round(rng.uniform(5, 40), 3),
+                'speedtest_ookla_jitter': round(rng.uniform(0, 5), 3),
+                'speedtest_ookla_latency': round(rng.uniform(5, 30), 3),
+                'speedtest_ookla_pktloss2': 0.0,
+                'speedtest_ookla_downloadlatency': round(rng.uniform(10, 200), 3),
+                'speedtest_ookla_uploadlatency': round(rng.uniform(10, 200), 3),
+                'server': {
+                    'id': rng.randint(1000, 60000),
+                    'host': 'speedtest.example.net',
+                    'port': 8080,
+                    'name': 'Example ISP',
+                    'location': 'Chicago, IL',
+                    'country': 'United States',
+                    'ip': '192.0.2.1',
+                },
+                'result_url': 'https://www.speedtest.net/result/c/00000000-0000-0000-0000',
+                'interface': {
+                    'internalIp': '10.0.0.2',
+                    'name': 'eth0',
+                    'macAddr': '00:00:5E:00:53:AF',
+                    'isVpn': False,
+                    'externalIp': '198.51.100.2',
+                },
+            },
+        },
+        'Meta': make_meta(timestamp, rng),
+    }
+
+
+def make_ndt7(timestamp, rng=random):
+    return {
+        'Measurements': {
+            'ndt7': {
+                'speedtest_ndt7_download': round(rng.uniform(50, 900), 3),
+                'speedtest_ndt7_upload': round(rng.uniform(5, 40), 3),
+                'speedtest_ndt7_downloadretrans': round(rng.uniform(0, 2), 3),
+                'speedtest_ndt7_downloadlatency': round(rng.uniform(5, 30), 3),
+                'speedtest_ndt7_server': 'ndt-mlab1-ord06.mlab-oti.measurement-lab.org',
+            },
+        },
+        'Meta': make_meta(timestamp, rng),
+    }
+
+
+MAKERS = {
+    'ping': make_ping,
+    'ookla': make_ookla,
+    'ndt7': make_ndt7,
+}
+
+
+def iter_samples(*, now, days, intervals=INTERVALS, seed=0):
+    """Generate `(timestamp, kind, data)` for the data files of the
+    `days` preceding `now`, in ascending time order.
+
+    Measurements of each kind are spaced by their `intervals` (seconds);
+    the random contents of data files are determined by `seed`.
+
+    """
+    rng = random.Random(seed)
+    start = int(now) - days * ONE_DAY_S
+
+    schedule = sorted(
+        (timestamp, kind)
+        for (kind, interval) in intervals.items()
+        # stagger kinds such that timestamps (and file names) are distinct
+        for timestamp in range(start + list(MAKERS).index(kind) + 1, int(now), interval)
+    )
+
+    for (timestamp, kind) in schedule:
+        yield (timestamp, kind, MAKERS[kind](timestamp, rng))
+
+
+def get_file_name(timestamp, kind):
+    return f'result-{timestamp}-{kind}.json'
+
+
+def write_local(target, samples, *, now, pending_s=3600):
+    """Write data files to directories `pending` and `archive` under
+    `target` -- as by a local Netrics installation.
+
+    Files of the past `pending_s` seconds are written to `pending`.
+
+    Returns the count of files written.
+
+    """
+    pending = target / 'pending'
+    archive = target / 'archive'
+
+    pending.mkdir(parents=True, exist_ok=True)
+    archive.mkdir(parents=True, exist_ok=True)
+
+    count = 0
+
+    for (count, (timestamp, kind, data)) in enumerate(samples, 1):
+        directory = pending if now - timestamp < pending_s else archive
+        (directory / get_file_name(timestamp, kind)).write_text(json.dumps(data))
+
+    return count
+
+
+def write_s3(target,
+             samples,
+             *,
+             device_id=DEVICE_ID,
+             experiment='netrics',
+             topic='measurements',
+             cohort='nm'):
+    """Write data files under `target` according to the layout of the
+    Netrics S3 data store:
+
+        {experiment}/{topic}/{cohort}-{device_id}/{date}/json/{file name}
+
+    (The resulting tree may then be uploaded to a bucket, *e.g.* via
+    `aws s3 sync`.)
+
+    Returns the count of files written.
+
+    """
+    device_path = target / experiment / topic / f'{cohort}-{device_id}'
+
+    count = 0
+
+    for (count, (timestamp, kind, data)) in enumerate(samples, 1):
+        date = datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).date()
+        data_dir = device_path / date.strftime('%Y%m%d') / 'json'
+        data_dir.mkdir(parents=True, exist_ok=True)
+        (data_dir / get_file_name(timestamp, kind)).write_text(json.dumps(data))
+
+    return count
@@ -0,0 +1,140 @@
+"""Timed listings of a device's data files in S3.
+
+Each engine walks the device's full tree of data files -- experiments,
+topics, device directories, date directories and their data files --
+sequentially and without caching:
+
+* `selector`: by way of s3path (`iterdir` and `glob`), as the S3
+  backend previously listed data files; and,
+
+* `lister`: by way of raw `list_objects_v2` requests (see `S3Lister`).
+
+The S3 bucket is configured as for the server (*e.g.* via
+DATAFILE_S3_BUCKET and DATAFILE_S3_BASE).
+
+"""
+import platform
+import statistics
+import threading
+import time
+
+from app import conf
+
+
+ENGINES = ('selector', 'lister')
+
+DATE_GLOB = '[0-9]' * 8
+
+
+def walk_selector(bucket_path, device_id):
+    """List the keys of the device's data files via s3path."""
+    keys = []
+
+    for experiment_path in bucket_path.iterdir():
+        for topic_path in experiment_path.iterdir():
+            for device_path in topic_path.glob(f'*-{device_id}'):
+                for date_path in device_path.glob(DATE_GLOB):
+                    keys.extend(str(path) for path in (date_path / 'json').iterdir())
+
+    return keys
+
+
+def walk_lister(lister, bucket, prefix, device_id):
+    """List the keys of the device's data files via `lister`."""
+    keys = []
+
+    for experiment in lister.list_dirs(bucket, prefix):
+        experiment_prefix = f'{prefix}{experiment}/'
+
+        for topic in lister.list_dirs(bucket, experiment_prefix):
+            topic_prefix = f'{experiment_prefix}{topic}/'
+
+            for device in lister.list_dirs(bucket, topic_prefix):
+                if not device.endswith(f'-{device_id}'):
+                    continue
+
+                device_prefix = f'{topic_prefix}{device}/'
+
+                for date in lister.list_dirs(bucket, device_prefix):
+                    if len(date) == 8 and date.isdigit():
+                        keys.extend(lister.list_keys(bucket, f'{device_prefix}{date}/json/'))
+
+    return keys
+
+
+class RequestCounter:
+    """Count the list_objects_v2 requests of a boto3 `client`."""
+
+    def __init__(self, client):
+        self.count = 0
+        self.lock = threading.Lock()
+
+        client.meta.events.register('before-call.s3.ListObjectsV2', self)
+
+    def __call__(self, **_kwargs):
+        with self.lock:
+            self.count += 1
+
+
+def time_engine(walk, counter, repeat):
+    timings = []
+
+    for _count in range(repeat):
+        requests0 = counter.count
+        time0 = time.perf_counter()
+
+        keys = walk()
+
+        timings.append(time.perf_counter() - time0)
+        requests = counter.count - requests0
+
+    return (sorted(keys), {
+        'keys': len(keys),
+        'requests': requests,
+        'median_s': statistics.median(timings),
+        'min_s': min(timings),
+        'timings_s': timings,
+    })
+
+
+def run(device_id, engines=ENGINES, repeat=5):
+    """Time the listing of the data files of device `device_id` by each
+    of the given `engines`.
+
+    Returns a JSON-serializable report of the results.
+
+    """
+    from app.data.file.s3 import bank
+    from app.data.file.s3.listing import S3Lister
+
+    data_bank = bank.S3DataFileBank(device_id=device_id)
+
+    client = bank.S3_RESOURCE.meta.client
+    counter = RequestCounter(client)
+
+    walks = {
+        'selector': lambda: walk_selector(data_bank.bucket_path, device_id),
+        'lister': lambda: walk_lister(S3Lister(client),
+                                      data_bank.bucket,
+                                      data_bank.base_prefix,
+                                      device_id),
+    }
+
+    results = []
+    listings = []
+
+    for engine in engines:
+        (keys, result) = time_engine(walks[engine], counter, repeat)
+
+        listings.append(keys)
+        results.append({'engine': engine, **result})
+
+    return {
+        'time': time.time(),
+        'version': conf.APP_VERSION,
+        'python': platform.python_version(),
+        'bucket': str(data_bank.bucket_path),
+        'device': device_id,
+        'consistent': all(keys == listings[0] for keys in listings),
+        'results': results,
+    }
@@ -0,0 +1,172 @@
+"""Timed scenarios of the dashboard's data file queries.
+
+Each scenario requests an endpoint of the dashboard API -- by way of the
+app's full WSGI stack -- and is timed either "cold" (following the
+clearing of in-process caches, as upon restart of the server) or "warm"
+(following a first, untimed request).
+
+Persistent stores -- such as the column store, or the S3 get cache on
+disk -- are not cleared.
+
+"""
+import io
+import platform
+import statistics
+import sys
+import time
+
+from app import conf
+
+
+SCENARIOS = {
+    'stats_current': '/stats/current',
+    'stats_week': '/stats/week',
+    'plots_throughput': '/plots/throughput',
+    'plots_latency': '/plots/latency',
+    'trial_stats': '/trial/stats',
+}
+
+MODES = ('cold', 'warm')
+
+
+def clear_caches():
+    """Clear data files' in-process caches."""
+    from app.data import file as datafile
+
+    if datafile.SCAN_PLANNER:
+        datafile.SCAN_PLANNER.clear()
+
+    match conf.DATAFILE_BACKEND:
+        case 'local':
+            from app.data.file import local
+
+            for cached in (local.LocalDataFileBank.sorted_dir,
+                           local.LocalDataFileBank.get_projection_cached):
+                with cached.lock:
+                    cached.cache.clear()
+
+            with local.LocalDataFileBank.merged_listings_lock:
+                local.LocalDataFileBank.merged_listings.clear()
+
+            if local.ROLLING_WINDOWS:
+                local.ROLLING_WINDOWS.clear()
+
+            local.bundle.BUNDLE_READER.clear()
+
+        case 's3':
+            from app.data.file.s3.caching import CachingS3Path
+            from app.data.file.s3.index import DeviceKeyIndex
+            from app.lib.cache import MemoryCache
+
+            if isinstance(CachingS3Path._list_cache_, MemoryCache):
+                CachingS3Path._list_cache_.clear()
+
+            DeviceKeyIndex.clear()
+
+
+def request(app, path, query=''):
+    """Request `path` of the WSGI `app`.
+
+    Returns the response status and body size.
+
+    """
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+    status = None
+
+    def start_response(status_line, headers, exc_info=None):
+        nonlocal status
+        status = int(status_line.split()[0])
+
+    body = app(environ, start_response)
+
+    try:
+        size = sum(len(chunk) for chunk in body)
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+    return (status, size)
+
+
+def time_scenario(app, path, mode, repeat):
+    """Time `repeat` requests of `path` in the given `mode`."""
+    timings = []
+    status = size = None
+
+    if mode == 'warm':
+        request(app, path)
+
+    for _round in range(repeat):
+        if mode == 'cold':
+            clear_caches()
+
+        start = time.perf_counter()
+        (status, size) = request(app, path)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        'status': status,
+        'bytes': size,
+        'repeat': repeat,
+        'min_s': min(timings),
+        'median_s': statistics.median(timings),
+        'mean_s': statistics.fmean(timings),
+        'max_s': max(timings),
+    }
+
+
+def run(names=SCENARIOS, modes=MODES, repeat=5, prefix=None):
+    """Run the scenarios of the given `names` in each of the given
+    `modes`.
+
+    Endpoints are requested under the URL path `prefix` -- by default
+    the setting APP_PREFIX. (For the s3 backend, this should include the
+    device ID.)
+
+    Returns a JSON-serializable report of the results.
+
+    """
+    from app.run import wsgi
+
+    if prefix is None:
+        prefix = conf.APP_PREFIX
+
+    prefix = prefix.rstrip('/')
+
+    results = []
+
+    for name in names:
+        path = prefix + SCENARIOS[name]
+
+        for mode in modes:
+            results.append({
+                'scenario': name,
+                'path': path,
+                'mode': mode,
+                **time_scenario(wsgi, path, mode, repeat),
+            })
+
+    return {
+        'time': time.time(),
+        'version': conf.APP_VERSION,
+        'python': platform.python_version(),
+        'backend': conf.DATAFILE_BACKEND,
+        'json_decoder': conf.JSON_DECODER,
+        'results': results,
+    }
@@ -0,0 +1,213 @@
+import json
+import pathlib
+import sys
+import time
+
+from argcmdr import Command
+from loguru import logger as log
+
+from app import conf
+from app.bench import generate, listing, scenario
+
+from .run import Main
+
+
+@Main.register
+class Bench(Command):
+    """benchmark the data file engine"""
+
+    class Generate(Command):
+        """generate synthetic data files"""
+
+        def __init__(self, parser):
+            parser.add_argument(
+                'target',
+                metavar='path',
+                type=pathlib.Path,
+                help="directory to which data files are written",
+            )
+            parser.add_argument(
+                '--layout',
+                choices=('local', 's3'),
+                default='local',
+                help="layout of data files: local pending/archive directories, or "
+                     "S3 experiment/topic/device/date/json prefixes (default: %(default)s)",
+            )
+            parser.add_argument(
+                '--days',
+                default=14,
+                type=int,
+                help="days of measurements to generate (default: %(default)s)",
+            )
+            parser.add_argument(
+                '--interval',
+                action='append',
+                dest='intervals',
+                metavar='KIND=SECONDS',
+                help="seconds between measurements of a kind "
+                     "(default: " + ' '.join(f'{kind}={interval}' for (kind, interval)
+                                             in generate.INTERVALS.items()) + ")",
+            )
+            parser.add_argument(
+                '--device',
+                default=generate.DEVICE_ID,
+                help="device ID (s3 layout only) (default: %(default)s)",
+            )
+            parser.add_argument(
+                '--seed',
+                default=0,
+                type=int,
+                help="seed of data files' random contents (default: %(default)s)",
+            )
+
+        def __call__(self, args):
+            intervals = dict(generate.INTERVALS)
+
+            for spec in args.intervals or ():
+                try:
+                    (kind, interval) = spec.split('=')
+                    intervals[kind] = int(interval)
+                except ValueError:
+                    args._parser_.error(f"bad interval: {spec}")
+
+                if kind not in generate.MAKERS:
+                    args._parser_.error(f"unknown kind: {kind}")
+
+            now = time.time()
+            samples = generate.iter_samples(now=now, days=args.days, intervals=intervals,
+                                            seed=args.seed)
+
+            if args.layout == 'local':
+                count = generate.write_local(args.target, samples, now=now)
+            else:
+                count = generate.write_s3(args.target, samples, device_id=args.device)
+
+            sys.stderr.write(f"[INFO] wrote {count} data files to {args.target}\n")
+
+    class Run(Command):
+        """time (cold and warm) queries of the dashboard API
+
+        the data file backend is configured as for the server
+        (e.g. via DATAFILE_BACKEND and DATAFILE_PENDING).
+
+        """
+        def __init__(self, parser):
+            parser.add_argument(
+                'scenarios',
+                metavar='scenario',
+                nargs='*',
+                help="scenario(s) to run (default: all): " + ', '.join(scenario.SCENARIOS),
+            )
+            parser.add_argument(
+                '--mode',
+                action='append',
+                dest='modes',
+                choices=scenario.MODES,
+                help="mode(s) in which to run scenarios (default: all)",
+            )
+            parser.add_argument(
+                '-r', '--repeat',
+                default=5,
+                type=int,
+                help="number of timed requests per scenario (default: %(default)s)",
+            )
+            parser.add_argument(
+                '--prefix',
+                help="URL path prefix of the API -- for the s3 backend, including the "
+                     "device ID (default: APP_PREFIX)",
+            )
+            parser.add_argument(
+                '-o', '--output',
+                type=pathlib.Path,
+                help="file to which to write results as JSON (default: stdout)",
+            )
+
+        def __call__(self, args):
+            if args.repeat < 1:
+                args._parser_.error("repeat must be at least 1")
+
+            for name in args.scenarios:
+                if name not in scenario.SCENARIOS:
+                    args._parser_.error(f"unknown scenario: {name}")
+
+            # log to stderr (leaving stdout to results)
+            log.remove()
+            log.add(sys.stderr, level=conf.LOG_LEVEL)
+
+            report = scenario.run(
+                names=args.scenarios or scenario.SCENARIOS,
+                modes=args.modes or scenario.MODES,
+                repeat=args.repeat,
+                prefix=args.prefix,
+            )
+
+            for result in report['results']:
+                sys.stderr.write('[INFO] {scenario:<17} {mode:<4}  status={status}  '
+                                 'median={median_s:.4f}s  min={min_s:.4f}s\n'.format(**result))
+
+            if args.output:
+                with args.output.open('w') as fd:
+                    json.dump(report, fd, indent=2)
+            else:
+                json.dump(report, sys.stdout, indent=2)
+                print()
+
+    class List(Command):
+        """time listings of a device's data files in S3
+
+        data files are listed by way of s3path's selector and by way of
+        raw list_objects_v2 requests; the bucket is configured as for the
+        server (e.g. via DATAFILE_S3_BUCKET).
+
+        """
+        def __init__(self, parser):
+            parser.add_argument(
+                '--device',
+                default=generate.DEVICE_ID,
+                help="device ID (default: %(default)s)",
+            )
+            parser.add_argument(
+                '--engine',
+                action='append',
+                dest='engines',
+                choices=listing.ENGINES,
+                help="engine(s) by which to list data files (default: all)",
+            )
+            parser.add_argument(
+                '-r', '--repeat',
+                default=5,
+                type=int,
+                help="number of timed listings per engine (default: %(default)s)",
+            )
+            parser.add_argument(
+                '-o', '--output',
+                type=pathlib.Path,
+                help="file to which to write results as JSON (default: stdout)",
+            )
+
+        def __call__(self, args):
+            if args.repeat < 1:
+                args._parser_.error("repeat must be at least 1")
+
+            log.remove()
+            log.add(sys.stderr, level=conf.LOG_LEVEL)
+
+            report = listing.run(
+                device_id=args.device,
+                engines=args.engines or listing.ENGINES,
+                repeat=args.repeat,
+            )
+
+            for result in report['results']:
+                sys.stderr.write('[INFO] {engine:<8}  keys={keys}  requests={requests}  '
+                                 'median={median_s:.4f}s  min={min_s:.4f}s\n'.format(**result))
+
+            if not report['consistent']:
+                sys.stderr.write("[WARNING] engines' listings differ\n")
+
+            if args.output:
+                with args.output.open('w') as fd:
+                    json.dump(report, fd, indent=2)
+            else:
+                json.dump(report, sys.stdout, indent=2)
+                print()
@@ -0,0 +1,144 @@
+import json
+import pathlib
+import sys
+import tempfile
+import time
+
+from argcmdr import Command
+
+from app.bench import generate
+from app.lib.decode import DECODERS
+
+from .run import Main
+
+
+SAMPLE_KINDS = {
+    'ping': generate.make_ping,
+    'ookla': generate.make_ookla,
+}
+
+
+@Main.register
+class BenchJSON(Command):
+    """benchmark decoding of data files' JSON"""
+
+    def __init__(self, parser):
+        parser.add_argument(
+            'paths',
+            metavar='path',
+            nargs='*',
+            type=pathlib.Path,
+            help="data file(s) or directories of these to decode "
+                 "(default: generate representative ping and Ookla files)",
+        )
+        parser.add_argument(
+            '-n', '--count',
+            default=500,
+            type=int,
+            help="number of files to generate of each kind (default: %(default)s)",
+        )
+        parser.add_argument(
+            '-r', '--repeat',
+            default=5,
+            type=int,
+            help="number of times to decode each file set (default: %(default)s)",
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help="write results as JSON",
+        )
+
+    def __call__(self, args):
+        if args.paths:
+            file_sets = {'given': list(self.iter_files(args.paths))}
+            self.run(args, file_sets)
+        else:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                file_sets = self.generate(pathlib.Path(temp_dir), args.count)
+                self.run(args, file_sets)
+
+    @staticmethod
+    def iter_files(paths):
+        for path in paths:
+            if path.is_dir():
+                yield from sorted(path.glob('*.json'))
+            else:
+                yield path
+
+    @staticmethod
+    def generate(target, count):
+        now = int(time.time())
+        file_sets = {}
+
+        for (kind, make_sample) in SAMPLE_KINDS.items():
+            file_sets[kind] = []
+
+            for index in range(count):
+                timestamp = now - index * 1800
+                path = target / generate.get_file_name(timestamp, kind)
+                path.write_text(json.dumps(make_sample(timestamp)))
+                file_sets[kind].append(path)
+
+        return file_sets
+
+    @staticmethod
+    def time_decode(decode, paths, repeat):
+        best = None
+
+        for _round in range(repeat):
+            start = time.perf_counter()
+
+            for path in paths:
+                decode(path)
+
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        return best
+
+    @staticmethod
+    def decode_text_stream(path):
+        with path.open() as fd:
+            return json.load(fd)
+
+    def run(self, args, file_sets):
+        methods = {'json (text stream)': self.decode_text_stream}
+
+        for (name, decoder_cls) in DECODERS.items():
+            try:
+                decoder = decoder_cls()
+            except ModuleNotFoundError:
+                sys.stderr.write(f"[INFO] {name}: not installed: skipped\n")
+            else:
+                methods[f'{name} (bytes)'] = decoder.load_path
+
+        results = []
+
+        for (kind, paths) in file_sets.items():
+            if not paths:
+                continue
+
+            size = sum(path.stat().st_size for path in paths)
+
+            for (method, decode) in methods.items():
+                elapsed = self.time_decode(decode, paths, args.repeat)
+
+                results.append({
+                    'files': kind,
+                    'count': len(paths),
+                    'bytes': size,
+                    'method': method,
+                    'seconds': elapsed,
+                    'files_per_second': len(paths) / elapsed,
+                    'mb_per_second': size / elapsed / 1e6,
+                })
+
+        if args.json:
+            json.dump(results, sys.stdout, indent=2)
+            print()
+            return
+
+        for result in results:
+            print('{files:<6} {count:>6} files  {method:<20} {seconds:>8.4f}s  '
+                  '{files_per_second:>10.0f} files/s  {mb_per_second:>7.1f} MB/s'.format(**result))
@@ -0,0 +1,85 @@
+import datetime
+import pathlib
+import sys
+
+from argcmdr import Command
+
+from app import conf
+from app.data.file import bundle
+from app.lib.path import PathLock
+
+from .run import Main
+
+
+@Main.register
+class Compact(Command):
+    """compact archived data files into daily bundles"""
+
+    def __init__(self, parser):
+        parser.add_argument(
+            'source',
+            metavar='path',
+            nargs='?',
+            type=pathlib.Path,
+            help="directory of data files to compact (default: DATAFILE_ARCHIVE)",
+        )
+        parser.add_argument(
+            '--target',
+            metavar='path',
+            type=pathlib.Path,
+            help="directory to which to write bundles (default: DATAFILE_BUNDLE_PATH)",
+        )
+        parser.add_argument(
+            '--days',
+            default=1,
+            type=int,
+            help="compact only days (UTC) ending at least this many days ago "
+                 "(default: %(default)s)",
+        )
+        parser.add_argument(
+            '--block-size',
+            default=bundle.BLOCK_SIZE,
+            type=int,
+            help="data files compressed together in each block of a bundle "
+                 "(default: %(default)s)",
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help="leave data files in place once bundled (rather than removing these "
+                 "once their bundle is verified)",
+        )
+
+    def __call__(self, args):
+        source = args.source or conf.DATAFILE_ARCHIVE
+        target = args.target or conf.DATAFILE_BUNDLE_PATH
+
+        if source is None:
+            args._parser_.error("no source directory given and DATAFILE_ARCHIVE unset")
+
+        if target is None:
+            args._parser_.error("no target directory given and DATAFILE_BUNDLE_PATH unset")
+
+        if args.days < 0:
+            args._parser_.error("--days may not be negative")
+
+        if args.block_size < 1:
+            args._parser_.error("--block-size must be positive")
+
+        before = datetime.datetime.now(datetime.timezone.utc).date() - datetime.timedelta(args.days)
+
+        target.mkdir(parents=True, exist_ok=True)
+
+        # prevent overlapping compactions
+        with PathLock(target):
+            results = bundle.compact_dir(source,
+                                         target,
+                                         before,
+                                         block_size=args.block_size,
+                                         remove=not args.keep)
+
+        if not results:
+            sys.stderr.write(f"[INFO] {source}: before {before}: no data files to compact\n")
+
+        for (path, count) in results:
+            sys.stderr.write(f"[INFO] {path}: bundled {count} data files\n")
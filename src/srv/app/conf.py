@@ -4,7 +4,7 @@ from decouple import config, Csv
 
 
 def path_or_none(value):
-    return value if value is None else pathlib.Path(value)
+    return pathlib.Path(value) if value else None
 
 
 #
@@ -138,3 +138,156 @@ DATAFILE_S3_CACHE_PATH = config('DATAFILE_S3_CACHE_PATH',
 #
 #
 DATAFILE_S3_CACHE_REMOTE = config('DATAFILE_S3_CACHE_REMOTE', default=None)
+#
+#
+# DATAFILE_S3_INDEX_PATH: directory in which to persist the index of each device's data
+# file keys (where DATAFILE_S3_CACHE_BACKEND is local; otherwise, indexes are stored in the
+# remote cache)
+#
+DATAFILE_S3_INDEX_PATH = config('DATAFILE_S3_INDEX_PATH',
+                                default=f'/var/cache/{APP_NAME}/data/file/s3/index/')
+#
+#
+# DATAFILE_COLUMN_PATH: directory in which to compile local data files into a column store
+#
+# data files' numeric measurements are ingested into per-key arrays, from which
+# queries may be answered without reading (and parsing) the data files themselves.
+#
+# data files are ingested in the background -- as these are added (as reported by the
+# directory watcher) and upon each population of caches. until the store has ingested
+# the data files as listed, queries read these directly.
+#
+# (applies only to the local backend; set empty to disable.)
+#
+DATAFILE_COLUMN_PATH = config('DATAFILE_COLUMN_PATH',
+                              default=f'/var/lib/{APP_NAME}/data/file/column/',
+                              cast=path_or_none)
+#
+#
+# DATAFILE_BUNDLE_PATH: directory in which to compact archived data files into daily bundles
+#
+# bundles are written by the compact command from the data files of DATAFILE_ARCHIVE (which
+# are removed once their bundle is verified, unless --keep is given); the local backend then
+# reads archived data files from their bundles.
+#
+# (applies only to the local backend; set empty to disable.)
+#
+DATAFILE_BUNDLE_PATH = config('DATAFILE_BUNDLE_PATH',
+                              default=f'/var/lib/{APP_NAME}/data/file/bundle/',
+                              cast=path_or_none)
+#
+#
+# DATAFILE_SCAN_SHARE: whether to share scans of data files among concurrent queries
+#
+# queries arriving within DATAFILE_SCAN_DELAY seconds of one another are merged into
+# a single scan (a query arriving while none other is in progress is not delayed); and,
+# results are reused by equivalent queries for DATAFILE_SCAN_TTL seconds.
+#
+# results are discarded early once local data files change; with the s3 backend --
+# whose changes are not detected -- results may lag new data files by up to
+# DATAFILE_SCAN_TTL seconds (set 0 to disable their reuse).
+#
+DATAFILE_SCAN_SHARE = config('DATAFILE_SCAN_SHARE', default=True, cast=bool)
+#
+#
+DATAFILE_SCAN_DELAY = config('DATAFILE_SCAN_DELAY', default=0.05, cast=float)
+#
+#
+DATAFILE_SCAN_TTL = config('DATAFILE_SCAN_TTL', default=5.0, cast=float)
+#
+#
+# DATAFILE_ROLLING: whether to maintain rolling windows of queried aggregates
+#
+# rather than recomputing aggregates (such as week-long plots) from their rows upon
+# each query, windows of these are updated as new data files are ingested into the
+# column store.
+#
+# (applies only to the local backend; and, only where DATAFILE_COLUMN_PATH is set.)
+#
+DATAFILE_ROLLING = config('DATAFILE_ROLLING', default=True, cast=bool)
+#
+#
+# PLOT_MAX_POINTS: default maximum number of points per plotted series
+#
+# series are downsampled in a manner preserving their shape; (requests may override
+# this via query parameter max_points or resolution).
+#
+# set to 0 to disable.
+#
+PLOT_MAX_POINTS = config('PLOT_MAX_POINTS', default=1000, cast=int)
+#
+#
+# JSON_DECODER: decoder of data files' JSON: auto, orjson or json
+#
+# under auto, orjson is used if installed, and otherwise the standard library's json.
+#
+JSON_DECODER = config('JSON_DECODER', default='auto')
+#
+#
+# DATAFILE_WATCH: whether to maintain indexes of data file directories from filesystem events
+#
+# directories' entries are indexed once, and thereafter updated as these are reported by
+# inotify (or, where inotify is unavailable, as directories are polled every
+# DATAFILE_WATCH_INTERVAL seconds).
+#
+# (applies only to the local backend.)
+#
+DATAFILE_WATCH = config('DATAFILE_WATCH', default=True, cast=bool)
+#
+#
+DATAFILE_WATCH_INTERVAL = config('DATAFILE_WATCH_INTERVAL', default=5.0, cast=float)
+#
+#
+# DATAFILE_MANIFEST_PATH: directory in which to persist the indexes of data file directories
+#
+# the sorted listing of each watched directory is kept in an append-only manifest, such
+# that -- upon restart -- an unchanged directory needn't be listed (or sorted) again.
+#
+# (applies only with DATAFILE_WATCH; set empty to disable.)
+#
+DATAFILE_MANIFEST_PATH = config('DATAFILE_MANIFEST_PATH',
+                                default=f'/var/lib/{APP_NAME}/data/file/manifest/',
+                                cast=path_or_none)
+#
+#
+# DATAFILE_PROJECTION_PATH: file in which to persist data files' projections
+#
+# projections of data files onto queried keys are stored (keyed by file name, modification
+# time and size), such that caches may be refilled upon restart without re-parsing data files.
+#
+# (applies only to the local backend; set empty to disable.)
+#
+DATAFILE_PROJECTION_PATH = config('DATAFILE_PROJECTION_PATH',
+                                  default=f'/var/lib/{APP_NAME}/data/file/projection.sqlite',
+                                  cast=path_or_none)
+#
+#
+# DATAFILE_CACHE_BYTES: memory budget (in bytes) of the in-process cache of data files'
+# projections
+#
+# (sizes are approximate; the budget should accommodate DATAFILE_LIMIT projections for
+# each of a few distinct queries.)
+#
+DATAFILE_CACHE_BYTES = config('DATAFILE_CACHE_BYTES', default=32 * 1024 ** 2, cast=int)
+#
+#
+# DATAFILE_CACHE_POLICY: eviction policy of the cache of data files' projections: lru or tinylfu
+#
+# under tinylfu, projections are admitted to the bulk of the cache only if these are more
+# frequently used than those they would displace; (a scan of many data files cannot flush
+# those frequently queried).
+#
+DATAFILE_CACHE_POLICY = config('DATAFILE_CACHE_POLICY', default='lru')
+#
+#
+# DATAFILE_WARM_PROCESSES: number of worker processes with which to parse data files when
+# populating caches
+#
+# (by default, one per CPU; set to 1 to parse data files in the server process.)
+#
+DATAFILE_WARM_PROCESSES = config('DATAFILE_WARM_PROCESSES', default=0, cast=int)
+#
+#
+# DATAFILE_WARM_CHUNK: number of data files submitted to a worker process at once
+#
+DATAFILE_WARM_CHUNK = config('DATAFILE_WARM_CHUNK', default=32, cast=int)
@@ -1,18 +1,35 @@
 from app import conf, route
 from app.lib import error
 
-from .base import FlatFileBank, Last, Multi, StdDev, ONE_WEEK_S  # noqa: F401
+from .base import (  # noqa: F401
+    FlatFileBank,
+    Count,
+    Last,
+    Max,
+    Mean,
+    Min,
+    Multi,
+    Percentile,
+    StdDev,
+    ONE_WEEK_S,
+)
+from .plan import ScanPlanner
+
+
+SCAN_PLANNER = conf.DATAFILE_SCAN_SHARE and ScanPlanner(delay=conf.DATAFILE_SCAN_DELAY,
+                                                        ttl=conf.DATAFILE_SCAN_TTL)
 
 
 match conf.DATAFILE_BACKEND:
     case 'local':
         try:
-            from .local import LocalDataFileBank, populate_caches  # noqa: F401
+            from .local import LocalDataFileBank, populate_caches, watch_dirs  # noqa: F401
         except ModuleNotFoundError:
             raise error.ImplicitDependencyError.make_default("local backend")
 
         class DataFileBank(LocalDataFileBank):
-            pass
+
+            planner = SCAN_PLANNER or None
 
     case 's3':
         try:
@@ -21,7 +38,8 @@ match conf.DATAFILE_BACKEND:
             raise error.ImplicitDependencyError.make_default("s3 backend")
 
         class DataFileBank(route.DeviceIDProvider, S3DataFileBank):  # noqa: F811
-            pass
+
+            planner = SCAN_PLANNER or None
 
     case _:
         raise ValueError(f"setting DATAFILE_BACKEND expects either "
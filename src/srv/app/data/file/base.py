@@ -1,12 +1,28 @@
 """Interface to read operations on sets of Netrics data files."""
 import abc
 import collections
+import itertools
 import json
+import math
 import numbers
-import statistics
+import re
 import time
 
+from app import conf
+from app.lib.decode import get_decoder
 from app.lib.iteration import pairwise
+from app.lib.number import is_numeric
+
+from . import sample
+from .failure import ReadFailureCache
+from .summary import (
+    CountSummary,
+    MaxSummary,
+    MeanSummary,
+    MinSummary,
+    QuantileSketch,
+    StdDevSummary,
+)
 
 
 DATAFILE_PREFIX = 'Measurements'
@@ -17,6 +33,39 @@ DATAFILE_LIMIT = 5_000
 
 ONE_WEEK_S = 60 * 60 * 24 * 7
 
+TIME_KEY = 'Time'
+
+BLOCK_SIZE_MIN = 8
+
+BLOCK_SIZE_MAX = 512
+
+#
+# data file names are expected to feature the (epoch) timestamp of their measurement;
+# (the measurement's Meta.Time may be recorded somewhat later than this)
+#
+NAME_TIME_PATTERN = re.compile(r'(?<![0-9])([0-9]{10})(?:\.[0-9]+)?(?![0-9])')
+
+NAME_TIME_TOLERANCE_S = 60 * 60
+
+# decoder of data files' JSON (see: app.lib.decode)
+JSON_DECODER = get_decoder(conf.JSON_DECODER)
+
+# data files known to be unreadable (see: app.data.file.failure)
+READ_FAILURES = ReadFailureCache()
+
+_RE = re.compile
+
+#
+# data files are named for the type of their measurement -- a query need only
+# inspect those data files whose type may contain its keys
+#
+FILE_PATTERNS = (
+    # (key_pattern, file_pattern),
+    (_RE(r'^ping_latency\.'), _RE(r'^result-.+-ping.json$')),
+    (_RE(r'^ookla\.'), _RE(r'^result-.+-ookla(?:-metadata)?.json$')),
+    (_RE(r'^ndt7\.'), _RE(r'^result-.+-ndt7(?:-metadata)?.json$')),
+)
+
 
 def get_multikey(multikey, values):
     value = values
@@ -25,34 +74,257 @@ def get_multikey(multikey, values):
     return value
 
 
+def set_multikey(multikey, values, value):
+    (*keys, last_key) = multikey.split('.')
+
+    for key in keys:
+        values = values.setdefault(key, {})
+
+    values[last_key] = value
+
+
+def project(full_data, keys, prefix=DATAFILE_PREFIX, meta_prefix=META_PREFIX):
+    """Project the contents of a data file onto measurement `keys`.
+
+    Only the values of `keys` (under `prefix`) and the file's meta data
+    (under `meta_prefix`) are retained. Keys missing from the file are
+    omitted; and, if the file's data are missing its `prefix`, so is the
+    projection.
+
+    """
+    projection = {}
+
+    if meta_prefix in full_data:
+        projection[meta_prefix] = full_data[meta_prefix]
+
+    try:
+        data = get_multikey(prefix, full_data) if prefix else full_data
+    except (LookupError, TypeError):
+        return projection
+
+    data_projected = {}
+
+    for key in keys:
+        try:
+            value = get_multikey(key, data)
+        except (LookupError, TypeError):
+            continue
+
+        set_multikey(key, data_projected, value)
+
+    if prefix:
+        set_multikey(prefix, projection, data_projected)
+    else:
+        projection.update(data_projected)
+
+    return projection
+
+
+def get_name_time(name):
+    """Determine an upper bound on the measurement time of the data file
+    of the given `name`.
+
+    `None` is returned if no timestamp can be found in the name.
+
+    """
+    match = NAME_TIME_PATTERN.search(name)
+    return None if match is None else int(match.group(1)) + NAME_TIME_TOLERANCE_S
+
+
+def get_file_patterns(keys):
+    """Determine the patterns of the names of data files which may
+    contain measurement `keys` (according to `FILE_PATTERNS`).
+
+    `None` is returned -- indicating that every data file must be
+    inspected -- if no `keys` are given, or if any key matches no
+    pattern.
+
+    """
+    file_patterns = set()
+
+    for key in keys:
+        for (key_pattern, file_pattern) in FILE_PATTERNS:
+            if key_pattern.search(key):
+                file_patterns.add(file_pattern)
+                break
+        else:
+            return None
+
+    return file_patterns or None
+
+
+def match_file_patterns(name, file_patterns):
+    """Determine whether the data file `name` matches any of the given
+    `file_patterns` (or whether these are `None`).
+
+    """
+    return file_patterns is None or any(file_pattern.search(name)
+                                        for file_pattern in file_patterns)
+
+
+def iter_block_sizes(size_min=BLOCK_SIZE_MIN, size_max=BLOCK_SIZE_MAX):
+    """Generate the sizes of successive blocks of data files' datasets.
+
+    Blocks begin small -- such that aggregators satisfied by the most
+    recent data files (*e.g.* `Last`) needn't wait on many more -- and
+    double in size up to `size_max`.
+
+    """
+    size = size_min
+
+    while True:
+        yield size
+        size = min(2 * size, size_max)
+
+
 class AbstractDataFileBank(abc.ABC):
     """Interface to read operations on sets of Netrics data files."""
 
     DATA_FILE_READ_ERRORS = (json.JSONDecodeError, UnicodeDecodeError)
 
+    # planner of scans shared among queries (if any) -- see: app.data.file.plan
+    planner = None
+
+    # negative cache of unreadable data files (if any) -- see: app.data.file.failure
+    read_failures = READ_FAILURES
+
     def __init__(self,
                  *,
                  prefix=DATAFILE_PREFIX,
                  meta_prefix=META_PREFIX,
                  file_limit=DATAFILE_LIMIT,
                  round_to=None,
-                 flat=False):
+                 flat=False,
+                 batch=True):
         self.prefix = prefix
         self.meta_prefix = meta_prefix
         self.file_limit = file_limit
         self.round_to = round_to
         self.flat = flat
+        self.batch = batch
+
+    @property
+    def scan_key(self):
+        """Key identifying scans of data files equivalent to this bank's.
+
+        Queries of banks with equal keys may share scans (regardless of
+        their rounding and flattening of results).
+
+        """
+        return (self.prefix, self.meta_prefix, self.file_limit, self.batch)
+
+    @property
+    def data_version(self):
+        """Token identifying the current state of the bank's data files,
+        such that results computed of an earlier state may be discarded.
+
+        `None` indicates that changes to data files are not detected.
+
+        """
+        return None
 
     def get_points(self, *ops, **named_ops):
+        """Retrieve data points of the given aggregator `ops`.
+
+        Aggregators are applied to data files' datasets by `reduce` --
+        or, if the bank is configured with a `planner`, by a scan shared
+        with other queries.
+
+        """
         op_stack = dict(((str(op), op) for op in ops), **named_ops)
-        points = dict.fromkeys(op_stack)
 
-        if self.flat and len(points) > 1:
+        if self.flat and len(op_stack) > 1:
             raise ValueError("cannot flatten multiple keys")
 
+        if self.planner is None:
+            points = self.reduce(op_stack)
+        else:
+            points = self.planner.reduce(self, op_stack)
+
+        points = {write_key: self.round_value(value) for (write_key, value) in points.items()}
+
+        # DEBUG: points['_path_count'] = path_count
+
+        if self.flat:
+            (points,) = points.values()
+
+        return points
+
+    def reduce(self, op_stack, flats=None):
+        """Apply the aggregators of `op_stack` to data files' datasets.
+
+        Results are returned, unrounded, by their keys in `op_stack`.
+
+        In batch mode -- if enabled, and supported by all aggregators --
+        aggregators are applied to blocks of datasets at a time (see
+        `iter_blocks`). Otherwise, aggregators are applied to each
+        dataset in turn.
+
+        Aggregators' results are flattened according to the bank's `flat`
+        setting, unless overridden by key in `flats`.
+
+        """
+        op_stack = dict(op_stack)
+        points = dict.fromkeys(op_stack)
+
+        if flats is None:
+            flats = dict.fromkeys(op_stack, self.flat)
+
+        since = self.get_since(op_stack.values())
+
+        if self.batch and all(op.batchable for op in op_stack.values()):
+            self._reduce_blocks_(op_stack, points, flats, since)
+        else:
+            self._reduce_datasets_(op_stack, points, flats, since)
+
+        return points
+
+    @staticmethod
+    def get_since(ops):
+        """Determine the earliest measurement time of interest to the
+        given aggregator `ops`.
+
+        `None` is returned if any aggregator is not limited to data of
+        some maximum age.
+
+        """
+        ages = [op.age_s for op in ops]
+
+        if not ages or None in ages:
+            return None
+
+        return time.time() - max(ages)
+
+    def _reduce_blocks_(self, op_stack, points, flats, since=None):
+        read_keys = frozenset(read_key for op in op_stack.values() for read_key in op.read_keys)
+        meta_keys = frozenset(meta_key for op in op_stack.values() for meta_key in op.meta_keys)
+
+        for block in self.iter_blocks(read_keys, meta_keys, since):
+            context = {
+                'points': points,
+                'file_limit': self.file_limit,
+                'meta_prefix': self.meta_prefix,
+                'now': time.time(),
+            }
+
+            for (write_key, aggregator) in tuple(op_stack.items()):
+                try:
+                    points[write_key] = aggregator.reduce_block(
+                        block,
+                        points[write_key],
+                        dict(context, write_key=write_key, flat=flats[write_key]),
+                    )
+                except aggregator.stop_reduce as stop_reduce:
+                    points[write_key] = stop_reduce.value
+                    del op_stack[write_key]
+
+            if not op_stack:
+                break
+
+    def _reduce_datasets_(self, op_stack, points, flats, since=None):
         read_keys = frozenset(read_key for op in op_stack.values() for read_key in op.read_keys)
 
-        for (dataset, dataset1) in pairwise(self.iter_datasets(read_keys)):
+        for (dataset, dataset1) in pairwise(self.iter_datasets(read_keys, since)):
             (data, full_data) = dataset
 
             for (write_key, aggregator) in tuple(op_stack.items()):
@@ -67,11 +339,11 @@ class AbstractDataFileBank(abc.ABC):
                             'file_limit': self.file_limit,
                             'last': dataset1 is None,
                             'meta_prefix': self.meta_prefix,
-                            'flat': self.flat,
+                            'flat': flats[write_key],
                         },
                     )
                 except aggregator.stop_reduce as stop_reduce:
-                    points[write_key] = self.round_value(stop_reduce.value)
+                    points[write_key] = stop_reduce.value
                     del op_stack[write_key]
 
                 #
@@ -94,13 +366,6 @@ class AbstractDataFileBank(abc.ABC):
             if not op_stack:
                 break
 
-        # DEBUG: points['_path_count'] = path_count
-
-        if self.flat:
-            (points,) = points.values()
-
-        return points
-
     def round_value(self, value):
         if self.round_to is not None:
             if isinstance(value, numbers.Number):
@@ -114,14 +379,43 @@ class AbstractDataFileBank(abc.ABC):
 
         return value
 
-    def iter_datablobs(self, keys=()):
-        for path in self.iter_paths(keys):
-            try:
-                yield self.get_json(path)
-            except self.DATA_FILE_READ_ERRORS:
-                continue
+    def iter_datablobs(self, keys=(), since=None):
+        for path in self.iter_paths(keys, since):
+            if (data := self.get_datablob(path, keys)) is not None:
+                yield data
+
+    def get_datablob(self, path, keys=()):
+        """Retrieve the contents of the data file at `path` projected onto
+        measurement `keys` (see `get_projection`).
+
+        `None` is returned if the file cannot be read. Such files are
+        recorded, and not read again until their signatures change.
 
-    def iter_datasets(self, keys=()):
+        """
+        failures = self.read_failures
+
+        if failures is not None and failures.known(path, self.get_signature):
+            return None
+
+        try:
+            return self.get_projection(path, keys)
+        except self.DATA_FILE_READ_ERRORS as exc:
+            if failures is not None:
+                failures.add(path, self.get_signature(path), exc)
+
+            return None
+
+    @staticmethod
+    def get_signature(path):
+        """Signature of the data file at `path` -- which changes if its
+        contents change.
+
+        (By default, data files are considered immutable.)
+
+        """
+        return None
+
+    def iter_datasets(self, keys=(), since=None):
         """Generate data files' datasets.
 
         Files with incompatible encoding or serialization are ignored.
@@ -134,7 +428,7 @@ class AbstractDataFileBank(abc.ABC):
         See `iter_paths`.
 
         """
-        for full_data in self.iter_datablobs(keys):
+        for full_data in self.iter_datablobs(keys, since):
             if self.prefix:
                 try:
                     data = get_multikey(self.prefix, full_data)
@@ -145,18 +439,61 @@ class AbstractDataFileBank(abc.ABC):
             else:
                 yield (full_data, full_data)
 
+    def iter_blocks(self, keys=(), meta_keys=(), since=None):
+        """Generate blocks of data files' datasets.
+
+        Datasets are generated in blocks of increasing size, stored by
+        column: the values of each of the measurement `keys`, and of each
+        of the `meta_keys` (in addition to `Time`).
+
+        A final, empty block is generated to indicate that datasets have
+        been exhausted.
+
+        See `iter_datasets` and `Block`.
+
+        """
+        datasets = self.iter_datasets(keys, since)
+
+        block = None
+
+        for size in iter_block_sizes():
+            chunk = list(itertools.islice(datasets, size))
+
+            if not chunk:
+                break
+
+            block = Block.from_datasets(chunk, keys, meta_keys, self.meta_prefix)
+            yield block
+
+        if block is not None:
+            yield Block.empty(keys, meta_keys)
+
+    def get_projection(self, path, keys=()):
+        """Retrieve the contents of the data file at `path` projected onto
+        measurement `keys`.
+
+        If no `keys` are specified, the file's full contents are returned.
+
+        See `project`.
+
+        """
+        full_data = self.get_json(path)
+        return project(full_data, keys, self.prefix, self.meta_prefix) if keys else full_data
+
     @staticmethod
     def get_json(path):
-        with path.open() as fd:
-            return json.load(fd)
+        return JSON_DECODER.load_path(path)
 
     @abc.abstractmethod
-    def iter_paths(self, keys=()):
+    def iter_paths(self, keys=(), since=None):
         """Generate data file paths in descending order.
 
         Paths will not be generated beyond the file limit specified upon
         instantiation.
 
+        Paths of data files known to precede the timestamp `since` (if
+        specified) will not be generated.
+
         """
 
 
@@ -168,11 +505,23 @@ class FlatFileBank:
 
         super().__init__(flat=True, **kwargs)
 
-    def get_columns(self, read_key, age_s, *, decorate=None, reverse=False):
+    def get_columns(self, read_key, age_s, *, decorate=None, reverse=False, max_points=None):
+        """Retrieve the columns of values of `read_key` (and of any meta
+        keys by which to `decorate` these) of the past `age_s` seconds.
+
+        Where `max_points` is specified, columns are downsampled to at
+        most this many points, in a manner preserving their shape (see:
+        `sample.lttb`). Points are plotted against the `Time` decoration
+        (if any).
+
+        """
         points = self.get_points(
             Multi(read_key, age_s, decorate=decorate, reverse=reverse)
         )
 
+        if max_points is not None and len(points) > max_points:
+            points = self.downsample(points, read_key, decorate, max_points)
+
         if not points:
             count = 1 if isinstance(read_key, str) else len(read_key)
             if decorate:
@@ -189,6 +538,121 @@ class FlatFileBank:
 
         return data if meta is None else data + (meta,)
 
+    @staticmethod
+    def downsample(points, read_key, decorate, max_points):
+        (values, meta) = zip(*points) if decorate else (points, None)
+
+        series = [values] if isinstance(read_key, str) else list(zip(*values))
+
+        if decorate == TIME_KEY:
+            xs = meta
+        elif decorate and not isinstance(decorate, str) and TIME_KEY in decorate:
+            time_index = list(decorate).index(TIME_KEY)
+            xs = [point_meta[time_index] for point_meta in meta]
+        else:
+            xs = range(len(points))
+
+        return [points[index] for index in sample.lttb(xs, series, max_points)]
+
+
+class Missing:
+
+    def __repr__(self):
+        return 'MISSING'
+
+
+MISSING = Missing()
+
+
+class Block:
+    """Block of data files' datasets stored by column.
+
+    Datasets are ordered as generated -- *i.e.* in descending order --
+    and their values are stored by measurement key in `columns` and by
+    meta key in `meta`. Measurements missing from a dataset are marked
+    by `MISSING`.
+
+    A block of size zero indicates that datasets have been exhausted.
+
+    """
+    __slots__ = ('size', 'columns', 'meta', '_values_')
+
+    @classmethod
+    def from_datasets(cls, datasets, keys, meta_keys, meta_prefix):
+        columns = {key: [] for key in keys}
+        meta = {key: [] for key in {TIME_KEY, *meta_keys}}
+
+        for (data, full_data) in datasets:
+            for (key, values) in columns.items():
+                try:
+                    values.append(get_multikey(key, data))
+                except LookupError:
+                    values.append(MISSING)
+
+            data_meta = full_data.get(meta_prefix, {})
+
+            for (key, values) in meta.items():
+                values.append(data_meta.get(key))
+
+        return cls(len(datasets), columns, meta)
+
+    @classmethod
+    def empty(cls, keys, meta_keys):
+        return cls(0, {key: [] for key in keys}, {key: [] for key in {TIME_KEY, *meta_keys}})
+
+    def __init__(self, size, columns, meta):
+        self.size = size
+        self.columns = columns
+        self.meta = meta
+        self._values_ = {}
+
+    @property
+    def last(self):
+        return self.size == 0
+
+    @property
+    def times(self):
+        return self.meta[TIME_KEY]
+
+    def get_values(self, keys):
+        """Retrieve the values of the given measurement `keys`.
+
+        Values of a single key are returned as they are stored. Values
+        of multiple keys are combined into lists, (marked as `MISSING`
+        where any value is missing).
+
+        """
+        if len(keys) == 1:
+            return self.columns[keys[0]]
+
+        keys = tuple(keys)
+
+        try:
+            return self._values_[keys]
+        except KeyError:
+            pass
+
+        values = self._values_[keys] = [
+            MISSING if MISSING in record else list(record)
+            for record in zip(*(self.columns[key] for key in keys))
+        ]
+
+        return values
+
+    def get_meta(self, index, meta_keys):
+        return {key: self.meta[key][index] for key in meta_keys}
+
+    def age_index(self, age_s, now):
+        """Index of the first dataset at least `age_s` seconds old (or
+        the size of the block if there is none).
+
+        """
+        return next(
+            (index for (index, timestamp) in enumerate(self.times)
+             if timestamp is not None and now - timestamp >= age_s),
+            self.size,
+        )
+
 
 class StopReduce(Exception):
     """Raised to indicate completion and to share final result."""
@@ -210,6 +674,12 @@ class DataFileAggregator(abc.ABC):
 
     stop_reduce = StopReduce
 
+    # whether reduce_block is supported
+    batchable = False
+
+    # maximum age of data of interest (if any)
+    age_s = None
+
     def __init__(self, read_key, *, decorate=None, where=where_true):
         self.read_key = read_key
         self.decorations = decorate
@@ -235,19 +705,41 @@ class DataFileAggregator(abc.ABC):
 
         raise ItemError(self.read_key, value)
 
+    @property
+    def scan_key(self):
+        """Key identifying aggregators which would compute equal results
+        from the same scan of data files.
+
+        """
+        return (
+            self.__class__,
+            tuple(self.read_keys),
+            tuple(self.meta_keys),
+            self.where,
+            self.age_s,
+        )
+
+    @property
+    def meta_keys(self):
+        if not self.decorations:
+            return ()
+
+        return (self.decorations,) if isinstance(self.decorations, str) else self.decorations
+
     def decorate(self, value, context):
         if self.decorations:
-            if isinstance(self.decorations, str):
-                decorations = (self.decorations,)
-            else:
-                decorations = self.decorations
-
             data = context['data']
             data_meta = data[context['meta_prefix']]
 
-            value_meta = [data_meta.get(meta_key) for meta_key in decorations]
+            value = self.decorate_meta(value, data_meta, context['flat'])
+
+        return value
 
-            if context['flat']:
+    def decorate_meta(self, value, data_meta, flat):
+        if self.decorations:
+            value_meta = [data_meta.get(meta_key) for meta_key in self.meta_keys]
+
+            if flat:
                 value = (
                     value,
                     value_meta[0] if isinstance(self.decorations, str) else value_meta,
@@ -255,7 +747,7 @@ class DataFileAggregator(abc.ABC):
             else:
                 value = {
                     'Measurement': value,
-                    'Meta': dict(zip(self.decorations, value_meta)),
+                    'Meta': dict(zip(self.meta_keys, value_meta)),
                 }
 
         return value
@@ -269,13 +761,50 @@ class DataFileAggregator(abc.ABC):
             ', '.join(f'{key}={value!r}' for (key, value) in self.__dict__.items()),
         )
 
+    def select(self, block, stop=None):
+        """Generate the indices and values of the given `block` which are
+        present and which satisfy the "where" filter.
+
+        Only the first `stop` datasets of the block are considered, if
+        specified.
+
+        """
+        values = block.get_values(self.read_keys)
+
+        if stop is not None:
+            values = itertools.islice(values, stop)
+
+        return (
+            (index, value) for (index, value) in enumerate(values)
+            if value is not MISSING and self.where(value)
+        )
+
+    def decorate_block(self, value, block, index, context):
+        if self.decorations:
+            data_meta = block.get_meta(index, self.meta_keys)
+            value = self.decorate_meta(value, data_meta, context['flat'])
+
+        return value
+
     @abc.abstractmethod
     def __call__(self, current_values, current_result, context):
         pass
 
+    def reduce_block(self, block, current_result, context):
+        """Aggregate a `Block` of datasets.
+
+        Unlike `__call__`, which is applied to each dataset in turn,
+        this method -- where supported -- is applied to blocks of
+        datasets.
+
+        """
+        raise NotImplementedError
+
 
 class Last(DataFileAggregator):
 
+    batchable = True
+
     def __call__(self, current_values, _current_result, context):
         try:
             value = self.get_uservalue(current_values)
@@ -284,21 +813,35 @@ class Last(DataFileAggregator):
 
         raise self.stop_reduce(self.decorate(value, context))
 
+    def reduce_block(self, block, _current_result, context):
+        try:
+            (index, value) = next(self.select(block))
+        except StopIteration:
+            return None
+
+        raise self.stop_reduce(self.decorate_block(value, block, index, context))
+
 
 class Multi(DataFileAggregator):
 
+    batchable = True
+
     def __init__(self, read_key, age_s, *, decorate=None, reverse=False, where=where_true):
         super().__init__(read_key, decorate=decorate, where=where)
         self.age_s = age_s
         self.reverse = reverse
 
+    @property
+    def scan_key(self):
+        return super().scan_key + (self.reverse,)
+
     def __call__(self, current_values, collected, context):
         if collected is None:
             collected = collections.deque()
 
         data = context['data']
         data_meta = data[context['meta_prefix']]
-        timestamp = data_meta['Time']
+        timestamp = data_meta[TIME_KEY]
         if time.time() - timestamp >= self.age_s:
             raise self.make_stop(collected)
 
@@ -319,6 +862,27 @@ class Multi(DataFileAggregator):
 
         return collected
 
+    def reduce_block(self, block, collected, context):
+        if collected is None:
+            collected = collections.deque()
+
+        stop = block.age_index(self.age_s, context['now'])
+
+        selected = (
+            self.decorate_block(value, block, index, context)
+            for (index, value) in self.select(block, stop)
+        )
+
+        if self.reverse:
+            collected.extendleft(selected)
+        else:
+            collected.extend(selected)
+
+        if stop < block.size or block.last:
+            raise self.make_stop(collected)
+
+        return collected
+
     def make_stop(self, values):
         result = self.finalize(values)
         return self.stop_reduce(result)
@@ -327,16 +891,128 @@ class Multi(DataFileAggregator):
         return list(values)
 
 
-class StdDev(Multi):
+class Streaming(DataFileAggregator):
+    """Aggregator of the numeric values of the past `age_s` seconds,
+    computed in constant memory.
 
-    def __init__(self, *args, **kwargs):
-        if 'decorate' in kwargs:
-            raise TypeError("'decorate' is an invalid keyword argument for StdDev()")
+    Values are accumulated into a mergeable `Summary` (see: `summary`),
+    rather than collected, and the summary's result is reported. (Of
+    multiple read keys, the values of all are accumulated together.)
 
-        super().__init__(*args, **kwargs)
+    """
+    batchable = True
+
+    @abc.abstractmethod
+    def make_summary(self):
+        pass
+
+    def __init__(self, read_key, age_s, *, where=where_true):
+        super().__init__(read_key, where=where)
+        self.age_s = age_s
+
+    def iter_numeric(self, value):
+        """Generate the (finite) numeric values of the (multikey) `value`."""
+        values = (value,) if isinstance(self.read_key, str) else value
+
+        for value0 in values:
+            if is_numeric(value0) and math.isfinite(value0):
+                yield value0
+
+    def __call__(self, current_values, summarized, context):
+        if summarized is None:
+            summarized = self.make_summary()
+
+        data = context['data']
+        data_meta = data[context['meta_prefix']]
+        timestamp = data_meta[TIME_KEY]
+        if time.time() - timestamp >= self.age_s:
+            raise self.stop_reduce(summarized.result())
 
-    def finalize(self, values):
         try:
-            return statistics.stdev(values)
-        except statistics.StatisticsError:
-            return None
+            current_value = self.get_uservalue(current_values)
+        except LookupError:
+            pass
+        else:
+            for value in self.iter_numeric(current_value):
+                summarized.add(value)
+
+        if context['last']:
+            raise self.stop_reduce(summarized.result())
+
+        return summarized
+
+    def reduce_block(self, block, summarized, context):
+        if summarized is None:
+            summarized = self.make_summary()
+
+        stop = block.age_index(self.age_s, context['now'])
+
+        for (_index, value) in self.select(block, stop):
+            for value0 in self.iter_numeric(value):
+                summarized.add(value0)
+
+        if stop < block.size or block.last:
+            raise self.stop_reduce(summarized.result())
+
+        return summarized
+
+
+class Count(Streaming):
+
+    def make_summary(self):
+        return CountSummary()
+
+
+class Mean(Streaming):
+
+    def make_summary(self):
+        return MeanSummary()
+
+
+class Min(Streaming):
+
+    def make_summary(self):
+        return MinSummary()
+
+
+class Max(Streaming):
+
+    def make_summary(self):
+        return MaxSummary()
+
+
+class StdDev(Streaming):
+    """Sample standard deviation of the values of the past `age_s`
+    seconds.
+
+    (`reverse` -- accepted as when StdDev collected its values as a
+    `Multi` -- is ignored, as the order of values does not affect the
+    result.)
+
+    """
+    def __init__(self, read_key, age_s, *, reverse=False, where=where_true):
+        super().__init__(read_key, age_s, where=where)
+
+    def make_summary(self):
+        return StdDevSummary()
+
+
+class Percentile(Streaming):
+    """Estimate the `percent`-th percentile of values (to within the
+    `relative_accuracy` of the underlying sketch).
+
+    """
+    def __init__(self, read_key, age_s, percent, *, relative_accuracy=0.01, where=where_true):
+        if not 0 <= percent <= 100:
+            raise ValueError(f"percent expects value in [0, 100] not: {percent}")
+
+        super().__init__(read_key, age_s, where=where)
+        self.percent = percent
+        self.relative_accuracy = relative_accuracy
+
+    @property
+    def scan_key(self):
+        return super().scan_key + (self.percent, self.relative_accuracy)
+
+    def make_summary(self):
+        return QuantileSketch(self.percent / 100, self.relative_accuracy)
@@ -0,0 +1,643 @@
+"""Daily bundles of archived data files.
+
+Archived data files are small JSON documents: reading many of these
+costs an `open` and a `read` (and an inode) apiece. Instead, the data
+files of each closed day may be compacted (see `compact_dir`) into a
+bundle file: a series of independently-compressed gzip blocks of
+newline-delimited JSON (NDJSON), followed by a compressed index of the
+bundle's members, and a footer locating this index. (Each of these is a
+gzip member: the bundle as a whole may be read as compressed NDJSON --
+its final line being its index.)
+
+Bundles are written to a directory of their own -- rather than to the
+directory of the data files they bundle, which may be managed by
+another application. Once a bundle is written and verified, the data
+files it bundles are removed (unless they are to be kept) -- such that
+these are not stored, nor listed, twice. A bundle is named for its day -- *e.g.*
+`bundle-20240131.ndjson.gz` -- with a numeric suffix for any further
+bundle of the same day (of data files arriving late).
+
+Members are addressed as though the bundle were their directory --
+*e.g.* `bundle/bundle-20240131.ndjson.gz/result-1706659200-ping.json`
+-- such that these retain their names (and, by way of the index, their
+signatures). A directory's listing is merged with the members of its
+bundles by these names (see `merge`), data files found in both being
+read from their bundles.
+
+Members are read via `load_json`, retrieving only the block in which
+each is found; (recently-read blocks are cached, such that reading a
+bundle's members in order decompresses each block once).
+
+"""
+import collections
+import datetime
+import gzip
+import heapq
+import itertools
+import json
+import os
+import pathlib
+import re
+import struct
+import threading
+import zlib
+
+from loguru import logger as log
+
+from .base import AbstractDataFileBank, JSON_DECODER, NAME_TIME_PATTERN
+
+
+BUNDLE_VERSION = 1
+
+BUNDLE_PATTERN = re.compile(r'^bundle-(?P<day>[0-9]{8})(?:-(?P<count>[0-9]+))?\.ndjson\.gz$')
+
+BUNDLE_NAME_FORMAT = 'bundle-{day:%Y%m%d}{suffix}.ndjson.gz'
+
+# data files (documents) compressed together in each block of a bundle
+BLOCK_SIZE = 64
+
+#
+# the bundle's footer is itself an (empty) gzip member, recording the offset of the
+# bundle's (compressed) index in its header's "extra" field -- such that the bundle as
+# a whole remains a valid (multi-member) gzip file
+#
+# (header: magic, mtime, xfl, os, xlen, subfield id, subfield length, index offset;
+# empty deflate stream; trailer: crc32, size)
+#
+FOOTER = struct.Struct('<4sIBBH2sHQ2sII')
+FOOTER_HEADER = b'\x1f\x8b\x08\x04'
+FOOTER_SUBFIELD = b'NX'
+FOOTER_DEFLATE = b'\x03\x00'
+
+
+def pack_footer(offset):
+    return FOOTER.pack(FOOTER_HEADER, 0, 0, 255, 12, FOOTER_SUBFIELD, 8, offset,
+                       FOOTER_DEFLATE, 0, 0)
+
+
+def unpack_footer(data):
+    (header, _mtime, _xfl, _os, xlen, subfield, length, offset,
+     deflate, _crc, _size) = FOOTER.unpack(data)
+
+    if (header, xlen, subfield, length, deflate) != (
+        FOOTER_HEADER, 12, FOOTER_SUBFIELD, 8, FOOTER_DEFLATE,
+    ):
+        return None
+
+    return offset
+
+
+class BundleError(ValueError):
+    """Bundle file is malformed."""
+
+
+# errors of reading data files -- including the members of malformed bundles
+DATA_FILE_READ_ERRORS = (*AbstractDataFileBank.DATA_FILE_READ_ERRORS, BundleError)
+
+
+class BundleIndex:
+    """Index of the members of the bundle at `path`.
+
+    Each member's name is mapped to its `(block, line, mtime_ns, size)`
+    -- its location within the bundle, and the modification time and
+    size of the data file from which it was compacted.
+
+    """
+    def __init__(self, path, signature, blocks, members):
+        self.path = path
+        self.signature = signature
+        self.blocks = blocks
+        self.members = members
+        self.names = sorted(members)
+
+    def __len__(self):
+        return len(self.members)
+
+    @classmethod
+    def read(cls, path):
+        """Read the index of the bundle at `path`.
+
+        Raises `OSError` if the bundle cannot be read, and `BundleError`
+        if it is malformed.
+
+        """
+        with open(path, 'rb') as fd:
+            stat = os.fstat(fd.fileno())
+
+            if stat.st_size < FOOTER.size:
+                raise BundleError(f'bundle truncated: {path}')
+
+            fd.seek(stat.st_size - FOOTER.size)
+            offset = unpack_footer(fd.read(FOOTER.size))
+
+            if offset is None or offset > stat.st_size - FOOTER.size:
+                raise BundleError(f'bundle footer invalid: {path}')
+
+            fd.seek(offset)
+            encoded = fd.read(stat.st_size - FOOTER.size - offset)
+
+        try:
+            index = json.loads(gzip.decompress(encoded))
+        except (EOFError, gzip.BadGzipFile, zlib.error, ValueError) as exc:
+            raise BundleError(f'bundle index invalid: {path}: {exc}') from exc
+
+        if index.get('version') != BUNDLE_VERSION:
+            raise BundleError(f'bundle version unsupported: {path}: {index.get("version")}')
+
+        members = {name: (block, line, mtime_ns, size)
+                   for (name, block, line, mtime_ns, size) in index['members']}
+
+        return cls(path, (stat.st_mtime_ns, stat.st_size), index['blocks'], members)
+
+    def read_block(self, block):
+        """Read the (decompressed) lines of `block` of the bundle."""
+        (offset, length) = self.blocks[block]
+
+        with open(self.path, 'rb') as fd:
+            fd.seek(offset)
+            compressed = fd.read(length)
+
+        try:
+            return gzip.decompress(compressed).splitlines()
+        except (EOFError, gzip.BadGzipFile, zlib.error) as exc:
+            raise BundleError(f'bundle block invalid: {self.path}#{block}: {exc}') from exc
+
+
+class BundleReader:
+    """Reader of bundles' members.
+
+    The indexes of up to `index_size` bundles, and the lines of up to
+    `block_size` blocks, are cached. (A bundle's index is re-read should
+    the bundle be replaced.)
+
+    """
+    def __init__(self, index_size=64, block_size=8):
+        self.index_size = index_size
+        self.block_size = block_size
+
+        self.indexes = collections.OrderedDict()
+        self.blocks = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_index(self, path):
+        """Retrieve the index of the bundle at `path`."""
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            index = self.indexes.get(path)
+
+            if index is not None and index.signature == signature:
+                self.indexes.move_to_end(path)
+                return index
+
+        index = BundleIndex.read(path)
+
+        with self.lock:
+            self.indexes[path] = index
+
+            while len(self.indexes) > self.index_size:
+                self.indexes.popitem(last=False)
+
+        return index
+
+    def get_member(self, path):
+        """Retrieve the bundle index and index entry of member `path`.
+
+        Raises `FileNotFoundError` if there is no such member.
+
+        """
+        index = self.get_index(path.parent)
+
+        try:
+            return (index, index.members[path.name])
+        except KeyError:
+            raise FileNotFoundError(f'no such bundle member: {path}') from None
+
+    def read(self, path):
+        """Read the (compact, encoded) JSON document of member `path`."""
+        (index, (block, line, _mtime_ns, _size)) = self.get_member(path)
+
+        key = (index.path, index.signature, block)
+
+        with self.lock:
+            lines = self.blocks.get(key)
+
+            if lines is not None:
+                self.blocks.move_to_end(key)
+
+        if lines is None:
+            lines = index.read_block(block)
+
+            with self.lock:
+                self.blocks[key] = lines
+
+                while len(self.blocks) > self.block_size:
+                    self.blocks.popitem(last=False)
+
+        try:
+            return lines[line]
+        except IndexError:
+            raise BundleError(f'bundle member missing from block: {path}') from None
+
+    def clear(self):
+        with self.lock:
+            self.indexes.clear()
+            self.blocks.clear()
+
+
+BUNDLE_READER = BundleReader()
+
+
+def is_bundle(path):
+    return BUNDLE_PATTERN.search(path.name) is not None
+
+
+def is_member(path):
+    return is_bundle(path.parent)
+
+
+def load_json(path):
+    """Decode the JSON document of the data file at `path` -- whether a
+    file or the member of a bundle.
+
+    """
+    if is_member(path):
+        return JSON_DECODER.loads(BUNDLE_READER.read(path))
+
+    return JSON_DECODER.load_path(path)
+
+
+def get_signature(path):
+    """Signature -- modification time and size -- of the data file at
+    `path`.
+
+    The signature of a bundle's member is that of the data file from
+    which it was compacted.
+
+    """
+    if is_member(path):
+        (_index, (_block, _line, mtime_ns, size)) = BUNDLE_READER.get_member(path)
+        return (mtime_ns, size)
+
+    stat = path.stat()
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def get_bundle_key(path):
+    """Sort key of the bundle at `path`: its day and then its order of
+    writing (among the bundles of its day).
+
+    """
+    match = BUNDLE_PATTERN.search(path.name)
+    return (match.group('day'), int(match.group('count') or 0))
+
+
+def sort_bundles(paths):
+    """Sort the bundles among `paths` by their day and order of writing
+    (see `get_bundle_key`); other paths are omitted.
+
+    """
+    return sorted((path for path in paths if is_bundle(path)), key=get_bundle_key)
+
+
+def list_bundles(path_dir):
+    """List the paths of the bundles of directory `path_dir` (see
+    `sort_bundles`).
+
+    A directory which does not (yet) exist has no bundles.
+
+    """
+    path_dir = pathlib.Path(path_dir)
+
+    try:
+        with os.scandir(path_dir) as entries:
+            names = [entry.name for entry in entries]
+    except FileNotFoundError:
+        return []
+
+    return sort_bundles(path_dir / name for name in names)
+
+
+def iter_members(path):
+    """Generate the paths of the members of the bundle at `path`, in
+    descending order.
+
+    A bundle which cannot be read is logged and skipped.
+
+    """
+    try:
+        index = BUNDLE_READER.get_index(path)
+    except (OSError, BundleError) as exc:
+        log.warning('unreadable bundle | {} | {}: {}', path, exc.__class__.__name__, exc)
+        return
+
+    for name in reversed(index.names):
+        yield path / name
+
+
+def iter_bundled(paths):
+    """Generate the paths of the members of the bundles at `paths` --
+    as sorted by `sort_bundles` -- in descending order.
+
+    Bundles are read a day at a time, latest first. A data file bundled
+    more than once (having changed since) is generated as the member of
+    the latest bundle of its day.
+
+    """
+    days = itertools.groupby(reversed(paths), key=lambda path: get_bundle_key(path)[0])
+
+    for (_day, day_paths) in days:
+        members = {}
+
+        for path in day_paths:
+            for path_member in iter_members(path):
+                members.setdefault(path_member.name, path_member)
+
+        for name in sorted(members, reverse=True):
+            yield members[name]
+
+
+def merge(paths, members, limit):
+    """List (at most `limit` of) the data file `paths` of a directory
+    and the `members` of its bundles, in descending order of name.
+
+    Both `paths` and `members` are expected in descending order. A data
+    file which is also a member of a bundle is listed as the member.
+
+    """
+    # (of equal names, members are generated first)
+    merged = heapq.merge(members, paths, key=lambda path: path.name, reverse=True)
+
+    names = set()
+    listed = []
+
+    for path in merged:
+        if len(listed) == limit:
+            break
+
+        if path.name not in names:
+            names.add(path.name)
+            listed.append(path)
+
+    return listed
+
+
+def get_name_day(name):
+    """Determine the (UTC) day of measurement of the data file of the
+    given `name` -- or `None` if the file is not to be bundled.
+
+    """
+    if name.startswith('.') or not name.endswith('.json'):
+        return None
+
+    match = NAME_TIME_PATTERN.search(name)
+
+    if match is None:
+        return None
+
+    return datetime.datetime.fromtimestamp(int(match.group(1)), datetime.timezone.utc).date()
+
+
+def iter_day_indexes(path_dir, day):
+    """Generate the indexes of the bundles of `day` in directory
+    `path_dir`, latest first.
+
+    Bundles which cannot be read are skipped.
+
+    """
+    paths = sort_bundles(pathlib.Path(path_dir).glob(f'bundle-{day:%Y%m%d}*.ndjson.gz'))
+
+    for path in reversed(paths):
+        try:
+            yield BUNDLE_READER.get_index(path)
+        except (OSError, BundleError):
+            continue
+
+
+def locate(path_dir, name):
+    """Locate the member of the given `name` among the bundles of
+    directory `path_dir`.
+
+    `None` is returned if no such member is found.
+
+    """
+    if (day := get_name_day(name)) is None:
+        return None
+
+    for index in iter_day_indexes(path_dir, day):
+        if name in index.members:
+            return index.path / name
+
+    return None
+
+
+def get_bundle_path(path_dir, day):
+    """Construct a path for a (new) bundle of `day` under `path_dir`."""
+    for count in itertools.count():
+        path = path_dir / BUNDLE_NAME_FORMAT.format(day=day, suffix=f'-{count}' if count else '')
+
+        if not path.exists():
+            return path
+
+
+def fsync_dir(path_dir):
+    fd = os.open(path_dir, os.O_RDONLY)
+
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_bundle(path, paths, block_size=BLOCK_SIZE):
+    """Write the bundle at `path` of the data files at `paths`.
+
+    The bundle is written to a temporary file, synced to disk and only
+    then moved into place.
+
+    Data files which cannot be read or decoded are omitted. Returns the
+    list of `(path, signature)` of the data files bundled.
+
+    """
+    path_tmp = path.with_name(f'.{path.name}.tmp')
+
+    bundled = []
+    blocks = []
+    members = []
+    lines = []
+
+    with open(path_tmp, 'wb') as fd:
+        def write_block():
+            compressed = gzip.compress(b'\n'.join(lines) + b'\n', mtime=0)
+            blocks.append((fd.tell(), len(compressed)))
+            fd.write(compressed)
+            lines.clear()
+
+        for path_file in sorted(paths):
+            try:
+                stat = path_file.stat()
+                document = JSON_DECODER.load_path(path_file)
+            except OSError:
+                continue
+            except ValueError as exc:
+                log.warning('bundle | leaving unreadable data file | {} | {}: {}',
+                            path_file, exc.__class__.__name__, exc)
+                continue
+
+            signature = (stat.st_mtime_ns, stat.st_size)
+
+            members.append((path_file.name, len(blocks), len(lines), *signature))
+            lines.append(json.dumps(document, separators=(',', ':')).encode())
+            bundled.append((path_file, signature))
+
+            if len(lines) == block_size:
+                write_block()
+
+        if lines:
+            write_block()
+
+        offset = fd.tell()
+        index = {'version': BUNDLE_VERSION, 'blocks': blocks, 'members': members}
+        fd.write(gzip.compress(json.dumps(index).encode(), mtime=0))
+        fd.write(pack_footer(offset))
+
+        fd.flush()
+        os.fsync(fd.fileno())
+
+    if not bundled:
+        path_tmp.unlink()
+        return bundled
+
+    os.replace(path_tmp, path)
+    fsync_dir(path.parent)
+
+    return bundled
+
+
+def verify_bundle(path, bundled):
+    """Verify the bundle at `path` (as synced to disk) of the data files
+    `bundled` (see `write_bundle`).
+
+    The bundle's index is read anew, and compared with the signatures of
+    the data files bundled; and, each of its blocks is decompressed.
+
+    Raises `OSError` if the bundle cannot be read, and `BundleError` if
+    it does not match the data files bundled.
+
+    """
+    index = BundleIndex.read(path)
+
+    for (path_file, signature) in bundled:
+        try:
+            (_block, _line, *member_signature) = index.members[path_file.name]
+        except KeyError:
+            raise BundleError(f'bundle member missing: {path}/{path_file.name}') from None
+
+        if tuple(member_signature) != signature:
+            raise BundleError(f'bundle member signature mismatch: {path}/{path_file.name}')
+
+    block_sizes = collections.Counter(block for (block, *_entry) in index.members.values())
+
+    for block in range(len(index.blocks)):
+        if len(index.read_block(block)) != block_sizes[block]:
+            raise BundleError(f'bundle block incomplete: {path}#{block}')
+
+
+def get_bundled(path_dir, day):
+    """Map the name of each data file of `day` bundled under directory
+    `path_dir` to its signature (as of its latest bundling).
+
+    """
+    bundled = {}
+
+    for index in iter_day_indexes(path_dir, day):
+        for (name, (_block, _line, mtime_ns, size)) in index.members.items():
+            bundled.setdefault(name, (mtime_ns, size))
+
+    return bundled
+
+
+def compact_dir(path_dir, path_bundles, before, *, block_size=BLOCK_SIZE, remove=True):
+    """Compact the data files of directory `path_dir` measured on days
+    (UTC) preceding date `before` into bundles under directory
+    `path_bundles`.
+
+    Each day's data files are bundled once: only those not yet bundled
+    (or since changed) are written to a (further) bundle of their day.
+
+    Each bundle written is verified (see `verify_bundle`); a bundle
+    which fails verification is discarded.
+
+    Data files bundled are then removed (unless changed since bundling)
+    -- unless `remove` is false, in which case data files are left in
+    place.
+
+    Returns a list of the `(path, count)` of each bundle written.
+
+    """
+    path_dir = pathlib.Path(path_dir)
+    path_bundles = pathlib.Path(path_bundles)
+
+    days = collections.defaultdict(list)
+
+    with os.scandir(path_dir) as entries:
+        for entry in entries:
+            if (day := get_name_day(entry.name)) is not None and day < before and entry.is_file():
+                days[day].append(path_dir / entry.name)
+
+    results = []
+
+    for (day, paths) in sorted(days.items()):
+        bundled = get_bundled(path_bundles, day)
+
+        paths_new = []
+
+        for path_file in paths:
+            try:
+                signature = get_signature(path_file)
+            except OSError:
+                continue
+
+            if bundled.get(path_file.name) != signature:
+                paths_new.append(path_file)
+
+        if paths_new:
+            path = get_bundle_path(path_bundles, day)
+
+            try:
+                written = write_bundle(path, paths_new, block_size)
+            except OSError as exc:
+                log.error('bundle | failed to write {} | {}', path, exc)
+                continue
+
+            if written:
+                try:
+                    verify_bundle(path, written)
+                except (OSError, BundleError) as exc:
+                    log.error('bundle | discarding unverified bundle {} | {}', path, exc)
+
+                    try:
+                        path.unlink()
+                    except OSError:
+                        pass
+
+                    continue
+
+                results.append((path, len(written)))
+
+                log.info('bundle | wrote {} ({} data files)', path, len(written))
+
+                bundled.update((path_file.name, signature) for (path_file, signature) in written)
+
+        if not remove:
+            continue
+
+        for path_file in paths:
+            try:
+                if bundled.get(path_file.name) == get_signature(path_file):
+                    path_file.unlink()
+            except OSError as exc:
+                log.warning('bundle | failed to remove {} | {}', path_file, exc)
+
+    return results
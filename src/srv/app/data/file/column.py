@@ -0,0 +1,792 @@
+"""Column store compiled from Netrics data files.
+
+Data files' numeric measurements are "ingested" into per-key arrays --
+one array of row numbers, one of values, and one flagging integer values
+-- alongside such arrays of each file's `Meta.Time`. Queries may then be
+answered by slicing these arrays, rather than by reading and parsing the
+data files themselves.
+
+Files are ingested in the order of their names; (in so far as these
+are consistently labeled by timestamp, rows are therefore stored in
+ascending time order). The names of ingested files are recorded, such
+that a file arriving late -- whose name sorts before that of a file
+already ingested -- is ingested in its place, (the rows following it
+re-ingested).
+
+Arrays are persisted to disk, and appended to as files are ingested.
+Only the most recent `retain` rows are guaranteed to be retained: older
+rows are periodically compacted away.
+
+The store is updated only by ingestion (see `LocalDataFileBank.ingest`)
+-- never by the queries it answers. Rolling windows of aggregates (see
+`app.data.file.rolling`) are in turn maintained from the store's rows.
+
+"""
+import array
+import bisect
+import json
+import math
+import os
+import pathlib
+import threading
+import urllib.parse
+
+from loguru import logger as log
+
+from app.lib.number import is_numeric
+
+from . import bundle
+from .base import (
+    Block,
+    DATAFILE_LIMIT,
+    DATAFILE_PREFIX,
+    META_PREFIX,
+    MISSING,
+    TIME_KEY,
+    get_multikey,
+    iter_block_sizes,
+    set_multikey,
+)
+
+
+STORE_VERSION = 2
+
+# integers beyond which floats are inexact (and which are therefore not stored)
+MAX_EXACT_INT = 2 ** 53
+
+NAMESPACES = ('data', 'meta')
+
+
+def iter_leaves(values, prefix=''):
+    """Generate the (multikey, value) pairs of the leaves of nested
+    dictionary `values`.
+
+    """
+    for (key, value) in values.items():
+        multikey = f'{prefix}{key}'
+
+        if isinstance(value, dict):
+            yield from iter_leaves(value, f'{multikey}.')
+        else:
+            yield (multikey, value)
+
+
+def is_storable(value):
+    return is_numeric(value) and (not isinstance(value, int) or abs(value) <= MAX_EXACT_INT)
+
+
+def extract_row(full_data, prefix=DATAFILE_PREFIX, meta_prefix=META_PREFIX):
+    """Extract the row to be ingested from the contents of a data file.
+
+    Returns a tuple of the file's timestamp and the (multikey, value)
+    leaves of its data and of its meta data; or, `None` if the file
+    cannot be ingested.
+
+    (Rows are compact; as such, these may be extracted by the worker
+    processes which parse data files -- see `warm` -- rather than by
+    the store.)
+
+    """
+    try:
+        data_meta = full_data[meta_prefix]
+        timestamp = data_meta[TIME_KEY]
+        data = get_multikey(prefix, full_data) if prefix else full_data
+    except (KeyError, TypeError):
+        return None
+
+    if not is_storable(timestamp) or not isinstance(data, dict):
+        return None
+
+    meta = {key: value for (key, value) in data_meta.items() if key != TIME_KEY}
+
+    return (timestamp, list(iter_leaves(data)), list(iter_leaves(meta)))
+
+
+def read_array(path, typecode):
+    values = array.array(typecode)
+
+    try:
+        contents = path.read_bytes()
+    except FileNotFoundError:
+        return values
+
+    # discard any partially-written item
+    values.frombytes(contents[:len(contents) - len(contents) % values.itemsize])
+
+    return values
+
+
+def write_array(path, values, mode='wb'):
+    with path.open(mode) as fd:
+        values.tofile(fd)
+
+
+def write_lines(path, lines, mode='w'):
+    with path.open(mode) as fd:
+        fd.writelines(f'{line}\n' for line in lines)
+
+
+def replace_file(path, write):
+    path_tmp = path.with_name(f'.{path.name}.tmp')
+    write(path_tmp)
+    os.replace(path_tmp, path)
+
+
+class Column:
+    """Sparse array of measurement values indexed by ascending row
+    number.
+
+    Values are stored as floats (null values as NaN), each flagged if
+    originally an integer, such that these are restored as such.
+
+    """
+    __slots__ = ('rows', 'values', 'ints')
+
+    ROW_TYPE = 'q'
+
+    VALUE_TYPE = 'd'
+
+    INT_TYPE = 'B'
+
+    def __init__(self, rows=None, values=None, ints=None):
+        self.rows = array.array(self.ROW_TYPE) if rows is None else rows
+        self.values = array.array(self.VALUE_TYPE) if values is None else values
+        self.ints = array.array(self.INT_TYPE) if ints is None else ints
+
+    def __len__(self):
+        return len(self.rows)
+
+    def append(self, row, value):
+        self.rows.append(row)
+        self.values.append(value)
+        self.ints.append(isinstance(value, int))
+
+    def index(self, row, hi=None):
+        """Index of the first entry at or following `row`."""
+        return bisect.bisect_left(self.rows, row, 0, len(self.rows) if hi is None else hi)
+
+    def slice(self, start, stop):
+        """Copy of the column's entries with rows in [`start`, `stop`)."""
+        (index0, index1) = (self.index(start), self.index(stop))
+        return self.__class__(self.rows[index0:index1],
+                              self.values[index0:index1],
+                              self.ints[index0:index1])
+
+    @staticmethod
+    def get_value(value, is_int=False):
+        if is_int:
+            return int(value)
+
+        # null values are stored as NaN
+        return None if math.isnan(value) else value
+
+    def get(self, index):
+        """Value of the entry at `index`."""
+        return self.get_value(self.values[index], self.ints[index])
+
+    @classmethod
+    def _get_paths_(cls, path_base):
+        return tuple(path_base.with_name(f'{path_base.name}.{suffix}')
+                     for suffix in ('row', 'val', 'int'))
+
+    @classmethod
+    def read(cls, path_base):
+        """Read a column from disk.
+
+        Returns a tuple of the column and a flag indicating whether its
+        files' contents were intact.
+
+        """
+        paths = cls._get_paths_(path_base)
+
+        arrays = [read_array(path, typecode)
+                  for (path, typecode) in zip(paths, (cls.ROW_TYPE, cls.VALUE_TYPE, cls.INT_TYPE))]
+
+        size = min(len(values) for values in arrays)
+
+        for values in arrays:
+            del values[size:]
+
+        try:
+            intact = all(path.stat().st_size == size * values.itemsize
+                         for (path, values) in zip(paths, arrays))
+        except FileNotFoundError:
+            intact = False
+
+        return (cls(*arrays), intact)
+
+    def write(self, path_base, offset=0):
+        """Write the column's entries to disk.
+
+        If an `offset` is specified, the column's entries following this
+        index are *appended* to its files.
+
+        """
+        for (path, values) in zip(self._get_paths_(path_base),
+                                  (self.rows, self.values, self.ints)):
+            if offset:
+                write_array(path, values[offset:], 'ab')
+            else:
+                replace_file(path, lambda path_tmp: write_array(path_tmp, values))
+
+    @classmethod
+    def unlink(cls, path_base):
+        for path in cls._get_paths_(path_base):
+            path.unlink(missing_ok=True)
+
+
+class ColumnStore:
+    """Column store compiled from Netrics data files.
+
+    Rows are numbered absolutely, from the first ingested: rows in
+    [`start`, `stop`) are retained.
+
+    """
+    DATA_FILE_READ_ERRORS = bundle.DATA_FILE_READ_ERRORS
+
+    def __init__(self,
+                 path,
+                 *,
+                 retain=DATAFILE_LIMIT,
+                 prefix=DATAFILE_PREFIX,
+                 meta_prefix=META_PREFIX):
+        self.path = pathlib.Path(path)
+        self.retain = retain
+        self.prefix = prefix
+        self.meta_prefix = meta_prefix
+
+        self.enabled = True
+        self.lock = threading.RLock()
+
+        # version of the data files as of their last ingestion (as recorded by
+        # the ingesting bank -- see `LocalDataFileBank.ingest`)
+        self.ingested = None
+
+        # incremented whenever rows are discarded other than by compaction (such
+        # that those maintaining state derived from rows may discard it)
+        self.revision = 0
+
+        self._loaded_ = False
+        self._reset_()
+
+    def _reset_(self):
+        self.revision += 1
+
+        self.start = self.stop = 0
+        self.times = Column()
+        self.columns = {namespace: {} for namespace in NAMESPACES}
+        self.opaque = {namespace: set() for namespace in NAMESPACES}
+
+        # names of ingested data files (of rows in [start, stop))
+        self.names = []
+        self.name_set = set()
+
+        # names of data files which could not be ingested
+        self.skipped = set()
+
+    def _get_path_(self, namespace, key):
+        return self.path / namespace / urllib.parse.quote(key, safe='')
+
+    @property
+    def _state_path_(self):
+        return self.path / 'state.json'
+
+    @property
+    def _times_path_(self):
+        return self.path / 'time'
+
+    @property
+    def _names_path_(self):
+        return self.path / 'names'
+
+    def _load_(self):
+        if self._loaded_:
+            return
+
+        self._loaded_ = True
+
+        try:
+            for namespace in NAMESPACES:
+                (self.path / namespace).mkdir(parents=True, exist_ok=True)
+        except OSError:
+            log.error("failed to create column store directory: {}", self.path)
+            self.enabled = False
+            return
+
+        try:
+            state = json.loads(self._state_path_.read_text())
+        except FileNotFoundError:
+            # (truncate any files lacking their state)
+            self._write_()
+            return
+        except (OSError, ValueError) as exc:
+            log.warning('column store | discarding unreadable state | {0.__class__.__name__}: {0}',
+                        exc)
+            self._write_()
+            return
+
+        if state.get('version') != STORE_VERSION:
+            log.info('column store | discarding incompatible version: {}', state.get('version'))
+            self._write_()
+            return
+
+        self.start = state['start']
+        self.stop = state['stop']
+        self.skipped = set(state['skipped'])
+        self.opaque = {namespace: set(state['opaque'][namespace]) for namespace in NAMESPACES}
+
+        (self.times, _intact) = Column.read(self._times_path_)
+
+        try:
+            self.names = self._names_path_.read_text().splitlines()
+        except FileNotFoundError:
+            self.names = []
+
+        if min(len(self.times), len(self.names)) < self.stop - self.start:
+            log.warning('column store | discarding incomplete time or name array')
+            self._reset_()
+            self._write_()
+            return
+
+        # contents may exceed state if interrupted while writing
+        repair = (len(self.times) > self.stop - self.start or
+                  len(self.names) > self.stop - self.start)
+
+        self.times = self.times.slice(self.start, self.stop)
+        del self.names[self.stop - self.start:]
+        self.name_set = set(self.names)
+
+        for namespace in NAMESPACES:
+            for path_rows in (self.path / namespace).glob('*.row'):
+                key = urllib.parse.unquote(path_rows.name[:-4])
+                (column, intact) = Column.read(path_rows.with_name(path_rows.name[:-4]))
+
+                repair = repair or not intact
+
+                if column.index(self.stop) < len(column):
+                    column = column.slice(self.start, self.stop)
+                    repair = True
+
+                if column:
+                    self.columns[namespace][key] = column
+
+        if repair:
+            log.info('column store | repairing interrupted write')
+            self._write_()
+
+        log.debug('column store | loaded rows={} last={}', self.stop - self.start, self.last_name)
+
+    @property
+    def last_name(self):
+        return self.names[-1] if self.names else None
+
+    def _write_state_(self):
+        state = {
+            'version': STORE_VERSION,
+            'start': self.start,
+            'stop': self.stop,
+            'skipped': sorted(self.skipped),
+            'opaque': {namespace: sorted(self.opaque[namespace]) for namespace in NAMESPACES},
+        }
+        replace_file(self._state_path_, lambda path: path.write_text(json.dumps(state)))
+
+    def _write_(self):
+        """Write the store's full contents to disk."""
+        self.times.write(self._times_path_)
+
+        replace_file(self._names_path_, lambda path: write_lines(path, self.names))
+
+        for namespace in NAMESPACES:
+            columns = self.columns[namespace]
+
+            for path_rows in (self.path / namespace).glob('*.row'):
+                key = urllib.parse.unquote(path_rows.name[:-4])
+
+                if key not in columns:
+                    Column.unlink(path_rows.with_name(path_rows.name[:-4]))
+
+            for (key, column) in columns.items():
+                column.write(self._get_path_(namespace, key))
+
+        self._write_state_()
+
+    def _append_(self, marks):
+        """Append the store's contents following `marks` to disk."""
+        (times_mark, column_marks) = marks
+
+        self.times.write(self._times_path_, times_mark)
+
+        write_lines(self._names_path_, self.names[times_mark:], 'a')
+
+        for namespace in NAMESPACES:
+            for (key, column) in self.columns[namespace].items():
+                mark = column_marks.get((namespace, key), 0)
+
+                if len(column) > mark:
+                    # (new columns are written in full)
+                    column.write(self._get_path_(namespace, key), mark)
+
+        self._write_state_()
+
+    def _mark_(self):
+        return (
+            len(self.times),
+            {
+                (namespace, key): len(column)
+                for namespace in NAMESPACES
+                for (key, column) in self.columns[namespace].items()
+            },
+        )
+
+    def _slice_(self, start, stop):
+        """Retain only rows in [`start`, `stop`).
+
+        Arrays are replaced rather than modified, such that snapshots of
+        these taken by readers remain valid.
+
+        """
+        if stop < self.stop:
+            self.revision += 1
+
+        self.times = self.times.slice(start, stop)
+
+        self.names = self.names[start - self.start:stop - self.start]
+        self.name_set = set(self.names)
+
+        for namespace in NAMESPACES:
+            self.columns[namespace] = {
+                key: column0
+                for (key, column) in self.columns[namespace].items()
+                if (column0 := column.slice(start, stop))
+            }
+
+        (self.start, self.stop) = (start, stop)
+
+    def _compact_(self):
+        """Discard rows beyond those to be retained."""
+        self._slice_(self.stop - self.retain, self.stop)
+
+        # names preceding those retained will not be ingested
+        if self.names:
+            self.skipped = {name for name in self.skipped if name > self.names[0]}
+
+        self._write_()
+
+        log.debug('column store | compacted to rows={}', self.stop - self.start)
+
+    def _ingest_values_(self, namespace, row, leaves):
+        columns = self.columns[namespace]
+        opaque = self.opaque[namespace]
+
+        for (key, value) in leaves:
+            if value is None:
+                value = math.nan
+            elif not is_storable(value):
+                opaque.add(key)
+                continue
+
+            try:
+                column = columns[key]
+            except KeyError:
+                column = columns[key] = Column()
+
+            column.append(row, value)
+
+    def _ingest_(self, name, extracted):
+        (timestamp, data_leaves, meta_leaves) = extracted
+
+        row = self.stop
+
+        self.times.append(row, timestamp)
+
+        self.names.append(name)
+        self.name_set.add(name)
+
+        self._ingest_values_('data', row, data_leaves)
+        self._ingest_values_('meta', row, meta_leaves)
+
+        self.stop += 1
+
+    @property
+    def row_spec(self):
+        """Arguments (following the data file's contents) with which to
+        extract this store's rows (see `extract_row`).
+
+        """
+        return (self.prefix, self.meta_prefix)
+
+    def _pending_(self, names):
+        # names preceding those retained (once compacted) are not ingested
+        floor = self.names[0] if self.start and self.names else None
+
+        return {
+            name for name in names
+            if name not in self.name_set and name not in self.skipped and (
+                floor is None or name > floor
+            )
+        }
+
+    def pending(self, paths):
+        """Return the names of the data files among `paths` which have yet
+        to be ingested.
+
+        """
+        with self.lock:
+            self._load_()
+
+            if not self.enabled:
+                return set()
+
+            return self._pending_({path.name for path in paths})
+
+    def update(self, paths, load, rows=None):
+        """Ingest the data files at `paths` which have not yet been
+        ingested.
+
+        Data files' contents are retrieved via the callable `load` --
+        unless their rows have already been extracted (see `extract_row`),
+        and are given by file name in the mapping `rows`.
+
+        Data files arriving late -- whose names precede those of files
+        already ingested -- are ingested in their place: the rows of the
+        files following these are discarded, and (of those files still
+        among `paths`) re-ingested.
+
+        Returns the number of rows ingested.
+
+        """
+        with self.lock:
+            self._load_()
+
+            if not self.enabled:
+                return 0
+
+            available = {}
+            for path in paths:
+                available.setdefault(path.name, path)
+
+            pending = self._pending_(available)
+
+            if not pending:
+                return 0
+
+            position = bisect.bisect_left(self.names, min(pending))
+
+            if position < len(self.names):
+                log.debug('column store | re-ingesting {} row(s) following late file: {}',
+                          len(self.names) - position, min(pending))
+
+                pending.update(name for name in self.names[position:] if name in available)
+
+                self._slice_(self.start, self.start + position)
+
+                marks = None
+            else:
+                marks = self._mark_()
+
+            count = 0
+
+            if rows is None:
+                rows = {}
+
+            for name in sorted(pending):
+                try:
+                    extracted = rows[name]
+                except KeyError:
+                    try:
+                        full_data = load(available[name])
+                    except FileNotFoundError:
+                        # (file may have been moved: retried upon its next listing)
+                        log.debug('column store | skipping missing file: {}', available[name])
+                        continue
+                    except self.DATA_FILE_READ_ERRORS:
+                        extracted = None
+                    else:
+                        extracted = extract_row(full_data, *self.row_spec)
+
+                if extracted is None:
+                    self.skipped.add(name)
+                else:
+                    self._ingest_(name, extracted)
+                    count += 1
+
+            if marks is None:
+                self._write_()
+            else:
+                self._append_(marks)
+
+            if self.stop - self.start > 2 * self.retain:
+                self._compact_()
+
+            log.debug('column store | ingested rows={} last={}', count, self.last_name)
+
+            return count
+
+    def _covers_(self, namespace, keys):
+        columns = self.columns[namespace]
+        opaque = self.opaque[namespace]
+
+        # (keys never seen -- or not referring to numeric leaves -- are not covered)
+        return all(key in columns and key not in opaque for key in keys)
+
+    def covers(self, keys, meta_keys=()):
+        """Determine whether the store can answer queries of the given
+        measurement `keys` and `meta_keys`.
+
+        """
+        with self.lock:
+            self._load_()
+
+            return self.enabled and (
+                self._covers_('data', keys) and
+                self._covers_('meta', (key for key in meta_keys if key != TIME_KEY))
+            )
+
+    def _snapshot_(self):
+        """Retrieve references to the store's current contents.
+
+        Columns' sizes are captured, as these may be appended to
+        concurrently.
+
+        """
+        with self.lock:
+            self._load_()
+
+            return (
+                self.start,
+                self.stop,
+                self.times,
+                {
+                    namespace: {key: (column, len(column))
+                                for (key, column) in self.columns[namespace].items()}
+                    for namespace in NAMESPACES
+                },
+            )
+
+    def iter_datasets(self, keys=(), limit=None):
+        """Generate datasets of the store's rows in descending order.
+
+        As with `AbstractDataFileBank.iter_datasets`, data are generated
+        as a tuple of:
+
+          1. the (nested) measurement data of the requested `keys`
+          2. the row's "full" data, including these and its meta data
+
+        Rows will not be generated beyond the `limit`, if specified.
+
+        """
+        for (_row, data, full_data) in self.iter_rows(keys, limit=limit):
+            yield (data, full_data)
+
+    def iter_rows(self, keys=(), start=None, stop=None, limit=None):
+        """Generate the retained rows in [`start`, `stop`) in descending
+        order, as tuples of their row number and their datasets (see
+        `iter_datasets`).
+
+        Rows will not be generated beyond the `limit`, if specified.
+
+        """
+        (base, stop0, times, columns) = self._snapshot_()
+
+        stop = stop0 if stop is None else min(stop, stop0)
+        start = base if start is None else max(start, base)
+
+        if limit is not None:
+            start = max(start, stop - limit)
+
+        data_cursors = [[key, *columns['data'][key]] for key in keys if key in columns['data']]
+        meta_cursors = [[key, *value] for (key, value) in columns['meta'].items()]
+
+        for cursor in data_cursors + meta_cursors:
+            # index of column's latest entry (preceding stop)
+            cursor[2] = cursor[1].index(stop, cursor[2]) - 1
+
+        for row in range(stop - 1, start - 1, -1):
+            data = {}
+            data_meta = {TIME_KEY: times.get(row - base)}
+
+            for (cursors, target) in ((data_cursors, data), (meta_cursors, data_meta)):
+                for cursor in cursors:
+                    (key, column, index) = cursor
+
+                    if index >= 0 and column.rows[index] == row:
+                        set_multikey(key, target, column.get(index))
+                        cursor[2] = index - 1
+
+            if self.prefix:
+                full_data = {self.meta_prefix: data_meta}
+                set_multikey(self.prefix, full_data, data)
+            else:
+                full_data = data
+                full_data[self.meta_prefix] = data_meta
+
+            yield (row, data, full_data)
+
+    def iter_blocks(self, keys=(), meta_keys=(), limit=None):
+        """Generate blocks of the store's rows in descending order.
+
+        Blocks are sliced from the store's arrays. As with
+        `AbstractDataFileBank.iter_blocks`, a final, empty block is
+        generated to indicate that rows have been exhausted.
+
+        Rows will not be generated beyond the `limit`, if specified.
+
+        """
+        (start, stop, times, columns) = self._snapshot_()
+
+        base = start
+
+        if limit is not None:
+            start = max(start, stop - limit)
+
+        if stop <= start:
+            return
+
+        meta_keys = {TIME_KEY, *meta_keys}
+
+        row1 = stop
+
+        for size in iter_block_sizes():
+            row0 = max(start, row1 - size)
+
+            if row0 == row1:
+                break
+
+            block_columns = {
+                key: self._slice_block_(columns['data'].get(key), row0, row1)
+                for key in keys
+            }
+
+            block_meta = {
+                key: (
+                    [times.get(index) for index in range(row1 - base - 1, row0 - base - 1, -1)]
+                    if key == TIME_KEY
+                    else self._slice_block_(columns['meta'].get(key), row0, row1, None)
+                )
+                for key in meta_keys
+            }
+
+            yield Block(row1 - row0, block_columns, block_meta)
+
+            row1 = row0
+
+        yield Block.empty(keys, meta_keys)
+
+    @staticmethod
+    def _slice_block_(column_size, row0, row1, missing=MISSING):
+        """Slice the values of rows in [`row0`, `row1`) from a column
+        (snapshot) into a list, in descending order.
+
+        """
+        values = [missing] * (row1 - row0)
+
+        if column_size is not None:
+            (column, size) = column_size
+
+            index0 = column.index(row0, size)
+            index1 = column.index(row1, size)
+
+            for index in range(index0, index1):
+                values[row1 - 1 - column.rows[index]] = column.get(index)
+
+        return values
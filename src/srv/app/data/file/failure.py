@@ -0,0 +1,88 @@
+"""Negative cache of unreadable data files.
+
+Data files which cannot be decoded -- truncated, or badly encoded -- are
+recorded together with their signature (*e.g.* modification time and
+size), such that these are not re-read (and re-parsed) upon every query
+and every warming of caches. A recorded file is read again only once its
+signature changes.
+
+"""
+import collections
+import threading
+
+from loguru import logger as log
+
+
+class ReadFailureCache:
+    """Negative cache of unreadable data files.
+
+    Files are recorded by path, mapped to their signatures; at most
+    `maxsize` files are recorded, (the least-recently recorded being
+    discarded first).
+
+    Counters `skips` (reads avoided) and `failures` (reads failed) are
+    maintained for monitoring; (see also `stats`, as served by the
+    dashboard at `/metrics/datafile`).
+
+    """
+    def __init__(self, maxsize=10_000):
+        self.maxsize = maxsize
+
+        self.files = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+        self.skips = self.failures = 0
+
+    def __len__(self):
+        return len(self.files)
+
+    def known(self, path, get_signature):
+        """Whether the data file at `path` is known to be unreadable.
+
+        The file's signature is retrieved via callable `get_signature`
+        (only if the file is recorded at all).
+
+        """
+        try:
+            signature = self.files[path]
+        except KeyError:
+            return False
+
+        if get_signature(path) != signature:
+            self.discard(path)
+            return False
+
+        with self.lock:
+            self.skips += 1
+
+        return True
+
+    def add(self, path, signature, exc=None):
+        """Record the data file at `path` -- of the given `signature` --
+        as unreadable.
+
+        """
+        with self.lock:
+            self.failures += 1
+
+            self.files[path] = signature
+            self.files.move_to_end(path)
+
+            while len(self.files) > self.maxsize:
+                self.files.popitem(last=False)
+
+        if exc is None:
+            log.warning('unreadable data file | {}', path)
+        else:
+            log.warning('unreadable data file | {} | {}: {}', path, exc.__class__.__name__, exc)
+
+    def discard(self, path):
+        with self.lock:
+            self.files.pop(path, None)
+
+    def clear(self):
+        with self.lock:
+            self.files.clear()
+
+    def stats(self):
+        return {'count': len(self.files), 'skips': self.skips, 'failures': self.failures}
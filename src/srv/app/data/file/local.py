@@ -2,15 +2,33 @@
 import contextlib
 import functools
 import heapq
+import itertools
+import os
 import threading
 
 import cachetools
-from cachetools import TTLCache
+from cachetools import LRUCache, TTLCache
 from loguru import logger as log
 
 from app import conf
-
-from .base import AbstractDataFileBank, DATAFILE_LIMIT
+from app.lib.cache import BudgetCache
+from app.lib.concurrent import SingleFlight
+
+from . import bundle, warm
+from .base import (
+    AbstractDataFileBank,
+    DATAFILE_LIMIT,
+    FILE_PATTERNS,
+    JSON_DECODER,
+    get_file_patterns,
+    get_name_time,
+    match_file_patterns,
+    project,
+)
+from .column import ColumnStore
+from .persist import ProjectionStore
+from .rolling import RollingWindows
+from .watch import DirectoryWatcher
 
 
 DATA_PATHS = (
@@ -18,31 +36,99 @@ DATA_PATHS = (
     ((conf.DATAFILE_ARCHIVE,) if conf.DATAFILE_ARCHIVE else ())
 )
 
-DATA_CACHE_SIZE = DATAFILE_LIMIT
+#
+# archived data files may be read from their daily bundles, kept in a directory of
+# their own -- (see app.data.file.bundle)
+#
+BUNDLE_DIRS = (
+    {conf.DATAFILE_ARCHIVE: conf.DATAFILE_BUNDLE_PATH}
+    if conf.DATAFILE_ARCHIVE and conf.DATAFILE_BUNDLE_PATH else {}
+)
+
+#
+# projections are cached per data file for each of a few distinct sets of keys
+# (*i.e.* for each of a few distinct queries)
+#
+PROJECTION_QUERY_COUNT = 4
+
+#
+# the projection cache is bounded by the (approximate) size of its contents rather
+# than by its number of projections -- (a few large data files mustn't exhaust memory)
+#
+PROJECTION_CACHE = BudgetCache(conf.DATAFILE_CACHE_BYTES, conf.DATAFILE_CACHE_POLICY)
+
+COLUMN_STORE = conf.DATAFILE_COLUMN_PATH and ColumnStore(conf.DATAFILE_COLUMN_PATH)
+
+PROJECTION_STORE = conf.DATAFILE_PROJECTION_PATH and ProjectionStore(
+    conf.DATAFILE_PROJECTION_PATH,
+)
+
+ROLLING_WINDOWS = conf.DATAFILE_ROLLING and COLUMN_STORE and RollingWindows(COLUMN_STORE)
+
+
+def ingest_changes():
+    """Ingest data files into the column store as these are added to
+    their directories (as reported by the directory watcher).
+
+    """
+    if COLUMN_STORE:
+        LocalDataFileBank().ingest()
+
+
+DIRECTORY_WATCHER = conf.DATAFILE_WATCH and DirectoryWatcher(
+    DATA_PATHS + tuple(BUNDLE_DIRS.values()),
+    interval=conf.DATAFILE_WATCH_INTERVAL,
+    patterns=[file_pattern for (_key_pattern, file_pattern) in FILE_PATTERNS],
+    manifest_dir=conf.DATAFILE_MANIFEST_PATH,
+    on_change=ingest_changes,
+)
 
 
 def cached(cache, key=cachetools.hashkey, lock=None):
     """Extend cachetools.cached to decorate wrapper with useful
     properties & methods.
 
+    Unlike cachetools.cached, concurrent misses of the same key are
+    coalesced: the first computes the value on behalf of all (see
+    `SingleFlight`). (`populate` joins -- or leads -- such a computation
+    as well, though it never consults the cache.)
+
     """
-    decorator = cachetools.cached(cache, key, lock)
+    lock = lock or contextlib.nullcontext()
+    flights = SingleFlight()
 
     def wrapped_decorator(func):
-        def populate(*args, **kwargs):
-            cache_key = key(*args, **kwargs)
+        def load(cache_key, args, kwargs):
             value = func(*args, **kwargs)
 
-            with lock or contextlib.nullcontext():
-                cache[cache_key] = value
+            try:
+                with lock:
+                    cache[cache_key] = value
+            except ValueError:
+                pass  # value too large
 
             return value
 
-        wrapped = decorator(func)
+        @functools.wraps(func)
+        def wrapped(*args, **kwargs):
+            cache_key = key(*args, **kwargs)
+
+            try:
+                with lock:
+                    return cache[cache_key]
+            except KeyError:
+                pass  # key not found
+
+            return flights.do(cache_key, load, cache_key, args, kwargs)
+
+        def populate(*args, **kwargs):
+            cache_key = key(*args, **kwargs)
+            return flights.do(cache_key, load, cache_key, args, kwargs)
 
         wrapped.cache = cache
         wrapped.key = key
         wrapped.lock = lock
+        wrapped.flights = flights
         wrapped.populate = populate
 
         return wrapped
@@ -50,11 +136,185 @@ def cached(cache, key=cachetools.hashkey, lock=None):
     return wrapped_decorator
 
 
+def projection_key(path, keys, prefix, meta_prefix):
+    return cachetools.keys.hashkey(path.name, keys, prefix, meta_prefix)
+
+
 class LocalDataFileBank(AbstractDataFileBank):
 
-    def __init__(self, *, dirs=DATA_PATHS, **kwargs):
+    DATA_FILE_READ_ERRORS = bundle.DATA_FILE_READ_ERRORS
+
+    def __init__(self,
+                 *,
+                 dirs=DATA_PATHS,
+                 column_store=COLUMN_STORE,
+                 rolling_windows=ROLLING_WINDOWS,
+                 **kwargs):
         super().__init__(**kwargs)
         self.dirs = dirs
+        self.column_store = column_store
+        self.rolling_windows = rolling_windows
+
+        # store selected to answer the current query (if any)
+        self.columns = None
+
+    def select_columns(self, ops):
+        """Select the column store to answer a query of the given `ops`.
+
+        The store is not updated by queries, but rather by ingestion (see
+        `ingest`): a store which has not ingested the bank's data files as
+        they are currently listed cannot answer the query; (rather, their
+        ingestion is requested in the background).
+
+        `None` is returned if the store cannot answer the query.
+
+        """
+        store = self.column_store
+
+        if (
+            not store or
+            self.prefix != store.prefix or
+            self.meta_prefix != store.meta_prefix or
+            self.file_limit > store.retain
+        ):
+            return None
+
+        if store.ingested != self.ingestion_version:
+            self.request_ingestion()
+            return None
+
+        read_keys = {read_key for op in ops for read_key in op.read_keys}
+        meta_keys = {meta_key for op in ops for meta_key in op.meta_keys}
+
+        return store if store.covers(read_keys, meta_keys) else None
+
+    @property
+    def data_version(self):
+        # (data files are added to and removed from their directories)
+        versions = []
+
+        for path in (*self.dirs, *(BUNDLE_DIRS[path] for path in self.dirs if path in BUNDLE_DIRS)):
+            try:
+                versions.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                versions.append(None)
+
+        return tuple(versions)
+
+    @property
+    def ingestion_version(self):
+        """Version of the bank's data files as ingested (see `ingest`)."""
+        return (tuple(self.dirs), self.data_version)
+
+    @property
+    def scan_key(self):
+        return ('local', tuple(self.dirs), self.column_store, *super().scan_key)
+
+    # serializes the ingestion of data files (into any store)
+    ingestion_lock = threading.Lock()
+
+    # threads of ingestion under way in the background, by store
+    ingestions = {}
+    ingestions_lock = threading.Lock()
+
+    def ingest(self, paths=None, rows=None, version=None):
+        """Ingest the bank's data files into its column store.
+
+        Data files are listed (unless their `paths` are given) and those
+        not yet ingested are read (unless their `rows` are given -- see
+        `ColumnStore.update`).
+
+        Rolling windows maintained over the store are advanced; and, the
+        store is then marked as having ingested the bank's data files as
+        of their `version` -- by default, their version prior to their
+        listing (see `ingestion_version`).
+
+        Returns the number of rows ingested.
+
+        """
+        store = self.column_store
+
+        if not store:
+            return 0
+
+        with self.ingestion_lock:
+            if version is None:
+                version = self.ingestion_version
+
+            if paths is None:
+                paths = list(self.iter_paths())
+
+            count = store.update(paths, self.get_json, rows)
+
+            windows = self.rolling_windows
+
+            if windows and windows.store is store:
+                windows.advance()
+
+            store.ingested = version
+
+        return count
+
+    def request_ingestion(self):
+        """Ingest the bank's data files in a background thread (unless
+        their ingestion is already under way).
+
+        Returns the thread of ingestion.
+
+        """
+        store = self.column_store
+
+        with self.ingestions_lock:
+            thread = self.ingestions.get(store)
+
+            if thread is None or not thread.is_alive():
+                thread = self.ingestions[store] = threading.Thread(
+                    target=log.catch(self.ingest),
+                    name='ingest',
+                    daemon=True,
+                )
+                thread.start()
+
+        return thread
+
+    def reduce(self, op_stack, flats=None):
+        """Apply the aggregators of `op_stack` to data files' datasets.
+
+        Where the column store can answer the query, datasets are
+        generated from its arrays rather than from data files; and, where
+        rolling windows are maintained over the store of the query's
+        aggregators, results are taken from these windows.
+
+        See `AbstractDataFileBank.reduce`.
+
+        """
+        self.columns = self.select_columns(op_stack.values())
+
+        windows = self.rolling_windows
+
+        if self.columns is not None and windows and windows.accepts(self, op_stack.values()):
+            if flats is None:
+                flats = dict.fromkeys(op_stack, self.flat)
+
+            return windows.reduce(op_stack, flats)
+
+        return super().reduce(op_stack, flats)
+
+    def iter_blocks(self, keys=(), meta_keys=(), since=None):
+        if self.columns is None:
+            yield from super().iter_blocks(keys, meta_keys, since)
+        else:
+            yield from self.columns.iter_blocks(keys, meta_keys, self.file_limit)
+
+    def iter_datasets(self, keys=(), since=None):
+        if self.columns is None:
+            if keys:
+                with self.projection_specs_lock:
+                    self.projection_specs[self.get_projection_spec(keys)] = True
+
+            yield from super().iter_datasets(keys, since)
+        else:
+            yield from self.columns.iter_datasets(keys, self.file_limit)
 
     #
     # As size of file archive grows and grows, becomes increasingly important to
@@ -66,12 +326,153 @@ class LocalDataFileBank(AbstractDataFileBank):
     # TTL cache on full argument list should be sufficient for now -- (arguments
     # stable across all typical invocations).
     #
+    # Only entries' names are compared (without constructing a path for each
+    # entry of a potentially huge directory).
+    #
     @staticmethod
     @cached(TTLCache(maxsize=100, ttl=(3600 * 24)), lock=threading.Lock())
     def sorted_dir(path_dir, limit):
-        return heapq.nlargest(limit, path_dir.iterdir())
+        with os.scandir(path_dir) as entries:
+            names = heapq.nlargest(limit, (entry.name for entry in entries))
+
+        return [path_dir / name for name in names]
+
+    @classmethod
+    def list_dir(cls, path_dir, limit, file_patterns=None):
+        """List the paths of the `limit` greatest entries of directory
+        `path_dir`, in descending order.
+
+        If `file_patterns` are given, only those of these entries matching
+        any pattern are listed.
+
+        Where the directory's data files are bundled, its entries are
+        listed together with the members of its bundles (see
+        `app.data.file.bundle`).
+
+        The directory's index is consulted where it is maintained by the
+        directory watcher; otherwise, its (cached) listing is sorted.
+
+        """
+        paths = cls.list_merged(path_dir, limit) if path_dir in BUNDLE_DIRS else None
+
+        if paths is None:
+            index = DIRECTORY_WATCHER and DIRECTORY_WATCHER.get_index(path_dir)
+
+            if index:
+                if file_patterns is not None:
+                    # list only those entries of matching types
+                    return index.nlargest(limit, file_patterns)
+
+                paths = index.nlargest(limit)
+            else:
+                paths = cls.sorted_dir(path_dir, limit)
+
+        if file_patterns is None:
+            return paths
+
+        return [path for path in paths if match_file_patterns(path.name, file_patterns)]
+
+    # merged listings of directories with their bundles: by (directory, limit),
+    # the directories' versions and the listing (see list_merged)
+    merged_listings = {}
+    merged_listings_lock = threading.Lock()
+
+    @classmethod
+    def list_merged(cls, path_dir, limit):
+        """List the paths of the `limit` greatest entries of directory
+        `path_dir` together with the members of its bundles, in
+        descending order (see `bundle.merge`).
+
+        The merged listing is cached until either the directory or that of
+        its bundles is modified.
+
+        `None` is returned if the directory has no bundles.
+
+        """
+        path_bundles = BUNDLE_DIRS[path_dir]
+
+        try:
+            version = (os.stat(path_dir).st_mtime_ns, os.stat(path_bundles).st_mtime_ns)
+        except FileNotFoundError:
+            version = None
+
+        with cls.merged_listings_lock:
+            cached = cls.merged_listings.get((path_dir, limit))
+
+        if version is not None and cached is not None and cached[0] == version:
+            return cached[1]
+
+        if bundle_paths := cls.list_bundles(path_bundles):
+            index = DIRECTORY_WATCHER and DIRECTORY_WATCHER.get_index(path_dir)
+            paths = index.nlargest(limit) if index else cls.sorted_dir(path_dir, limit)
+
+            merged = bundle.merge(paths, bundle.iter_bundled(bundle_paths), limit)
+        else:
+            merged = None
+
+        if version is not None:
+            with cls.merged_listings_lock:
+                cls.merged_listings[(path_dir, limit)] = (version, merged)
+
+        return merged
+
+    @staticmethod
+    def list_bundles(path_dir):
+        """List the paths of the bundles of directory `path_dir` (see
+        `bundle.sort_bundles`).
+
+        """
+        if index := DIRECTORY_WATCHER and DIRECTORY_WATCHER.get_index(path_dir):
+            return bundle.sort_bundles(index.nlargest(len(index)))
+
+        return bundle.list_bundles(path_dir)
 
-    def iter_paths(self, keys=()):
+    @classmethod
+    def count_dir(cls, path_dir, limit):
+        """Count the entries of directory `path_dir` (up to `limit`)."""
+        if path_dir in BUNDLE_DIRS and (merged := cls.list_merged(path_dir, limit)) is not None:
+            # (entries together with bundles' members)
+            return len(merged)
+
+        index = DIRECTORY_WATCHER and DIRECTORY_WATCHER.get_index(path_dir)
+        return min(limit, len(index) if index else len(cls.sorted_dir(path_dir, limit)))
+
+    @staticmethod
+    def get_path_time(path):
+        """Determine an upper bound on the measurement time of the data
+        file at `path`.
+
+        The bound is taken from the file's name, if possible, and
+        otherwise from its modification time.
+
+        """
+        path_time = get_name_time(path.name)
+
+        if path_time is None:
+            try:
+                path_time = path.stat().st_mtime
+            except FileNotFoundError:
+                pass
+
+        return path_time
+
+    @staticmethod
+    def get_signature(path):
+        """Signature -- modification time and size -- of the data file at
+        `path` (or `None` if it cannot be accessed).
+
+        """
+        try:
+            return bundle.get_signature(path)
+        except (OSError, bundle.BundleError):
+            return None
+
+    @classmethod
+    def path_precedes(cls, path, timestamp):
+        path_time = cls.get_path_time(path)
+        return path_time is not None and path_time < timestamp
+
+    def iter_paths(self, keys=(), since=None):
         """Generate data file paths in descending order.
 
         Data file directories are read in their order specified upon
@@ -80,66 +481,342 @@ class LocalDataFileBank(AbstractDataFileBank):
         these are consistenty labeled by timestamp, they are also
         therefore generated in descending time order).
 
+        Paths are excluded according to the provision of `keys` and any
+        matching `FILE_PATTERNS`: only files of those types which may
+        contain `keys` are generated.
+
         Paths will not be generated beyond the file limit specified upon
-        instantiation.
+        instantiation. (Excluded files count toward this limit.)
+
+        A data file found in more than one directory -- having been moved
+        from one to another (*e.g.* from pending to archive) -- is
+        generated only once.
+
+        If `since` is specified, each directory's paths are generated
+        only until a file is reached whose name (or modification time)
+        indicates that it precedes this timestamp.
 
         """
+        file_patterns = get_file_patterns(keys)
+
+        # names of data files generated -- a data file moved from one directory
+        # to another (e.g. from pending to archive) is generated only once
+        names = set()
+
         path_count = 0
 
-        for path_dir in self.dirs:
+        for (dir_index, path_dir) in enumerate(self.dirs, 1):
             path_remainder = self.file_limit - path_count
 
             if path_remainder <= 0:
                 break
 
-            paths_sorted = self.sorted_dir(path_dir, path_remainder)
+            paths_sorted = self.list_dir(path_dir, path_remainder, file_patterns)
 
-            for (path_count, path) in enumerate(paths_sorted, 1 + path_count):
+            if since is not None:
+                paths_sorted = self.takewhile_since(paths_sorted, since)
+
+            paths_sorted = self.exclude_names(paths_sorted, names)
+
+            if file_patterns is None:
+                for (path_count, path) in enumerate(paths_sorted, 1 + path_count):
+                    yield path
+
+                continue
+
+            yield from paths_sorted
+
+            if dir_index == len(self.dirs):
+                break
+
+            # excluded files count toward the limit
+            if since is None:
+                path_count += self.count_dir(path_dir, path_remainder)
+            else:
+                paths_all = self.takewhile_since(self.list_dir(path_dir, path_remainder), since)
+                path_count += sum(1 for _path in paths_all)
+
+    def takewhile_since(self, paths, since):
+        return itertools.takewhile(lambda path: not self.path_precedes(path, since), paths)
+
+    @staticmethod
+    def exclude_names(paths, names):
+        """Generate those `paths` whose names are not among `names` --
+        adding these names as they are generated.
+
+        """
+        for path in paths:
+            if path.name not in names:
+                names.add(path.name)
                 yield path
 
+    # (keys, prefix, meta_prefix) of recent queries' projections
+    projection_specs = LRUCache(maxsize=PROJECTION_QUERY_COUNT)
+    projection_specs_lock = threading.Lock()
+
+    @staticmethod
+    def get_json(path):
+        return bundle.load_json(path)
+
+    def get_projection_spec(self, keys):
+        return (frozenset(keys), self.prefix, self.meta_prefix)
+
+    def get_projection(self, path, keys=()):
+        try:
+            return self._get_projection_(path, keys)
+        except FileNotFoundError:
+            # file may have been moved (e.g. from pending to archive) since listing
+            if (path_moved := self.locate_moved(path)) is None:
+                raise
+
+            return self._get_projection_(path_moved, keys)
+
+    def _get_projection_(self, path, keys):
+        if not keys:
+            return self.get_json(path)
+
+        return self.get_projection_cached(path, *self.get_projection_spec(keys))
+
+    def locate_moved(self, path):
+        """Locate the data file of `path` -- since moved to another of the
+        bank's directories, or compacted into a bundle.
+
+        `None` is returned if no such file is found.
+
+        """
+        for path_dir in self.dirs:
+            path_moved = path_dir / path.name
+
+            if path_moved != path and path_moved.exists():
+                return path_moved
+
+        for path_dir in self.dirs:
+            if path_dir not in BUNDLE_DIRS:
+                continue
+
+            path_moved = bundle.locate(BUNDLE_DIRS[path_dir], path.name)
+
+            if path_moved is not None and path_moved != path:
+                return path_moved
+
+        return None
+
     #
     # In testing against an HTTP endpoint whose query required ~500 files,
     # an LRU cache of the same size added a lag of ~10% to the initial request,
     # and reduced subsequent requests' time by an order of magnitude (~90%).
     #
     # However: cache size should be ensured to be at least as large as the file
-    # limit, to ensure cache functionality.
+    # limit, to ensure cache functionality -- (see DATAFILE_CACHE_BYTES).
+    #
+    # Rather than data files' full contents, only their projections onto queried
+    # keys are cached -- (data files may be large, but queries read few values).
+    #
+    # Projections are cached by data file *name* rather than path, such that data
+    # files moved from one directory to another (*e.g.* from pending to archive)
+    # remain cached.
+    #
+    # Projections missing from the cache are retrieved from the persistent
+    # projection store (if any) before resorting to reading the data file.
     #
     @staticmethod
-    @functools.lru_cache(maxsize=DATA_CACHE_SIZE)
-    def get_json(path):
-        return super().get_json(path)
+    @cached(PROJECTION_CACHE, key=projection_key, lock=threading.Lock())
+    def get_projection_cached(path, keys, prefix, meta_prefix):
+        def make():
+            return project(bundle.load_json(path), keys, prefix, meta_prefix)
+
+        if PROJECTION_STORE:
+            return PROJECTION_STORE.load(path, (keys, prefix, meta_prefix), make)
+
+        return make()
+
+    @classmethod
+    def restore_projections(cls, path, specs, stored=None):
+        """Restore the cached projections of the data file at `path` for
+        each of the given projection `specs` from the persistent
+        projection store (if any), given the `stored` rows of each spec.
+
+        Returns the list of specs whose projections remain missing.
+
+        """
+        cache = cls.get_projection_cached.cache
+        cache_key = cls.get_projection_cached.key
+
+        specs_missing = [spec for spec in specs if cache_key(path, *spec) not in cache]
+
+        if not PROJECTION_STORE or not specs_missing:
+            return specs_missing
+
+        specs_unstored = []
+
+        for spec in specs_missing:
+            projection = PROJECTION_STORE.get(path, spec, stored and stored[spec])
+
+            if projection is None:
+                specs_unstored.append(spec)
+            else:
+                try:
+                    with cls.get_projection_cached.lock:
+                        cache[cache_key(path, *spec)] = projection
+                except ValueError:
+                    pass  # value too large
+
+        return specs_unstored
+
+    @classmethod
+    def populate_projections(cls, items):
+        """Populate the cached (and stored) projections of the given data
+        files.
+
+        `items` is a list of `(path, specs, row_spec)` triples -- each the
+        path of a data file, the projection specs to populate and the spec
+        of its column store row to extract (or `None`). Files are parsed
+        in parallel by worker processes (see `warm.iter_projections`).
+
+        Returns the extracted column store rows, by file name; (the rows
+        of files which could not be decoded are `None`).
+
+        """
+        cache = cls.get_projection_cached.cache
+        cache_key = cls.get_projection_cached.key
+
+        projections = warm.iter_projections(items,
+                                            processes=conf.DATAFILE_WARM_PROCESSES,
+                                            chunk_size=conf.DATAFILE_WARM_CHUNK)
+
+        specs = {path: path_specs for (path, path_specs, _row_spec) in items}
+
+        rows = {}
+
+        for (path, signature, encoded, row, error) in projections:
+            if error is not None:
+                if cls.read_failures is not None:
+                    cls.read_failures.add(path, signature, error)
+
+                rows[path.name] = None
+
+                continue
+
+            rows[path.name] = row
+
+            for (spec, encoded_projection) in zip(specs[path], encoded):
+                projection = JSON_DECODER.loads(encoded_projection)
+
+                try:
+                    with cls.get_projection_cached.lock:
+                        cache[cache_key(path, *spec)] = projection
+                except ValueError:
+                    pass  # value too large
+
+                if PROJECTION_STORE:
+                    PROJECTION_STORE.save(path.name, spec, signature, encoded_projection)
+
+        return rows
 
     @classmethod
     def populate_caches(cls, file_limit=DATAFILE_LIMIT, dirs=DATA_PATHS):
-        """Pre- and/or re-populate file caches."""
+        """Pre- and/or re-populate file caches.
+
+        Data files' projections are cached for the queries most recently
+        made of data files. (Upon restart, these queries are recalled from
+        the persistent projection store, if any; and, their projections
+        are restored from this store wherever these remain valid.)
+
+        """
         log.opt(lazy=True).trace(
-            'initial sizes | dirlists: {dirsize} | jsons: {jsize}',
+            'initial sizes | dirlists: {dirsize} | projections: {psize} ({pbytes} bytes)',
             dirsize=lambda: cls.sorted_dir.cache.currsize,
-            jsize=lambda: cls.get_json.cache_info().currsize,
+            psize=lambda: len(cls.get_projection_cached.cache),
+            pbytes=lambda: cls.get_projection_cached.cache.currsize,
         )
 
+        with cls.projection_specs_lock:
+            if PROJECTION_STORE and not cls.projection_specs:
+                # recall queries made prior to restart
+                for spec in reversed(PROJECTION_STORE.get_specs(PROJECTION_QUERY_COUNT)):
+                    cls.projection_specs[spec] = True
+
+            specs = list(cls.projection_specs)
+
+        failures = cls.read_failures
+
+        bank = cls(dirs=dirs, file_limit=file_limit, column_store=COLUMN_STORE)
+        version = bank.ingestion_version
+
         path_count = 0
+        paths = []
+        missing = []
 
         for path_dir in dirs:
-            # set/reset sorted_dir()
-            paths_sorted = cls.sorted_dir.populate(path_dir, file_limit - path_count)
+            # (directory listing maintained by watcher, if any)
+            if not (DIRECTORY_WATCHER and DIRECTORY_WATCHER.get_index(path_dir)):
+                # set/reset sorted_dir()
+                cls.sorted_dir.populate(path_dir, file_limit - path_count)
 
-            # set/reset get_json()
+            paths_sorted = cls.list_dir(path_dir, file_limit - path_count)
+            paths.extend(paths_sorted)
+
+            if PROJECTION_STORE:
+                names = [path.name for path in paths_sorted]
+                stored = {spec: PROJECTION_STORE.get_rows(names, spec) for spec in specs}
+            else:
+                stored = None
+
+            # set/reset get_projection_cached()
             for (path_count, path) in enumerate(paths_sorted, 1 + path_count):
-                try:
-                    cls.get_json(path)
-                except cls.DATA_FILE_READ_ERRORS:
-                    pass
+                if failures is not None and failures.known(path, cls.get_signature):
+                    continue
+
+                if specs_missing := cls.restore_projections(path, specs, stored):
+                    missing.append((path, specs_missing))
 
             if path_count == file_limit:
                 break
 
+        # parse data files once: for their missing projections and for
+        # their column store rows (if not yet ingested)
+        if COLUMN_STORE:
+            pending = COLUMN_STORE.pending(paths)
+            row_spec = COLUMN_STORE.row_spec
+        else:
+            pending = ()
+            row_spec = None
+
+        specs_missing = dict(missing)
+
+        items = [
+            (path, specs_missing.get(path, ()), row_spec if path.name in pending else None)
+            for path in paths
+            if path in specs_missing or path.name in pending
+        ]
+
+        rows = cls.populate_projections(items)
+
+        if PROJECTION_STORE and paths:
+            PROJECTION_STORE.touch_specs(specs)
+            PROJECTION_STORE.prune((path.name for path in paths), PROJECTION_QUERY_COUNT)
+
+        # ingest new data files
+        if COLUMN_STORE:
+            bank.ingest(paths, rows, version)
+
         log.opt(lazy=True).trace(
-            'final sizes | dirlists: {dirsize} | jsons: {jsize}',
+            'final sizes | dirlists: {dirsize} | projections: {psize} ({pbytes} bytes) | '
+            'unreadable: {usize}',
             dirsize=lambda: cls.sorted_dir.cache.currsize,
-            jsize=lambda: cls.get_json.cache_info().currsize,
+            psize=lambda: len(cls.get_projection_cached.cache),
+            pbytes=lambda: cls.get_projection_cached.cache.currsize,
+            usize=lambda: len(failures) if failures is not None else 0,
         )
 
+        log.debug('projection cache | hits={hits} misses={misses} evictions={evictions} '
+                  'bytes={bytes} count={count}', **cls.get_projection_cached.cache.stats())
+
 
 populate_caches = LocalDataFileBank.populate_caches
+
+
+def watch_dirs(stop_event=None):
+    """Launch the watcher of data file directories (if enabled)."""
+    if DIRECTORY_WATCHER:
+        DIRECTORY_WATCHER.launch(stop_event)
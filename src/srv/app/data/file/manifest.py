@@ -0,0 +1,188 @@
+"""Persistent manifests of data file directories.
+
+A (long-running) device's archive directory may hold hundreds of
+thousands of data files; listing -- and sorting -- such a directory upon
+each start of the server is expensive.
+
+Instead, the sorted names of a directory's entries are persisted to a
+manifest: an append-only text file of names (one per line), in ascending
+order. Names are appended to the manifest as entries are added to the
+directory (*e.g.* as reported by inotify). Should entries instead be
+removed -- or added out of order -- the manifest is rewritten.
+
+Manifests additionally record "sync points": the directory's
+modification time at which the manifest was known to reflect the
+directory. Upon start, a manifest whose final sync point matches the
+directory's current modification time is loaded in place of listing the
+directory.
+
+"""
+import os
+import pathlib
+import urllib.parse
+
+from loguru import logger as log
+
+
+# (entry names may not contain "/" -- so neither may sync lines be names)
+SYNC_PREFIX = '/sync '
+
+# manifests with more than this ratio of lines to entries are rewritten
+REWRITE_RATIO = 2
+
+
+class DirectoryManifest:
+    """Persistent, sorted manifest of a directory's entries."""
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+
+        self.enabled = True
+
+        # greatest name written
+        self.last_name = None
+
+        # modification time of the directory as last synced
+        self.synced = None
+
+        # whether the manifest must be rewritten (to reflect removals)
+        self.dirty = False
+
+        # whether names have been appended since the last sync point
+        self.changed = False
+
+        self.lines = 0
+
+    @classmethod
+    def for_dir(cls, manifest_dir, path_dir):
+        """Construct the manifest for directory `path_dir` under
+        `manifest_dir`.
+
+        """
+        name = urllib.parse.quote(str(pathlib.Path(path_dir).absolute()), safe='')
+        return cls(pathlib.Path(manifest_dir) / name)
+
+    def _disable_(self, exc):
+        log.error('manifest | disabled: failed to write {} | {}', self.path, exc)
+        self.enabled = False
+
+    def load(self, mtime_ns):
+        """Read the names of the manifest -- if it reflects the directory
+        as of the given modification time `mtime_ns`.
+
+        Returns `None` if no valid manifest is found.
+
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            text = self.path.read_text()
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as exc:
+            log.warning('manifest | unreadable {} | {}', self.path, exc)
+            return None
+
+        lines = text.splitlines()
+
+        if not lines or not lines[-1].startswith(SYNC_PREFIX):
+            return None
+
+        try:
+            synced = int(lines[-1][len(SYNC_PREFIX):])
+        except ValueError:
+            return None
+
+        if synced != mtime_ns or not text.endswith('\n'):
+            return None
+
+        names = [line for line in lines if not line.startswith(SYNC_PREFIX)]
+
+        if any(name0 >= name1 for (name0, name1) in zip(names, names[1:])):
+            return None
+
+        self.last_name = names[-1] if names else None
+        self.synced = synced
+        self.dirty = self.changed = False
+        self.lines = len(lines)
+
+        return names
+
+    def write(self, names, mtime_ns):
+        """(Re-)write the manifest to consist of `names` -- reflecting
+        the directory as of modification time `mtime_ns`.
+
+        """
+        if not self.enabled:
+            return
+
+        path_tmp = self.path.with_name(f'.{self.path.name}.tmp')
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+            with path_tmp.open('w') as fd:
+                for name in names:
+                    fd.write(f'{name}\n')
+
+                fd.write(f'{SYNC_PREFIX}{mtime_ns}\n')
+
+            os.replace(path_tmp, self.path)
+        except OSError as exc:
+            self._disable_(exc)
+            return
+
+        self.last_name = names[-1] if names else None
+        self.synced = mtime_ns
+        self.dirty = self.changed = False
+        self.lines = len(names) + 1
+
+    def _append_(self, *lines):
+        try:
+            with self.path.open('a') as fd:
+                for line in lines:
+                    fd.write(f'{line}\n')
+        except OSError as exc:
+            self._disable_(exc)
+            return False
+
+        self.lines += len(lines)
+        return True
+
+    def add(self, name):
+        """Record the addition of entry `name` to the directory."""
+        if not self.enabled or self.dirty:
+            return
+
+        if self.last_name is not None and name <= self.last_name:
+            # (out of order: cannot be appended)
+            self.dirty = True
+            return
+
+        if self._append_(name):
+            self.last_name = name
+            self.changed = True
+
+    def discard(self, name):
+        """Record the removal of entry `name` from the directory."""
+        if self.enabled and (self.last_name is None or name <= self.last_name):
+            self.dirty = True
+
+    def sync(self, names, mtime_ns):
+        """Record that the manifest reflects the directory as of its
+        modification time `mtime_ns`.
+
+        The manifest is rewritten to consist of `names` if it may not be
+        appended to (or if it has grown excessively).
+
+        """
+        if not self.enabled or (mtime_ns == self.synced and not self.changed and
+                                not self.dirty):
+            return
+
+        if self.dirty or self.lines > REWRITE_RATIO * len(names) + 1:
+            self.write(names, mtime_ns)
+        elif self._append_(f'{SYNC_PREFIX}{mtime_ns}'):
+            self.synced = mtime_ns
+            self.changed = False
@@ -0,0 +1,327 @@
+"""Persistent store of data files' projections.
+
+Data files' projections onto queried keys (see `project`) are stored in
+an SQLite database on disk, such that -- upon restart of the server --
+caches may be refilled without re-reading and re-parsing data files.
+
+Projections are stored under their data file's *name* together with
+its modification time and size: a stored projection is valid only so
+long as these match those of the file. (A data file moved from one
+directory to another -- *e.g.* from pending to archive -- or compacted
+into a bundle -- see `app.data.file.bundle` -- retains its stored
+projections.)
+
+The projection "specs" of recent queries are stored as well, such that
+these queries' projections may be restored upon restart.
+
+"""
+import json
+import pathlib
+import sqlite3
+import threading
+import time
+
+from loguru import logger as log
+
+from .base import JSON_DECODER
+from .bundle import BundleError, get_signature
+
+
+STORE_VERSION = 1
+
+PREPARE_DATABASE = """\
+create table if not exists projection (
+    name text not null,
+    spec text not null,
+    mtime_ns integer not null,
+    size integer not null,
+    value text not null,
+    primary key (name, spec)
+) without rowid;
+
+create table if not exists spec (
+    spec text primary key,
+    used real not null
+) without rowid;
+"""
+
+
+def dump_spec(spec):
+    (keys, prefix, meta_prefix) = spec
+    return json.dumps([sorted(keys), prefix, meta_prefix])
+
+
+def load_spec(text):
+    (keys, prefix, meta_prefix) = json.loads(text)
+    return (frozenset(keys), prefix, meta_prefix)
+
+
+class ProjectionStore:
+    """Persistent store of data files' projections.
+
+    Projections are written in batches: pending writes are flushed upon
+    reaching `batch_size` or upon the first write following `interval`
+    seconds since the last flush (and upon `flush()`).
+
+    """
+    def __init__(self, path, *, batch_size=256, interval=5.0):
+        self.path = pathlib.Path(path)
+        self.batch_size = batch_size
+        self.interval = interval
+
+        self.enabled = True
+        self.lock = threading.Lock()
+
+        self.pending = {}
+        self.flushed = time.monotonic()
+
+        self.hits = self.misses = 0
+
+        self._connection_ = None
+
+    def _connect_(self):
+        if self._connection_ is not None or not self.enabled:
+            return self._connection_
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+
+            (version,) = connection.execute('pragma user_version').fetchone()
+
+            if version != STORE_VERSION:
+                if version:
+                    log.info('projection store | discarding incompatible version: {}', version)
+
+                connection.executescript('drop table if exists projection; '
+                                         'drop table if exists spec;')
+
+            connection.executescript(PREPARE_DATABASE)
+            connection.execute(f'pragma user_version = {STORE_VERSION}')
+            connection.execute('pragma journal_mode = wal')
+            connection.execute('pragma synchronous = normal')
+            connection.commit()
+        except (OSError, sqlite3.Error) as exc:
+            log.error('projection store | disabled: failed to open {} | {}', self.path, exc)
+            self.enabled = False
+            return None
+
+        self._connection_ = connection
+        return connection
+
+    def _execute_(self, statement, parameters=()):
+        connection = self._connect_()
+
+        if connection is None:
+            return None
+
+        try:
+            return connection.execute(statement, parameters).fetchall()
+        except sqlite3.Error as exc:
+            log.warning('projection store | {0.__class__.__name__}: {0}', exc)
+            return None
+
+    def get_rows(self, names, spec):
+        """Retrieve the stored rows of data files `names` for projection
+        `spec`.
+
+        Returns a dict mapping each stored file name to its row, for use
+        by `load`.
+
+        """
+        spec_text = dump_spec(spec)
+        names = list(names)
+        rows = {}
+
+        with self.lock:
+            # (bounded by sqlite's maximum number of host parameters)
+            for start in range(0, len(names), 500):
+                chunk = names[start:start + 500]
+                placeholders = ', '.join('?' * len(chunk))
+
+                results = self._execute_(
+                    'select name, mtime_ns, size, value from projection '
+                    f'where spec = ? and name in ({placeholders})',
+                    (spec_text, *chunk),
+                )
+
+                for (name, *row) in results or ():
+                    rows[name] = row
+
+        return rows
+
+    def _get_(self, name, spec, signature, rows):
+        if rows is None:
+            with self.lock:
+                results = self._execute_(
+                    'select mtime_ns, size, value from projection where name = ? and spec = ?',
+                    (name, dump_spec(spec)),
+                )
+            row = results[0] if results else None
+        else:
+            row = rows.get(name)
+
+        if row is not None and tuple(row[:2]) == signature:
+            try:
+                projection = JSON_DECODER.loads(row[2])
+            except ValueError:
+                pass
+            else:
+                self.hits += 1
+                return projection
+
+        self.misses += 1
+        return None
+
+    def get(self, path, spec, rows=None):
+        """Retrieve the stored projection `spec` of the data file at
+        `path`.
+
+        `None` is returned if no valid projection is stored.
+
+        Stored `rows` (see `get_rows`) may be given rather than queried.
+
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            signature = get_signature(path)
+        except (OSError, BundleError):
+            return None
+
+        return self._get_(path.name, spec, signature, rows)
+
+    def load(self, path, spec, make, rows=None):
+        """Retrieve the projection `spec` of the data file at `path`.
+
+        A stored projection is returned if valid; otherwise, the
+        projection is made via callable `make` and stored.
+
+        Stored `rows` (see `get_rows`) may be given rather than queried.
+
+        """
+        if not self.enabled:
+            return make()
+
+        try:
+            signature = get_signature(path)
+        except (OSError, BundleError):
+            return make()
+
+        projection = self._get_(path.name, spec, signature, rows)
+
+        if projection is None:
+            projection = make()
+            self.save(path.name, spec, signature, json.dumps(projection))
+
+        return projection
+
+    def save(self, name, spec, signature, encoded):
+        """Store the JSON-`encoded` projection `spec` of the data file
+        `name` of the given `signature`.
+
+        """
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.pending[(name, dump_spec(spec))] = (*signature, encoded)
+
+            if (
+                len(self.pending) >= self.batch_size or
+                time.monotonic() - self.flushed >= self.interval
+            ):
+                self._flush_()
+
+    def _flush_(self):
+        self.flushed = time.monotonic()
+
+        if not self.pending:
+            return
+
+        connection = self._connect_()
+
+        if connection is None:
+            self.pending.clear()
+            return
+
+        used = time.time()
+        specs = {spec_text for (_name, spec_text) in self.pending}
+
+        try:
+            with connection:
+                connection.executemany(
+                    'insert or replace into projection values (?, ?, ?, ?, ?)',
+                    [(*key, *row) for (key, row) in self.pending.items()],
+                )
+                connection.executemany(
+                    'insert or replace into spec values (?, ?)',
+                    [(spec_text, used) for spec_text in specs],
+                )
+        except sqlite3.Error as exc:
+            log.warning('projection store | failed to write | {0.__class__.__name__}: {0}', exc)
+
+        self.pending.clear()
+
+    def flush(self):
+        """Write pending projections to disk."""
+        with self.lock:
+            self._flush_()
+
+    def get_specs(self, limit):
+        """List the `limit` most recently-used projection specs."""
+        with self.lock:
+            results = self._execute_('select spec from spec order by used desc limit ?', (limit,))
+
+        return [load_spec(spec_text) for (spec_text,) in results or ()]
+
+    def touch_specs(self, specs):
+        """Mark the given projection `specs` as used."""
+        used = time.time()
+
+        with self.lock:
+            for spec in specs:
+                self._execute_('insert or replace into spec values (?, ?)',
+                               (dump_spec(spec), used))
+
+            if self._connection_ is not None:
+                self._connection_.commit()
+
+    def prune(self, names, spec_limit):
+        """Discard stored projections other than those of data files
+        `names` and of the `spec_limit` most recently-used specs.
+
+        """
+        with self.lock:
+            self._flush_()
+
+            connection = self._connect_()
+
+            if connection is None:
+                return
+
+            try:
+                with connection:
+                    connection.execute('create temp table if not exists retain '
+                                       '(name text primary key) without rowid')
+                    connection.execute('delete from retain')
+                    connection.executemany('insert or ignore into retain values (?)',
+                                           ((name,) for name in names))
+
+                    connection.execute('delete from spec where spec not in '
+                                       '(select spec from spec order by used desc limit ?)',
+                                       (spec_limit,))
+                    cursor = connection.execute(
+                        'delete from projection '
+                        'where name not in (select name from retain) '
+                        'or spec not in (select spec from spec)'
+                    )
+            except sqlite3.Error as exc:
+                log.warning('projection store | failed to prune | {0.__class__.__name__}: {0}',
+                            exc)
+                return
+
+        log.debug('projection store | pruned {} | hits={} misses={}',
+                  cursor.rowcount, self.hits, self.misses)
@@ -0,0 +1,184 @@
+"""Sharing of data file scans among concurrent and recent queries.
+
+A single load of the dashboard fires several API requests at once, each
+of which would otherwise scan the same data files in turn. The
+`ScanPlanner` instead merges the aggregators of queries arriving within
+a short window into a single reduction, and fans its results back out
+to each query; results are retained briefly, for the benefit of queries
+arriving just after.
+
+Results are discarded once the data files of their bank change (see
+`AbstractDataFileBank.data_version`); where changes are not detected
+(*e.g.* in S3), results may lag new data files by up to the planner's
+`ttl`.
+
+"""
+import copy
+import threading
+import time
+
+from loguru import logger as log
+
+
+class ScanError(RuntimeError):
+    """Shared scan failed (on behalf of a query which joined it)."""
+
+
+class Scan:
+    """Reduction of data files pending on behalf of one or more queries."""
+
+    __slots__ = ('ops', 'done', 'results', 'error')
+
+    def __init__(self):
+        self.ops = {}
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class ScanPlanner:
+    """Share scans of data files among queries of equivalent data file
+    banks (see: `AbstractDataFileBank.scan_key`).
+
+    The first query of a scan -- where other queries are in progress,
+    such that more are likely to follow -- waits `delay` seconds for
+    these to join it, before it performs the merged reduction on their
+    behalf. (A query arriving alone is not delayed.)
+
+    Results are reused by subsequent queries for `ttl` seconds -- unless
+    their bank's data files have since changed.
+
+    """
+    def __init__(self, *, delay, ttl):
+        self.delay = delay
+        self.ttl = ttl
+
+        self.lock = threading.Lock()
+
+        # scans accepting further queries, by bank scan key
+        self.pending = {}
+
+        # recent results: (bank scan key, query key) -> (expiry, data version, value)
+        self.results = {}
+
+        # queries in progress
+        self.active = 0
+
+        self.hits = self.misses = self.scans = 0
+
+    def clear(self):
+        """Discard recent results."""
+        with self.lock:
+            self.results.clear()
+
+    @staticmethod
+    def get_query_key(bank, op):
+        return (op.scan_key, bank.flat)
+
+    def _expire_(self, now):
+        expired = [key for (key, (expiry, _version, _value)) in self.results.items()
+                   if expiry <= now]
+
+        for key in expired:
+            del self.results[key]
+
+    def reduce(self, bank, op_stack):
+        """Apply the aggregators of `op_stack` to the datasets of `bank`,
+        by way of a scan shared with other queries.
+
+        Results are returned, unrounded, by their keys in `op_stack`.
+
+        """
+        scan_key = bank.scan_key
+
+        version = bank.data_version
+
+        queries = {write_key: self.get_query_key(bank, op) for (write_key, op) in op_stack.items()}
+
+        points = {}
+
+        with self.lock:
+            self._expire_(time.monotonic())
+
+            for (write_key, query_key) in tuple(queries.items()):
+                try:
+                    (_expiry, result_version, value) = self.results[scan_key, query_key]
+                except KeyError:
+                    continue
+
+                if version is not None and result_version != version:
+                    # data files have changed since
+                    del self.results[scan_key, query_key]
+                    continue
+
+                points[write_key] = copy.deepcopy(value)
+                del queries[write_key]
+
+            if not queries:
+                self.hits += 1
+                return points
+
+            self.misses += 1
+
+            try:
+                scan = self.pending[scan_key]
+            except KeyError:
+                scan = self.pending[scan_key] = Scan()
+                leader = True
+            else:
+                leader = False
+
+            for (write_key, query_key) in queries.items():
+                scan.ops.setdefault(query_key, op_stack[write_key])
+
+            # wait on followers only where others' queries are in progress
+            wait = leader and self.active > 0
+
+            self.active += 1
+
+        try:
+            if leader:
+                self._run_(bank, scan_key, scan, version, wait)
+            else:
+                scan.done.wait()
+
+                if scan.error is not None:
+                    # (raise anew rather than share the leader's exception -- and traceback)
+                    raise ScanError(f"shared scan failed: {scan.error!r}") from scan.error
+        finally:
+            with self.lock:
+                self.active -= 1
+
+        for (write_key, query_key) in queries.items():
+            points[write_key] = copy.deepcopy(scan.results[query_key])
+
+        return points
+
+    def _run_(self, bank, scan_key, scan, version, wait):
+        if wait and self.delay > 0:
+            time.sleep(self.delay)
+
+        with self.lock:
+            # close the scan to further queries
+            del self.pending[scan_key]
+            self.scans += 1
+
+        log.trace('shared scan of {} queries', len(scan.ops))
+
+        flats = {(op_key, flat): flat for (op_key, flat) in scan.ops}
+
+        try:
+            results = bank.reduce(scan.ops, flats)
+        except BaseException as exc:
+            scan.error = exc
+            raise
+        else:
+            scan.results = results
+
+            expiry = time.monotonic() + self.ttl
+
+            with self.lock:
+                for (query_key, value) in results.items():
+                    self.results[scan_key, query_key] = (expiry, version, value)
+        finally:
+            scan.done.set()
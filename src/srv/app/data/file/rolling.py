@@ -0,0 +1,413 @@
+"""Rolling windows of aggregates maintained over the column store.
+
+Rather than recompute aggregates such as `StdDev` and `Multi` from the
+rows of their (week-long) windows upon each query, a "rolling" window of
+each aggregate may be maintained: updated as each new row is ingested
+into the column store (see `app.data.file.column`), and expired of old
+values as the window slides.
+
+Queries of rolling windows then cost O(1) -- (or, for windows of
+multiple values, the cost of copying the window's values) -- regardless
+of the number of rows in the window.
+
+Windows are created upon the first query of their aggregator, and
+"seeded" from the store's rows already in their window -- without
+blocking queries of other windows meanwhile. Thereafter, windows are
+advanced by ingestion (see `LocalDataFileBank.ingest`): queries only
+read them. (A file arriving late is ingested into the store in its place,
+such that its rows following it are discarded; windows cannot be updated
+out of order, and are rather discarded, to be re-seeded upon query.)
+
+"""
+import abc
+import collections
+import math
+import threading
+import time
+
+from loguru import logger as log
+
+from .base import TIME_KEY, Last, Multi, StdDev
+
+
+# maximum number of windows maintained (oldest windows are dropped first)
+WINDOW_LIMIT = 32
+
+
+class Dataset(collections.namedtuple('Dataset', ('seq', 'time', 'values', 'meta'))):
+    """Dataset of a column store row as ingested into rolling windows.
+
+    `seq` is the row number of the dataset in the store.
+
+    """
+    __slots__ = ()
+
+
+class Window(abc.ABC):
+    """Rolling window of an aggregator's results."""
+
+    def __init__(self, op, flat):
+        self.op = op
+        self.flat = flat
+
+    def get_value(self, dataset):
+        """Retrieve the aggregator's (decorated) value from the given
+        `dataset`.
+
+        Raises `LookupError` for a dataset which lacks a value.
+
+        """
+        value = self.op.get_uservalue(dataset.values)
+        return self.op.decorate_meta(value, dataset.meta, self.flat)
+
+    @abc.abstractmethod
+    def push(self, dataset):
+        """Ingest the given `dataset` (more recent than any ingested)."""
+
+    @abc.abstractmethod
+    def prepend(self, dataset, now):
+        """Seed the window with the given `dataset` (older than any
+        ingested).
+
+        Returns whether the window requires further (older) datasets.
+
+        """
+
+    @abc.abstractmethod
+    def result(self, seq_min, now):
+        """Compute the aggregator's result for the window including only
+        datasets as recent as `seq_min` and as `now` (less the
+        aggregator's age).
+
+        """
+
+
+class LastWindow(Window):
+
+    def __init__(self, op, flat):
+        super().__init__(op, flat)
+        self.last = None
+
+    def push(self, dataset):
+        try:
+            value = self.get_value(dataset)
+        except LookupError:
+            pass
+        else:
+            self.last = (dataset.seq, value)
+
+    def prepend(self, dataset, now):
+        self.push(dataset)
+        return self.last is None
+
+    def result(self, seq_min, now):
+        if self.last is None:
+            return None
+
+        (seq, value) = self.last
+
+        return value if seq >= seq_min else None
+
+
+class MultiWindow(Window):
+    """Window of values in ascending time order."""
+
+    def __init__(self, op, flat):
+        super().__init__(op, flat)
+        self.items = collections.deque()
+
+    def precedes(self, dataset_time, now):
+        return dataset_time is None or now - dataset_time >= self.op.age_s
+
+    def add(self, value):
+        pass
+
+    def discard(self, value):
+        pass
+
+    def push(self, dataset):
+        # (datasets lacking a time cannot be placed in the window)
+        if dataset.time is None:
+            return
+
+        try:
+            value = self.get_value(dataset)
+        except LookupError:
+            pass
+        else:
+            self.items.append((dataset.seq, dataset.time, value))
+            self.add(value)
+
+    def prepend(self, dataset, now):
+        # (datasets lacking a time are skipped rather than ending the window)
+        if dataset.time is None:
+            return True
+
+        if self.precedes(dataset.time, now):
+            return False
+
+        try:
+            value = self.get_value(dataset)
+        except LookupError:
+            pass
+        else:
+            self.items.appendleft((dataset.seq, dataset.time, value))
+            self.add(value)
+
+        return True
+
+    def expire(self, seq_min, now):
+        while self.items:
+            (seq, dataset_time, value) = self.items[0]
+
+            if seq >= seq_min and not self.precedes(dataset_time, now):
+                break
+
+            self.items.popleft()
+            self.discard(value)
+
+    def result(self, seq_min, now):
+        self.expire(seq_min, now)
+
+        values = [value for (_seq, _time, value) in self.items]
+
+        # Multi collects values in descending time order, unless reversed
+        if not self.op.reverse:
+            values.reverse()
+
+        return values
+
+
+class StdDevWindow(MultiWindow):
+    """Window of values whose sample standard deviation is maintained by
+    Welford's algorithm.
+
+    """
+    def __init__(self, op, flat):
+        super().__init__(op, flat)
+        self.count = 0
+        self.mean = 0.0
+        self.sum_squares = 0.0
+
+    def add(self, value):
+        for value0 in self.op.iter_numeric(value):
+            self._add_(value0)
+
+    def discard(self, value):
+        for value0 in self.op.iter_numeric(value):
+            self._discard_(value0)
+
+    def _add_(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.sum_squares += delta * (value - self.mean)
+
+    def _discard_(self, value):
+        self.count -= 1
+
+        if self.count == 0:
+            self.mean = self.sum_squares = 0.0
+            return
+
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        self.sum_squares = max(self.sum_squares - delta * (value - self.mean), 0.0)
+
+    def result(self, seq_min, now):
+        self.expire(seq_min, now)
+
+        if self.count < 2:
+            return None
+
+        return math.sqrt(self.sum_squares / (self.count - 1))
+
+
+class RollingWindows:
+    """Rolling windows of the aggregators of recent queries, maintained
+    over the rows of the column `store`.
+
+    Only aggregators of exactly the types `Last`, `Multi` and `StdDev`
+    are supported; and, only queries of banks answered by the `store`,
+    retaining as many files as it retains rows.
+
+    """
+    WINDOW_TYPES = {
+        Last: LastWindow,
+        Multi: MultiWindow,
+        StdDev: StdDevWindow,
+    }
+
+    def __init__(self, store):
+        self.store = store
+
+        self.lock = threading.Lock()
+
+        # windows by (aggregator scan key, flat)
+        self.windows = {}
+
+        # store revision and row (exclusive) through which windows are advanced
+        self.revision = None
+        self.stop = 0
+
+    @property
+    def retain(self):
+        return self.store.retain
+
+    def clear(self):
+        """Discard all windows (which are re-seeded upon query)."""
+        with self.lock:
+            self.windows.clear()
+
+    def accepts(self, bank, ops):
+        """Whether the rolling windows may answer a query of the given
+        `bank` for the given aggregator `ops`.
+
+        (The bank is expected to have selected the store to answer the
+        query -- see `LocalDataFileBank.select_columns`.)
+
+        """
+        return (
+            bank.columns is self.store and
+            bank.file_limit == self.retain and
+            all(type(op) in self.WINDOW_TYPES for op in ops)
+        )
+
+    def _iter_datasets_(self, keys, start=None, stop=None, limit=None):
+        """Generate datasets of the store's rows in [`start`, `stop`) in
+        descending order.
+
+        """
+        meta_prefix = self.store.meta_prefix
+
+        for (row, data, full_data) in self.store.iter_rows(keys, start, stop, limit):
+            meta = full_data[meta_prefix]
+            yield Dataset(row, meta[TIME_KEY], data, meta)
+
+    def _push_(self, windows, start, stop):
+        """Ingest the store's rows in [`start`, `stop`) into `windows`."""
+        if not windows or start >= stop:
+            return
+
+        keys = frozenset(read_key for window in windows.values()
+                         for read_key in window.op.read_keys)
+
+        for dataset in reversed(list(self._iter_datasets_(keys, start, stop))):
+            for window in windows.values():
+                window.push(dataset)
+
+    def advance(self):
+        """Ingest the store's rows which have not yet been ingested into
+        all windows.
+
+        Windows are discarded (to be re-seeded upon query) if rows have
+        since been discarded from the store other than by compaction.
+
+        Returns the number of rows ingested.
+
+        """
+        with self.lock:
+            with self.store.lock:
+                (revision, stop) = (self.store.revision, self.store.stop)
+
+            if revision != self.revision:
+                if self.windows:
+                    log.debug('rolling windows | store revised: discarding {} window(s)',
+                              len(self.windows))
+
+                self.windows.clear()
+                (self.revision, self.stop) = (revision, stop)
+
+                return 0
+
+            count = stop - self.stop
+
+            self._push_(self.windows, self.stop, stop)
+            self.stop = stop
+
+            return count
+
+    def _seed_(self, window, now, stop):
+        """Seed `window` from the store's rows preceding `stop`."""
+        for dataset in self._iter_datasets_(window.op.read_keys, stop=stop, limit=self.retain):
+            if not window.prepend(dataset, now):
+                break
+
+    def _install_(self, seeded, revision, stop, now):
+        """Install the windows `seeded` as of the store's `revision` and
+        row `stop` -- first ingesting into these any rows ingested since.
+
+        (Lock held.)
+
+        """
+        if self.revision == revision:
+            self._push_(seeded, stop, self.stop)
+        else:
+            # rows have since been discarded: seed anew
+            log.debug('rolling windows | re-seeding {} window(s)', len(seeded))
+
+            for (window_key, window) in seeded.items():
+                window_type = self.WINDOW_TYPES[type(window.op)]
+                window = seeded[window_key] = window_type(window.op, window.flat)
+                self._seed_(window, now, self.stop)
+
+        windows = {}
+
+        for (window_key, window) in seeded.items():
+            # (prefer any window installed by another query meanwhile)
+            if window_key not in self.windows:
+                while len(self.windows) >= WINDOW_LIMIT:
+                    del self.windows[next(iter(self.windows))]
+
+                self.windows[window_key] = window
+
+            windows[window_key] = self.windows[window_key]
+
+        return windows
+
+    def reduce(self, op_stack, flats):
+        """Compute the results of the aggregators of `op_stack` from their
+        rolling windows.
+
+        Windows not yet maintained are seeded without holding the lock
+        (such that queries of other windows may proceed), and installed
+        once brought up to date.
+
+        Results are returned, unrounded, by their keys in `op_stack`.
+
+        """
+        window_keys = {write_key: (op.scan_key, flats[write_key])
+                       for (write_key, op) in op_stack.items()}
+
+        with self.lock:
+            now = time.time()
+
+            windows = {window_key: self.windows.get(window_key)
+                       for window_key in window_keys.values()}
+
+            if None not in windows.values():
+                return self._results_(windows, window_keys, now)
+
+            (revision, stop) = (self.revision, self.stop)
+
+        seeded = {}
+
+        for (write_key, op) in op_stack.items():
+            window_key = window_keys[write_key]
+
+            if windows[window_key] is None and window_key not in seeded:
+                window = seeded[window_key] = self.WINDOW_TYPES[type(op)](op, flats[write_key])
+                self._seed_(window, now, stop)
+
+        with self.lock:
+            windows.update(self._install_(seeded, revision, stop, now))
+
+            return self._results_(windows, window_keys, time.time())
+
+    def _results_(self, windows, window_keys, now):
+        seq_min = self.stop - self.retain
+
+        return {
+            write_key: windows[window_key].result(seq_min, now)
+            for (write_key, window_key) in window_keys.items()
+        }
@@ -4,7 +4,6 @@ import concurrent.futures
 import datetime
 import functools
 import itertools
-import json
 import os.path
 import re
 
@@ -14,25 +13,28 @@ import s3path
 from loguru import logger as log
 
 from app import conf
+from app.lib.concurrent import FairExecutor
 from app.lib.log import log_enum
 
-from ..base import AbstractDataFileBank
+from ..base import (
+    AbstractDataFileBank,
+    BLOCK_SIZE_MIN,
+    JSON_DECODER,
+    get_file_patterns,
+    get_name_time,
+    match_file_patterns,
+)
 
-from .caching import CachingS3Path
+from .caching import S3_INDEX_CACHE, S3_LIST_CACHE, CachingS3Path
+from .index import DeviceKeyIndex
+from .listing import S3Lister, S3ObjectKey
 
 
 DATAFILE_LIMIT = 50_000
 
-DATE_PATTERN = '[0-9]' * 8
-
-_RE = re.compile
+DATE_PATTERN = re.compile('[0-9]{8}')
 
-FILE_PATTERNS = (
-    # (key_pattern, file_pattern),
-    (_RE(r'^ping_latency\.'), _RE(r'^result-.+-ping.json$')),
-    (_RE(r'^ookla\.'), _RE(r'^result-.+-ookla(?:-metadata)?.json$')),
-    (_RE(r'^ndt7\.'), _RE(r'^result-.+-ndt7(?:-metadata)?.json$')),
-)
+DATE_FORMAT = '%Y%m%d'
 
 MAX_POOL_CONNECTIONS = MAX_WORKERS = 30
 
@@ -40,18 +42,46 @@ MAX_WORKERS_LIST = int(0.67 * MAX_WORKERS)
 
 MAX_WORKERS_GET = MAX_WORKERS - MAX_WORKERS_LIST
 
+#
+# S3 requests of all data file banks (requests) are made by shared, bounded executors --
+# their workers together matching the connection pool -- serving each bank in turn
+#
+S3_LIST_EXECUTOR = FairExecutor(MAX_WORKERS_LIST, name='s3-list')
+
+S3_GET_EXECUTOR = FairExecutor(MAX_WORKERS_GET, name='s3-get')
+
+#
+# data files are read ahead of their consumer within a window: initially, of the first block of
+# datasets (see iter_blocks) -- where the consumer may be satisfied by the most recent data (e.g.
+# Last) -- or, where data since some time are consumed (e.g. Multi), of READ_AHEAD_FACTOR times
+# the get workers; the window grows by one with each data file consumed, up to the latter.
+#
+READ_AHEAD_FACTOR = 1.5
+
+READ_AHEAD_MIN = BLOCK_SIZE_MIN
+
 BOTO_CONFIG = botocore.config.Config(max_pool_connections=MAX_POOL_CONNECTIONS)
 
+S3_RESOURCE = boto3.resource('s3', config=BOTO_CONFIG)
+
 #
 # increase urllib connection pool size
 #
-s3path.register_configuration_parameter(
-    s3path.PureS3Path('/'),
-    resource=boto3.resource('s3', config=BOTO_CONFIG),
-)
+s3path.register_configuration_parameter(s3path.PureS3Path('/'), resource=S3_RESOURCE)
+
+#
+# (boto3 clients -- unlike resources -- are thread-safe)
+#
+S3_LISTER = S3Lister(S3_RESOURCE.meta.client, S3_LIST_CACHE)
 
 DATE_PATH_CACHEABLE_AGE = datetime.timedelta(days=2)
 
+#
+# date directories' dates are not assumed to share any particular time zone
+# with data files' timestamps
+#
+DATE_PATH_TOLERANCE = datetime.timedelta(days=1)
+
 
 class S3DataFileBank(AbstractDataFileBank):
 
@@ -89,6 +119,9 @@ class S3DataFileBank(AbstractDataFileBank):
         self.max_workers_get = max_workers_get
         self.max_workers_list = max_workers_list
 
+        self.get_session = S3_GET_EXECUTOR.session(max_workers_get)
+        self.list_session = S3_LIST_EXECUTOR.session(max_workers_list)
+
     @functools.cached_property
     def bucket_path(_self):
         bucket_spec = (conf.DATAFILE_S3_BUCKET if conf.DATAFILE_S3_BUCKET.startswith('/')
@@ -96,77 +129,101 @@ class S3DataFileBank(AbstractDataFileBank):
         bucket_path = CachingS3Path(bucket_spec)
         return bucket_path / conf.DATAFILE_S3_BASE.lstrip('/')
 
+    @property
+    def bucket(self):
+        return self.bucket_path.bucket
+
     @functools.cached_property
-    def ignored_paths(self):
-        return {self.bucket_path / ignored.lstrip('/') for ignored in conf.DATAFILE_S3_IGNORE}
+    def base_prefix(self):
+        # key prefix of bucket path -- either empty or ending in the delimiter
+        return f'{key}/' if (key := self.bucket_path.key) else ''
+
+    @functools.cached_property
+    def ignored_prefixes(self):
+        return {f"{self.base_prefix}{ignored.strip('/')}/" for ignored in conf.DATAFILE_S3_IGNORE}
+
+    def prefilter_ignored(self, prefixes):
+        for prefix in prefixes:
+            if prefix not in self.ignored_prefixes:
+                yield prefix
 
-    def prefilter_ignored(self, paths):
-        for path in paths:
-            if path not in self.ignored_paths:
-                yield path
+    def _list_dirs_(self, prefix, **kwargs):
+        return [f'{prefix}{name}/' for name in S3_LISTER.list_dirs(self.bucket, prefix, **kwargs)]
+
+    @property
+    def scan_key(self):
+        return ('s3', self.device_id, *super().scan_key)
 
     def get_points(self, *ops, **named_ops):
         # note: wrapped for debug purposes only
         results = super().get_points(*ops, **named_ops)
         log.debug('listing cache hits={0.hits} misses={0.misses}', CachingS3Path._list_cache_)
         log.debug('get cache hits={0.hits} misses={0.misses}', CachingS3Path._get_cache_)
+        log.debug('list executor {}', S3_LIST_EXECUTOR.stats())
+        log.debug('get executor {}', S3_GET_EXECUTOR.stats())
+        if self.read_failures is not None:
+            log.debug('unreadable files count={count} skips={skips} failures={failures}',
+                      **self.read_failures.stats())
         return results
 
-    def iter_datasets(self, keys=()):
+    def iter_datasets(self, keys=(), since=None):
         # note: wrapped for debug purposes only
-        yield from log_enum(super().iter_datasets(keys), 'datasets')
+        yield from log_enum(super().iter_datasets(keys, since), 'datasets')
 
-    def iter_datablobs(self, keys=(), max_workers=None):
+    def iter_datablobs(self, keys=(), since=None, max_workers=None):
         if max_workers is None:
-            max_workers = self.max_workers_get
-
-        self._check_max_workers(max_workers)
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # we don't know how many blobs the receiver will need;
-            # but requesting them one at a time is too slow.
-            #
-            # instead, we'll "read ahead", requesting blobs concurrently,
-            # and reading further for each blob that's received (sent).
-            #
-            paths = self.iter_paths(keys)
-
-            futures = collections.deque(
-                executor.submit(self.get_datablob, path)
-                for path in itertools.islice(paths, int(1.5 * max_workers))
-            )
+            (max_workers, session) = (self.max_workers_get, self.get_session)
+        else:
+            self._check_max_workers(max_workers)
+            session = S3_GET_EXECUTOR.session(max_workers)
+
+        # we don't know how many blobs the receiver will need;
+        # but requesting them one at a time is too slow.
+        #
+        # instead, we'll "read ahead", requesting blobs concurrently,
+        # and reading further for each blob that's received (sent).
+        #
+        window_max = max(int(READ_AHEAD_FACTOR * max_workers), 1)
+        window = window_max if since is not None else min(READ_AHEAD_MIN, window_max)
+
+        paths = self.iter_paths(keys, since)
+
+        futures = collections.deque(
+            session.submit(self.get_datablob, path, keys)
+            for path in itertools.islice(paths, window)
+        )
 
+        try:
             while futures:
                 # wait on result of first/oldest request
                 future0 = futures.popleft()
                 data = future0.result()
 
-                # add another request to the queue
-                try:
-                    path = next(paths)
-                except StopIteration:
-                    pass
-                else:
-                    future1 = executor.submit(self.get_datablob, path)
+                # add another request to the queue (two, until the window is full)
+                window = min(window + 1, window_max)
+
+                for path in itertools.islice(paths, window - len(futures)):
+                    future1 = session.submit(self.get_datablob, path, keys)
                     futures.append(future1)
 
                 # send result
                 if data is not None:
                     yield data
+        finally:
+            # should the receiver stop early, abandon outstanding requests:
+            # those pending are cancelled, and the results of those in flight discarded
+            abandoned = sum(future.cancel() for future in futures)
 
-    @classmethod
-    def get_datablob(cls, path):
-        try:
-            return cls.get_json(path)
-        except cls.DATA_FILE_READ_ERRORS:
-            return None
+            if abandoned:
+                log.debug('datablobs | cancelled {} of {} read-ahead request(s)',
+                          abandoned, len(futures))
 
     @staticmethod
     def get_json(path):
-        with path.open(cache=True) as fd:
-            return json.load(fd)
+        # paths are listed as strings (see S3ObjectKey) and constructed only upon retrieval
+        return JSON_DECODER.loads(CachingS3Path(path).read_cached())
 
-    def iter_paths(self, keys=()):
+    def iter_paths(self, keys=(), since=None):
         """Generate data file paths in descending order.
 
         Paths are excluded according to the provision of `keys` and any
@@ -175,22 +232,28 @@ class S3DataFileBank(AbstractDataFileBank):
         Paths will not be generated beyond the file limit specified upon
         instantiation.
 
+        If `since` is specified, paths are generated only until a date
+        directory or file is reached whose name indicates that it
+        precedes this timestamp; (earlier date directories are not
+        listed).
+
         """
         # slice sorted paths to limit
-        paths = itertools.islice(self._iter_paths_all_(), self.file_limit)
+        paths = itertools.islice(self._iter_paths_all_(since), self.file_limit)
+
+        # stop at window edge
+        if since is not None:
+            paths = itertools.takewhile(
+                lambda path: (path_time := get_name_time(path.name)) is None or path_time >= since,
+                paths,
+            )
 
         # exclude non-matching paths
-        file_patterns = set()
-        for key in keys:
-            for (key_pattern, file_pattern) in FILE_PATTERNS:
-                if key_pattern.search(key):
-                    file_patterns.add(file_pattern)
-                    break
-            else:
-                log.warning('inspecting every data file in sequence '
-                            'as no file pattern matches key {!r}', key)
-                file_patterns.clear()
-                break
+        file_patterns = get_file_patterns(keys)
+
+        if file_patterns is None and keys:
+            log.warning('inspecting every data file in sequence '
+                        'as no file pattern matches key(s) {!r}', keys)
 
         if file_patterns:
             log.debug('datapaths | filtering to files matching: {}',
@@ -198,76 +261,185 @@ class S3DataFileBank(AbstractDataFileBank):
 
             paths = log_enum(paths, 'datapaths', 2)
 
-            paths = (path for path in paths
-                     if any(file_pattern.search(path.name) for file_pattern in file_patterns))
+            paths = (path for path in paths if match_file_patterns(path.name, file_patterns))
             paths = log_enum(paths, 'datapaths>filtered')
         else:
             paths = log_enum(paths, 'datapaths')
 
         yield from paths
 
-    def _iter_paths_all_(self):
-        """Generate data file paths in descending order."""
-        data_dirs = self._list_concurrent(
-            self._s3_search_experiment,
-            self.prefilter_ignored(self.bucket_path.iterdir(cache=True)),
-        )
-        data_dirs.sort(
-            key=os.path.basename,
-            reverse=True,
-        )
+    @property
+    def index_key(self):
+        return f'{self.bucket_path}:{self.device_id}'
 
-        for (_date, paths) in itertools.groupby(data_dirs, os.path.basename):
-            data_files = self._list_concurrent(
-                self._s3_search_date,
-                paths,
-            )
-            data_files.sort(
-                key=os.path.basename,
-                reverse=True,
+    def _iter_paths_all_(self, since=None):
+        """Generate data file paths in descending order.
+
+        Data files are generated by date, newest first: those of recent
+        dates are listed; those of closed dates are read from the
+        device's persistent key index (see `DeviceKeyIndex`). Each
+        closed date not yet indexed is listed (and indexed) only once the
+        consumer reaches it.
+
+        The device's directories are taken from its index -- and searched
+        anew only daily (see `_search_device_dirs_`).
+
+        Date directories preceding the timestamp `since` (if specified)
+        are not listed.
+
+        """
+        if since is None:
+            date_since = None
+        else:
+            date_since = (
+                datetime.datetime.fromtimestamp(since, datetime.timezone.utc).date() -
+                DATE_PATH_TOLERANCE
             )
 
+        date_closed = f'{datetime.date.today() - DATE_PATH_CACHEABLE_AGE:{DATE_FORMAT}}'
+
+        # the device directories recorded by the device's index are searched anew only
+        # upon the daily update of its listing of closed dates
+        index = DeviceKeyIndex.get(S3_INDEX_CACHE, self.index_key)
+
+        if index is None or index.listed_through != date_closed:
+            device_dirs = self._search_device_dirs_()
+
+            if not device_dirs:
+                return
+
+            index = DeviceKeyIndex.get(S3_INDEX_CACHE, self.index_key, device_dirs)
+        else:
+            device_dirs = index.dirs
+
+        date_since = date_since and f'{date_since:{DATE_FORMAT}}'
+
+        for date in self._iter_dates_(device_dirs, index):
+            if date_since is not None and date < date_since:
+                log.debug('datapaths | stopping at date directories preceding: {}', date_since)
+                break
+
+            if (keys := index.dates.get(date)) is not None:
+                yield from map(S3ObjectKey, keys)
+                continue
+
+            data_files = self._list_date_([f'{device_dir}{date}/' for device_dir in device_dirs])
+
+            if date <= date_closed:
+                index.record_date(date, data_files)
+
             yield from data_files
 
-    def _s3_search_experiment(self, experiment_path):
-        return self._list_concurrent(
-            self._s3_search_topic,
-            self.prefilter_ignored(experiment_path.iterdir(cache=True)),
+    def _search_device_dirs_(self):
+        """List the device's directories (the prefixes of these) under
+        each experiment and topic.
+
+        """
+        # (each level of directories is listed concurrently -- but tasks never await others)
+        topic_dirs = self._list_concurrent(
+            self._s3_search_experiment,
+            self.prefilter_ignored(self._list_dirs_(self.base_prefix, cache=True)),
         )
 
-    def _s3_search_topic(self, topic_path):
-        return self._list_concurrent(
-            self._s3_search_device,
-            topic_path.glob(f'*-{self.device_id}', cache=True),
+        return self._list_concurrent(self._s3_search_topic, topic_dirs)
+
+    def _iter_dates_(self, device_dirs, index):
+        """Generate the dates (names) of the device's date directories,
+        in descending order.
+
+        Recent date directories -- which may yet be created -- are not
+        listed but rather generated as candidates (their data file
+        directories listed as usual, whether present or not).
+
+        Closed dates are taken from the listing recorded to the device's
+        `index`, only once these are reached -- the device directories
+        listed only for those dates following this listing (if any).
+
+        """
+        today = datetime.date.today()
+
+        for days in range(-DATE_PATH_TOLERANCE.days, DATE_PATH_CACHEABLE_AGE.days):
+            yield f'{today - datetime.timedelta(days):{DATE_FORMAT}}'
+
+        date_closed = today - DATE_PATH_CACHEABLE_AGE
+        date_closed_name = f'{date_closed:{DATE_FORMAT}}'
+
+        if index.listed_through is None:
+            dates = set(self._list_concurrent(self._s3_search_device, device_dirs))
+        elif index.listed_through < date_closed_name:
+            # list only those date directories following the recorded listing --
+            # (keys of the date directory following it are at least its name)
+            date_next = datetime.date.fromisoformat(index.listed_through) + datetime.timedelta(1)
+
+            dates = set(index.listed)
+            dates.update(self._list_concurrent(self._s3_search_device,
+                                               device_dirs,
+                                               f'{date_next:{DATE_FORMAT}}'))
+        else:
+            dates = set(index.listed)
+
+        if index.listed_through != date_closed_name:
+            dates = {date for date in dates if date <= date_closed_name}
+            index.record_listing(date_closed_name, dates)
+
+        yield from sorted(dates, reverse=True)
+
+    def _list_date_(self, date_prefixes):
+        """List the data files of the given date directories (all of the
+        same date), in descending order.
+
+        """
+        data_files = self._list_concurrent(
+            self._s3_search_date,
+            date_prefixes,
         )
+        data_files.sort(
+            key=os.path.basename,
+            reverse=True,
+        )
+        return data_files
 
-    @staticmethod
-    def _s3_search_device(device_path):
-        return [*device_path.glob(DATE_PATTERN)]
+    def _s3_search_experiment(self, experiment_prefix):
+        return [*self.prefilter_ignored(self._list_dirs_(experiment_prefix, cache=True))]
 
-    @staticmethod
-    def _s3_search_date(date_path):
-        path_date = datetime.date.fromisoformat(date_path.name)
+    def _s3_search_topic(self, topic_prefix):
+        device_suffix = f'-{self.device_id}/'
+        return [device_prefix for device_prefix in self._list_dirs_(topic_prefix, cache=True)
+                if device_prefix.endswith(device_suffix)]
+
+    def _s3_search_device(self, device_prefix, date_after=None):
+        start_after = date_after and f'{device_prefix}{date_after}'
+
+        return [date for date in S3_LISTER.list_dirs(self.bucket,
+                                                     device_prefix,
+                                                     start_after=start_after)
+                if DATE_PATTERN.fullmatch(date)]
+
+    def _s3_search_date(self, date_prefix):
+        path_date = datetime.date.fromisoformat(date_prefix[-9:-1])
         path_age = datetime.date.today() - path_date
         cacheable = path_age >= DATE_PATH_CACHEABLE_AGE
 
-        data_path = date_path / 'json'
-        return [*data_path.iterdir(cache=cacheable)]
+        return S3_LISTER.list_keys(self.bucket, f'{date_prefix}json/', cache=cacheable)
 
     def _list_concurrent(self, func, it, *args, max_workers=None, **kwargs):
         if max_workers is None:
-            max_workers = self.max_workers_list
+            session = self.list_session
+        else:
+            self._check_max_workers(max_workers)
+            session = S3_LIST_EXECUTOR.session(max_workers)
 
-        self._check_max_workers(max_workers)
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [
-                executor.submit(func, item, *args, **kwargs)
-                for item in it
-            ]
+        futures = [
+            session.submit(func, item, *args, **kwargs)
+            for item in it
+        ]
 
+        try:
             return [
                 item
                 for future in concurrent.futures.as_completed(futures)
                 for item in future.result()
             ]
+        finally:
+            # (as upon exit of an executor of our own)
+            concurrent.futures.wait(futures)
@@ -2,13 +2,17 @@ from __future__ import annotations
 import datetime
 import enum
 import io
+import os
+import pathlib
 import sys
+import urllib.parse
 from collections.abc import Iterable
 from functools import cached_property
 from typing import Self, Generator
 
 import s3path
 import valkey
+from loguru import logger as log
 
 from app import conf
 from app.lib.abstract import abstractmember
@@ -27,6 +31,7 @@ class S3CacheNS(enum.IntEnum):
 
     LIST = 0
     GET = 1
+    INDEX = 2
 
 
 class ValKeyCache(SimpleCache):
@@ -63,6 +68,20 @@ class S3ListCacheValKey(ValKeyCache):
             self.misses += 1
             return None
 
+    def get_value(self, key: S3Key) -> list[str] | None:
+        """Retrieve the cached listing of `key` as strings (without
+        constructing paths).
+
+        """
+        cached = self._client_.smembers(self._nskey_(key))
+
+        if cached:
+            self.hits += 1
+            return [value for value in cached if value != '']
+        else:
+            self.misses += 1
+            return None
+
     def set(self, key: S3Key, values: Iterable[S3Key]) -> bool:
         nskey = self._nskey_(key)
         prepped = [str(value) for value in values] or ['']
@@ -83,23 +102,134 @@ class S3GetCacheValKey(ValKeyCache):
         if not decode:
             raise NotImplementedError("bytes not supported")
 
+        value = self.get_value(key)
+
+        return None if value is None else io.StringIO(value)
+
+    def get_value(self, key: S3Key) -> str | None:
         value = self._client_.getex(self._nskey_(key), ex=self.ttl)
 
         if value is None:
             self.misses += 1
-            return value
         else:
             self.hits += 1
-            return io.StringIO(value)
+
+        return value
 
     def set(self, key: S3Key, value: str | bytes) -> bool:
         return self._client_.set(self._nskey_(key), value, ex=self.ttl)
 
 
+class S3IndexCacheValKey(ValKeyCache):
+    """Append-only lists of lines (see `DeviceKeyIndex`) stored as
+    ValKey lists.
+
+    """
+    ns = S3CacheNS.INDEX
+    ttl = datetime.timedelta(weeks=2)
+
+    def get(self, key: str) -> list[str] | None:
+        lines = self._client_.lrange(self._nskey_(key), 0, -1)
+
+        if lines:
+            self.hits += 1
+            return lines
+        else:
+            self.misses += 1
+            return None
+
+    def set(self, key: str, lines: Iterable[str]) -> bool:
+        nskey = self._nskey_(key)
+        pipeline = self._client_.pipeline(transaction=True).delete(nskey)
+
+        if lines := list(lines):
+            pipeline.rpush(nskey, *lines).expire(nskey, self.ttl)
+
+        pipeline.execute()
+        return True
+
+    def append(self, key: str, lines: Iterable[str]) -> bool:
+        if not (lines := list(lines)):
+            return True
+
+        nskey = self._nskey_(key)
+        (
+            self._client_.pipeline(transaction=True)
+            .rpush(nskey, *lines)
+            .expire(nskey, self.ttl)
+        ).execute()
+        return True
+
+
+class S3IndexCacheFile(SimpleCache):
+    """Append-only lists of lines (see `DeviceKeyIndex`) stored as text
+    files under `cache_dir`.
+
+    """
+    def __init__(self, cache_dir: str | pathlib.PurePath) -> None:
+        super().__init__()
+        self._cache_dir_ = pathlib.Path(cache_dir)
+
+    def _get_path_(self, key: str) -> pathlib.Path:
+        return self._cache_dir_ / urllib.parse.quote(key, safe='')
+
+    def get(self, key: str) -> list[str] | None:
+        try:
+            text = self._get_path_(key).read_text()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError) as exc:
+            log.warning('s3 index | unreadable {} | {}', self._get_path_(key), exc)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        # (a final line lacking its newline was not completely written)
+        (*lines, _partial) = text.split('\n')
+        return lines
+
+    def set(self, key: str, lines: Iterable[str]) -> bool:
+        key_path = self._get_path_(key)
+        tmp_path = key_path.with_name(f'.{key_path.name}.tmp')
+
+        try:
+            key_path.parent.mkdir(parents=True, exist_ok=True)
+
+            with tmp_path.open('w') as fd:
+                for line in lines:
+                    fd.write(f'{line}\n')
+
+            os.replace(tmp_path, key_path)
+        except OSError as exc:
+            log.error('s3 index | failed to write {} | {}', key_path, exc)
+            return False
+
+        return True
+
+    def append(self, key: str, lines: Iterable[str]) -> bool:
+        key_path = self._get_path_(key)
+
+        try:
+            with key_path.open('a') as fd:
+                for line in lines:
+                    fd.write(f'{line}\n')
+        except OSError as exc:
+            log.error('s3 index | failed to write {} | {}', key_path, exc)
+            return False
+
+        return True
+
+    def discard(self, key: str) -> None:
+        self._get_path_(key).unlink(missing_ok=True)
+
+
 match conf.DATAFILE_S3_CACHE_BACKEND:
     case 'local':
         S3_LIST_CACHE = MemoryCache()
         S3_GET_CACHE = FileSystemCache(conf.DATAFILE_S3_CACHE_PATH)
+        S3_INDEX_CACHE = S3IndexCacheFile(conf.DATAFILE_S3_INDEX_PATH)
 
     case 'remote':
         if not conf.DATAFILE_S3_CACHE_REMOTE:
@@ -108,6 +238,7 @@ match conf.DATAFILE_S3_CACHE_BACKEND:
 
         S3_LIST_CACHE = S3ListCacheValKey(conf.DATAFILE_S3_CACHE_REMOTE)
         S3_GET_CACHE = S3GetCacheValKey(conf.DATAFILE_S3_CACHE_REMOTE)
+        S3_INDEX_CACHE = S3IndexCacheValKey(conf.DATAFILE_S3_CACHE_REMOTE)
 
     case _:
         raise ValueError(f"setting DATAFILE_S3_CACHE_BACKEND expects either "
@@ -215,3 +346,23 @@ class CachingS3Path(s3path.S3Path):
             return io.BytesIO(contents) if 'b' in mode else io.StringIO(contents)
 
         return cached
+
+    def read_cached(self) -> bytes | str:
+        """Read the object's contents via the get cache.
+
+        Unlike `open(cache=True)`, contents are returned as-is: as bytes,
+        or (as cached by some backends) as str -- without wrapping these
+        in a stream.
+
+        """
+        cached = self._get_cache_.get_value(self)
+
+        if cached is None:
+            with super().open('rb') as fd:
+                contents = fd.read()
+
+            self._get_cache_.set(self, contents)
+
+            return contents
+
+        return cached
@@ -0,0 +1,228 @@
+"""Persistent index of each device's data file keys.
+
+Listing a device's data files otherwise requires walking its device
+directories' date directories -- one listing per device directory, and
+one per date directory -- upon each (cold) request.
+
+Instead, the keys of each device's *closed* date directories (those no
+longer expected to change -- see `DATE_PATH_CACHEABLE_AGE`) are recorded
+to an append-only index, stored in the configured cache backend (see
+`caching.S3_INDEX_CACHE`). The index consists of lines:
+
+* a header recording the device directories indexed (should these
+  change, the index is discarded) -- such that these need not be
+  searched upon each request;
+
+* listing lines, each recording the date through which the device's
+  closed date directories were listed, and the dates of those directories
+  *newly* listed; and,
+
+* for each date indexed, its data files' keys, followed by a line
+  marking the date complete.
+
+Indexes are rewritten (upon loading) should their size exceed that of
+their required lines by `REWRITE_RATIO`.
+
+"""
+import collections
+import json
+import threading
+
+from loguru import logger as log
+
+
+DIRS_PREFIX = '/dirs '
+LISTING_PREFIX = '/listing '
+DATE_PREFIX = '/date '
+
+# indexes larger than this ratio of the size of their required lines are rewritten
+REWRITE_RATIO = 2
+
+# indexes retained in memory (those least-recently retrieved being discarded first)
+INDEX_COUNT = 32
+
+
+class DeviceKeyIndex:
+    """Persistent index of the data file keys of a device -- stored
+    under `key` -- whose data files are found under `device_dirs`.
+
+    If `device_dirs` are not given, those recorded by the stored index
+    (if any) are assumed.
+
+    Dates are represented by the names of their date directories
+    (*e.g.* `20240131`).
+
+    Indexes are retrieved via `get`, such that each is loaded once per
+    process; (at most `INDEX_COUNT` are retained).
+
+    """
+    _indexes_ = collections.OrderedDict()
+    _indexes_lock_ = threading.Lock()
+
+    def __init__(self, cache, key, device_dirs=None):
+        self.cache = cache
+        self.key = key
+        self.dirs = None if device_dirs is None else self._sort_dirs_(device_dirs)
+
+        self.lock = threading.Lock()
+
+        # date through which closed dates were last listed
+        self.listed_through = None
+
+        # dates of closed date directories as of their listing
+        self.listed = frozenset()
+
+        # keys of data files, by date
+        self.dates = {}
+
+        self._load_()
+
+    @staticmethod
+    def _sort_dirs_(device_dirs):
+        return sorted(str(device_dir) for device_dir in device_dirs)
+
+    @classmethod
+    def get(cls, cache, key, device_dirs=None):
+        """Retrieve the index of the device stored under `key`.
+
+        The index is discarded (and reset) should its device directories
+        differ from the given `device_dirs`.
+
+        If `device_dirs` are not given, the index is retrieved with those
+        it records; `None` is returned if no index is stored.
+
+        """
+        dirs = None if device_dirs is None else cls._sort_dirs_(device_dirs)
+
+        with cls._indexes_lock_:
+            index = cls._indexes_.get(key)
+
+            if index is None or (dirs is not None and index.dirs != dirs):
+                index = cls(cache, key, device_dirs)
+
+                if index.dirs is None:
+                    return None
+
+                cls._indexes_[key] = index
+
+                while len(cls._indexes_) > INDEX_COUNT:
+                    cls._indexes_.popitem(last=False)
+            else:
+                cls._indexes_.move_to_end(key)
+
+        return index
+
+    @classmethod
+    def clear(cls):
+        """Discard in-process indexes (such that these are reloaded)."""
+        with cls._indexes_lock_:
+            cls._indexes_.clear()
+
+    @property
+    def header(self):
+        return f'{DIRS_PREFIX}{json.dumps(self.dirs)}'
+
+    @staticmethod
+    def _read_header_(line):
+        if not line.startswith(DIRS_PREFIX):
+            return None
+
+        try:
+            dirs = json.loads(line[len(DIRS_PREFIX):])
+        except ValueError:
+            return None
+
+        return dirs if isinstance(dirs, list) else None
+
+    @staticmethod
+    def _get_size_(lines):
+        return sum(len(line) + 1 for line in lines)
+
+    def _load_(self):
+        lines = self.cache.get(self.key)
+
+        dirs = self._read_header_(lines[0]) if lines else None
+
+        if self.dirs is None:
+            if dirs is None:
+                # no index is stored (nor are its device directories given)
+                return
+
+            self.dirs = dirs
+
+        if dirs != self.dirs:
+            if lines:
+                log.debug('s3 index | device directories changed: resetting {}', self.key)
+
+            self.cache.set(self.key, [self.header])
+            return
+
+        keys = []
+        listed = set()
+
+        for line in lines[1:]:
+            if line.startswith(LISTING_PREFIX):
+                (listed_through, *listed_new) = line[len(LISTING_PREFIX):].split()
+                self.listed_through = listed_through
+                listed.update(listed_new)
+            elif line.startswith(DATE_PREFIX):
+                self.dates[line[len(DATE_PREFIX):]] = keys
+                keys = []
+            else:
+                keys.append(line)
+
+        self.listed = frozenset(listed)
+
+        # (keys not followed by their date's line were not completely written, and
+        # dates recorded more than once are superseded)
+        if self._get_size_(lines) > REWRITE_RATIO * self._get_size_(self._iter_lines_()):
+            self._rewrite_()
+
+    def _iter_lines_(self):
+        yield self.header
+
+        if self.listed_through is not None:
+            yield self._make_listing_line_(self.listed_through, self.listed)
+
+        for (date, keys) in self.dates.items():
+            yield from keys
+            yield f'{DATE_PREFIX}{date}'
+
+    def _rewrite_(self):
+        self.cache.set(self.key, list(self._iter_lines_()))
+
+    @staticmethod
+    def _make_listing_line_(listed_through, listed):
+        return ' '.join((f'{LISTING_PREFIX}{listed_through}', *sorted(listed)))
+
+    def record_listing(self, listed_through, listed):
+        """Record the dates `listed` of the device's closed date
+        directories, as listed through date `listed_through`.
+
+        (Only those dates not already recorded are written; should dates
+        recorded be omitted, the index is rewritten.)
+
+        """
+        listed = frozenset(listed)
+
+        with self.lock:
+            listed_new = listed - self.listed
+            rewrite = not listed >= self.listed
+
+            self.listed_through = listed_through
+            self.listed = listed
+
+            if rewrite:
+                self._rewrite_()
+            else:
+                self.cache.append(self.key,
+                                  [self._make_listing_line_(listed_through, listed_new)])
+
+    def record_date(self, date, keys):
+        """Record the data file `keys` of (closed) `date`."""
+        keys = [str(key) for key in keys]
+
+        with self.lock:
+            self.dates[date] = keys
+
+            self.cache.append(self.key, [*keys, f'{DATE_PREFIX}{date}'])
@@ -0,0 +1,118 @@
+"""Listing of S3 "directories" via list_objects_v2.
+
+Listings by way of s3path's `glob` and `iterdir` wrap every key listed
+in a path object, and match glob patterns client-side (by regular
+expression).
+
+Instead, `S3Lister` issues (paginated) `list_objects_v2` requests
+directly -- by `Prefix`, `Delimiter` and `StartAfter` -- and works with
+plain string keys. Path objects are constructed only as objects are
+retrieved (see `S3ObjectKey`).
+
+"""
+import threading
+
+from .caching import CachingS3Path
+
+
+DELIMITER = '/'
+
+# maximum keys per list_objects_v2 response
+PAGE_SIZE = 1000
+
+
+class S3ObjectKey(str):
+    """Full path (`/{bucket}/{key}`) of a listed S3 object.
+
+    As a `str`, the key is cheaply constructed, compared and sorted; its
+    path (see `path`) is constructed only upon retrieval of the object.
+
+    """
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return self[self.rfind(DELIMITER) + 1:]
+
+    @property
+    def path(self):
+        return CachingS3Path(self)
+
+
+class S3Lister:
+    """List the "directories" and objects of S3 prefixes via the boto3
+    S3 `client`.
+
+    Listings may be cached to `cache` (see `caching.S3_LIST_CACHE`).
+
+    Requests are counted by `requests`.
+
+    """
+    def __init__(self, client, cache=None):
+        self.client = client
+        self.cache = cache
+
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def _paginate_(self, bucket, prefix, start_after):
+        params = {'Bucket': bucket, 'Prefix': prefix, 'Delimiter': DELIMITER}
+
+        if start_after:
+            params['StartAfter'] = start_after
+
+        paginator = self.client.get_paginator('list_objects_v2')
+
+        for page in paginator.paginate(**params, PaginationConfig={'PageSize': PAGE_SIZE}):
+            with self.lock:
+                self.requests += 1
+
+            yield page
+
+    def _list_(self, bucket, prefix, kind, start_after, cache):
+        cache_key = f'{DELIMITER}{bucket}{DELIMITER}{prefix}#{kind}'
+
+        if cache and start_after is None and self.cache is not None:
+            cached = self.cache.get_value(cache_key)
+
+            if cached is not None:
+                return list(cached)
+
+        if kind == 'dirs':
+            # (common prefixes are given in full and end in the delimiter)
+            names = [
+                common['Prefix'][len(prefix):-len(DELIMITER)]
+                for page in self._paginate_(bucket, prefix, start_after)
+                for common in page.get('CommonPrefixes', ())
+            ]
+        else:
+            names = [
+                content['Key']
+                for page in self._paginate_(bucket, prefix, start_after)
+                for content in page.get('Contents', ())
+            ]
+
+        if cache and start_after is None and self.cache is not None:
+            self.cache.set(cache_key, names)
+
+        return names
+
+    def list_dirs(self, bucket, prefix='', *, start_after=None, cache=False):
+        """List the names of the "directories" directly under `prefix`
+        (which is empty or ends in the delimiter).
+
+        Only those directories whose keys follow `start_after` are
+        listed, if given; (such listings are not cached).
+
+        """
+        return self._list_(bucket, prefix, 'dirs', start_after, cache)
+
+    def list_keys(self, bucket, prefix='', *, cache=False):
+        """List the keys (as `S3ObjectKey`) of the objects directly under
+        `prefix` (which is empty or ends in the delimiter).
+
+        """
+        return [
+            S3ObjectKey(f'{DELIMITER}{bucket}{DELIMITER}{key}')
+            for key in self._list_(bucket, prefix, 'keys', None, cache)
+        ]
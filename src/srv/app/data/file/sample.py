@@ -0,0 +1,111 @@
+"""Shape-preserving downsampling of data series.
+
+Series are downsampled by the "Largest-Triangle-Three-Buckets" (LTTB)
+algorithm: points are divided into buckets, and from each bucket is
+selected the point which forms the largest triangle with the point
+selected from the previous bucket and the average of the next bucket.
+Peaks and troughs -- which matter most to the shape of a plot -- are
+thereby retained.
+
+Multiple series sharing their x-values (*e.g.* their timestamps) are
+downsampled together, such that the same points are selected from each:
+triangles' areas are summed across series, each normalized by the range
+of its series.
+
+"""
+import math
+
+from app.lib.number import is_numeric
+
+
+def get_scale(values):
+    numeric = [value for value in values if is_numeric(value)]
+
+    if not numeric:
+        return None
+
+    return (max(numeric) - min(numeric)) or 1
+
+
+def get_average(xs, values, start, stop):
+    pairs = [(xs[index], values[index]) for index in range(start, stop)
+             if is_numeric(values[index])]
+
+    if not pairs:
+        return None
+
+    return (
+        math.fsum(x for (x, _value) in pairs) / len(pairs),
+        math.fsum(value for (_x, value) in pairs) / len(pairs),
+    )
+
+
+def lttb(xs, series, count):
+    """Select the indices of at most `count` points to retain of the
+    given `series` sharing x-values `xs`.
+
+    Values which are not numeric (*e.g.* `None`) do not contribute to
+    the selection of points.
+
+    Indices are returned in ascending order.
+
+    """
+    size = len(xs)
+
+    if count >= size:
+        return list(range(size))
+
+    if count < 3:
+        return [0, size - 1][:max(count, 0)]
+
+    if any(not is_numeric(x) for x in xs):
+        xs = range(size)
+
+    scales = [get_scale(values) for values in series]
+    series = [values for (values, scale) in zip(series, scales) if scale is not None]
+    scales = [scale for scale in scales if scale is not None]
+
+    bucket_size = (size - 2) / (count - 2)
+
+    selected = [0]
+
+    for bucket in range(count - 2):
+        start = int(bucket * bucket_size) + 1
+        stop = int((bucket + 1) * bucket_size) + 1
+
+        next_start = stop
+        next_stop = min(int((bucket + 2) * bucket_size) + 1, size)
+
+        previous = selected[-1]
+        x_previous = xs[previous]
+
+        averages = [get_average(xs, values, next_start, next_stop) for values in series]
+
+        area_max = -1
+        choice = start
+
+        for index in range(start, stop):
+            x_delta = x_previous - xs[index]
+            area = 0
+
+            for (values, scale, average) in zip(series, scales, averages):
+                (y_previous, value) = (values[previous], values[index])
+
+                if average is None or not is_numeric(y_previous) or not is_numeric(value):
+                    continue
+
+                (x_average, y_average) = average
+
+                area += abs(
+                    (x_previous - x_average) * (value - y_previous) -
+                    x_delta * (y_average - y_previous)
+                ) / scale
+
+            if area > area_max:
+                (area_max, choice) = (area, index)
+
+        selected.append(choice)
+
+    selected.append(size - 1)
+
+    return selected
@@ -0,0 +1,275 @@
+"""Constant-memory summaries of streams of numeric values.
+
+Each summary is updated with values one at a time (`add`), and reports
+its statistic (`result`) without retaining the values themselves.
+
+Summaries are mergeable: the summaries of partitions of a stream -- say,
+of separate directories or devices, or of separate blocks of data files
+-- may be combined (`merge`) into the summary of the whole.
+
+"""
+import abc
+import math
+
+
+class Summary(abc.ABC):
+
+    __slots__ = ()
+
+    @abc.abstractmethod
+    def add(self, value):
+        """Update the summary with the numeric `value`."""
+
+    @abc.abstractmethod
+    def merge(self, other):
+        """Update the summary with those values summarized by `other`.
+
+        Returns the updated summary.
+
+        """
+
+    @abc.abstractmethod
+    def result(self):
+        """Report the summary's statistic -- or `None` where undefined."""
+
+
+class CountSummary(Summary):
+
+    __slots__ = ('count',)
+
+    def __init__(self):
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+
+    def merge(self, other):
+        self.count += other.count
+        return self
+
+    def result(self):
+        return self.count
+
+
+class MinSummary(Summary):
+
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = None
+
+    def add(self, value):
+        if self.value is None or value < self.value:
+            self.value = value
+
+    def merge(self, other):
+        if other.value is not None:
+            self.add(other.value)
+
+        return self
+
+    def result(self):
+        return self.value
+
+
+class MaxSummary(MinSummary):
+
+    __slots__ = ()
+
+    def add(self, value):
+        if self.value is None or value > self.value:
+            self.value = value
+
+
+class MeanSummary(Summary):
+
+    __slots__ = ('count', 'mean')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+
+    def add(self, value):
+        self.count += 1
+        self.mean += (value - self.mean) / self.count
+
+    def merge(self, other):
+        if other.count:
+            count = self.count + other.count
+            self.mean += (other.mean - self.mean) * other.count / count
+            self.count = count
+
+        return self
+
+    def result(self):
+        return self.mean if self.count else None
+
+
+class VarianceSummary(MeanSummary):
+    """Summary of the sample variance of values, by Welford's algorithm
+    (and, for merges, by that of Chan et al).
+
+    """
+    __slots__ = ('sum_squares',)
+
+    def __init__(self):
+        super().__init__()
+        self.sum_squares = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.sum_squares += delta * (value - self.mean)
+
+    def merge(self, other):
+        if other.count:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+
+            self.sum_squares += (other.sum_squares +
+                                 delta * delta * self.count * other.count / count)
+            self.mean += delta * other.count / count
+            self.count = count
+
+        return self
+
+    def result(self):
+        return self.sum_squares / (self.count - 1) if self.count > 1 else None
+
+
+class StdDevSummary(VarianceSummary):
+
+    __slots__ = ()
+
+    def result(self):
+        variance = super().result()
+        return None if variance is None else math.sqrt(variance)
+
+
+class QuantileSketch(Summary):
+    """Mergeable sketch of the distribution of values, from which
+    quantiles are estimated to within a relative error.
+
+    Values are counted in buckets whose bounds grow geometrically (after
+    "DDSketch" -- Masson et al, 2019): a quantile estimated by the sketch
+    is within `relative_accuracy` of the true value.
+
+    Memory is bounded by `max_buckets` (per sign): beyond this, the
+    buckets of the smallest magnitudes are collapsed together (affecting
+    the accuracy only of values of these magnitudes).
+
+    The sketch's `result` is its estimate of the value at the given
+    `quantile` (by default, the median); however, any quantile may be
+    estimated (see: `quantile()`).
+
+    Sketches may only be merged with sketches of equal parameters.
+
+    Values which are not finite (infinities and NaN) are not counted.
+
+    """
+    __slots__ = ('target', 'relative_accuracy', 'max_buckets', 'gamma', 'log_gamma',
+                 'positive', 'negative', 'zero', 'count')
+
+    def __init__(self, quantile=0.5, relative_accuracy=0.01, max_buckets=2048):
+        if not 0 <= quantile <= 1:
+            raise ValueError(f"quantile expects value in [0, 1] not: {quantile}")
+
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy expects value in (0, 1) "
+                             f"not: {relative_accuracy}")
+
+        self.target = quantile
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+
+        self.positive = {}
+        self.negative = {}
+        self.zero = 0
+        self.count = 0
+
+    def _index_(self, magnitude):
+        return math.ceil(math.log(magnitude) / self.log_gamma)
+
+    def _value_(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def _collapse_(self, buckets):
+        if len(buckets) <= self.max_buckets:
+            return
+
+        indices = sorted(buckets)
+        excess = len(indices) - self.max_buckets
+
+        # fold the smallest buckets into the smallest bucket retained
+        buckets[indices[excess]] += sum(buckets.pop(index) for index in indices[:excess])
+
+    def add(self, value):
+        if not math.isfinite(value):
+            return
+
+        self.count += 1
+
+        if value > 0:
+            buckets = self.positive
+        elif value < 0:
+            buckets = self.negative
+        else:
+            self.zero += 1
+            return
+
+        index = self._index_(abs(value))
+        buckets[index] = buckets.get(index, 0) + 1
+
+        self._collapse_(buckets)
+
+    def merge(self, other):
+        if (other.relative_accuracy, other.max_buckets) != (self.relative_accuracy,
+                                                            self.max_buckets):
+            raise ValueError("cannot merge sketches of differing parameters")
+
+        for (buckets, other_buckets) in ((self.positive, other.positive),
+                                         (self.negative, other.negative)):
+            for (index, count) in other_buckets.items():
+                buckets[index] = buckets.get(index, 0) + count
+
+            self._collapse_(buckets)
+
+        self.zero += other.zero
+        self.count += other.count
+
+        return self
+
+    def quantile(self, quantile):
+        """Estimate the value at `quantile` (between 0 and 1) of the
+        distribution.
+
+        """
+        if not 0 <= quantile <= 1:
+            raise ValueError(f"quantile expects value in [0, 1] not: {quantile}")
+
+        if not self.count:
+            return None
+
+        rank = quantile * (self.count - 1)
+        seen = 0
+
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self._value_(index)
+
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._value_(index)
+
+    def result(self):
+        return self.quantile(self.target)
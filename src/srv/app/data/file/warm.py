@@ -0,0 +1,173 @@
+"""Parallel warming of data files' cached projections.
+
+Parsing data files is CPU-bound; so, rather than parse these one at a
+time in the serving process, `iter_projections` distributes them among
+a pool of worker processes. Workers return only the compact, JSON-encoded
+projections of each file, from which the serving process fills its
+caches -- and, where requested, the row of each file to be ingested into
+the column store (see `column.extract_row`), such that each file is
+parsed only once.
+
+Files are submitted to workers in chunks, with a bounded number of
+chunks in flight, such that memory use is bounded regardless of the
+number of files to be warmed.
+
+"""
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import time
+
+from loguru import logger as log
+
+from . import bundle
+from .base import project
+from .column import extract_row
+
+
+# seconds between progress reports
+PROGRESS_INTERVAL = 5.0
+
+
+def project_file(path, specs, row_spec=None):
+    """Project the data file at `path` onto each of the given projection
+    `specs`; and, given a `row_spec`, extract its column store row (see
+    `column.extract_row`).
+
+    Returns the file's signature (see `bundle.get_signature`) -- taken
+    prior to its reading -- its JSON-encoded projections, its row (or
+    `None`) and `None`; or, if the file could not be decoded, its
+    signature, `None`, `None` and the error. `None` is returned if the
+    file could not be read at all.
+
+    """
+    try:
+        signature = bundle.get_signature(path)
+    except (OSError, bundle.BundleError):
+        return None
+
+    try:
+        full_data = bundle.load_json(path)
+    except OSError:
+        return None
+    except bundle.DATA_FILE_READ_ERRORS as exc:
+        return (signature, None, None, exc)
+
+    encoded = [json.dumps(project(full_data, *spec)) for spec in specs]
+
+    row = None if row_spec is None else extract_row(full_data, *row_spec)
+
+    return (signature, encoded, row, None)
+
+
+def project_chunk(items):
+    return [(path, project_file(path, specs, row_spec)) for (path, specs, row_spec) in items]
+
+
+def iter_chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Progress:
+    """Periodic logger of warming progress and throughput."""
+
+    def __init__(self, total, interval=PROGRESS_INTERVAL):
+        self.total = total
+        self.interval = interval
+
+        self.count = 0
+        self.start = self.reported = time.perf_counter()
+
+    def update(self, count):
+        self.count += count
+
+        now = time.perf_counter()
+
+        if now - self.reported >= self.interval:
+            self.reported = now
+            log.debug('warm | {}/{} files | {:.0f} files/s',
+                      self.count, self.total, self.count / (now - self.start))
+
+    def finish(self, processes):
+        elapsed = time.perf_counter() - self.start
+
+        log.info('warm | parsed {} files in {:.2f}s ({:.0f} files/s) | processes: {}',
+                 self.count, elapsed, self.count / elapsed if elapsed else 0, processes)
+
+
+def get_process_count(processes=None):
+    if processes is None or processes <= 0:
+        return os.cpu_count() or 1
+
+    return processes
+
+
+def iter_pool(items, processes, chunk_size):
+    # workers are spawned rather than forked from this (threaded) process
+    context = multiprocessing.get_context('spawn')
+
+    # bound chunks in flight (and so results awaiting consumption)
+    window = processes * 2
+
+    chunks = iter_chunks(items, chunk_size)
+
+    with concurrent.futures.ProcessPoolExecutor(processes, mp_context=context) as executor:
+        pending = set()
+
+        for chunk in chunks:
+            pending.add(executor.submit(project_chunk, chunk))
+
+            if len(pending) < window:
+                continue
+
+            (done, pending) = concurrent.futures.wait(
+                pending,
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+
+            for future in done:
+                yield future.result()
+
+        for future in concurrent.futures.as_completed(pending):
+            yield future.result()
+
+
+def iter_projections(items, *, processes=None, chunk_size=32, min_items=256):
+    """Generate the JSON-encoded projections of the given data files.
+
+    `items` is a list of `(path, specs, row_spec)` triples -- each the
+    path of a data file, the projection specs to make of it and the
+    spec of its column store row (or `None`). For each, a tuple of
+    `(path, signature, encoded, row, error)` is generated (in no
+    particular order) -- see `project_file`; files which cannot be read
+    at all are omitted.
+
+    Files are parsed by a pool of `processes` worker processes (by
+    default, one per CPU), in chunks of `chunk_size` files. Fewer than
+    `min_items` files -- or a single process -- are instead parsed in
+    this process.
+
+    """
+    if not items:
+        return
+
+    processes = get_process_count(processes)
+
+    if processes == 1 or len(items) < min_items:
+        processes = 1
+        chunks = map(project_chunk, iter_chunks(items, chunk_size))
+    else:
+        chunks = iter_pool(items, processes, chunk_size)
+
+    progress = Progress(len(items))
+
+    for results in chunks:
+        for (path, result) in results:
+            if result is not None:
+                yield (path, *result)
+
+        progress.update(len(results))
+
+    progress.finish(processes)
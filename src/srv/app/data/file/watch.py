@@ -0,0 +1,515 @@
+"""Event-driven indexes of local data file directories.
+
+Rather than list (and sort) data file directories periodically -- which
+leaves new data files invisible until the next listing, and which for a
+large archive directory is expensive -- a `DirectoryWatcher` maintains
+an in-memory, sorted index of each directory's entries.
+
+Each directory is listed once; thereafter, the creation, (re)naming and
+deletion of its entries are applied to its index as they are reported by
+inotify. Where inotify is unavailable, directories are instead polled:
+a directory is re-listed only when its modification time changes, and
+only the differences from its index are applied (see `refresh`).
+
+Indexes may be persisted to manifests (see `app.data.file.manifest`),
+such that -- upon restart -- unchanged directories needn't be re-listed.
+
+"""
+import bisect
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import threading
+
+from loguru import logger as log
+
+from .manifest import DirectoryManifest
+
+
+# inotify event masks (see: inotify(7))
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+#
+# entries are indexed once complete -- upon their being closed after writing, or
+# upon their being moved into place
+#
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE |
+              IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+EVENT_HEADER = struct.Struct('iIII')
+
+EVENT_BUFFER_SIZE = 64 * 1024
+
+# beyond this number of changed entries, a re-listed directory's index is rebuilt (rather
+# than each change applied to it)
+REFRESH_LIMIT = 1024
+
+
+class DirectoryIndex:
+    """Sorted index of the names of a directory's entries.
+
+    Entries matching each of the given file name `patterns` are
+    additionally indexed by pattern, such that entries of a particular
+    type may be listed without inspecting others.
+
+    The index may be persisted to a `manifest` (see `DirectoryManifest`),
+    such that the directory needn't be listed upon restart.
+
+    """
+
+    def __init__(self, path, patterns=(), manifest=None):
+        self.path = path
+        self.names = []
+        self.typed = {pattern: [] for pattern in patterns}
+        self.manifest = manifest
+        self.lock = threading.Lock()
+
+        # whether the index reflects the directory
+        self.ready = False
+
+    def __len__(self):
+        return len(self.names)
+
+    def reset(self, rescan=False):
+        """(Re-)list the directory to (re-)initialize the index.
+
+        The directory's manifest is loaded instead, where this is known to
+        reflect the directory (unless `rescan` is specified).
+
+        Raises `OSError` (and marks the index not ready) if the directory
+        may not be listed.
+
+        """
+        try:
+            # (modification time is taken prior to listing, such that any
+            # change made during listing invalidates the manifest)
+            mtime_ns = os.stat(self.path).st_mtime_ns
+
+            if rescan or self.manifest is None:
+                names = None
+            else:
+                names = self.manifest.load(mtime_ns)
+
+            if loaded := names is not None:
+                log.debug('dirwatcher | loaded manifest of {}', self.path)
+            else:
+                with os.scandir(self.path) as entries:
+                    names = sorted(entry.name for entry in entries)
+        except OSError:
+            self.ready = False
+            raise
+
+        self._set_names_(names)
+
+        if self.manifest is not None and not loaded:
+            self.manifest.write(names, mtime_ns)
+
+    def _set_names_(self, names):
+        typed = {pattern: [name for name in names if pattern.search(name)]
+                 for pattern in self.typed}
+
+        with self.lock:
+            self.names = names
+            self.typed = typed
+            self.ready = True
+
+    def refresh(self):
+        """Re-list the directory, applying to the index only the entries
+        added and removed since its last listing -- rather than sorting
+        the directory's entries anew. (Should many entries have changed,
+        the index is instead rebuilt.)
+
+        Returns whether any entries were added or removed.
+
+        Raises `OSError` (and marks the index not ready) if the directory
+        may not be listed.
+
+        """
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+
+            with os.scandir(self.path) as entries:
+                listed = {entry.name for entry in entries}
+        except OSError:
+            self.ready = False
+            raise
+
+        with self.lock:
+            indexed = set(self.names)
+
+        added = listed - indexed
+        removed = indexed - listed
+
+        if len(added) + len(removed) > REFRESH_LIMIT:
+            names = sorted(listed)
+
+            self._set_names_(names)
+
+            if self.manifest is not None:
+                self.manifest.write(names, mtime_ns)
+        else:
+            for name in removed:
+                self.discard(name)
+
+            # (in ascending order, such that these are appended to the manifest)
+            for name in sorted(added):
+                self.add(name)
+
+            self.sync(mtime_ns)
+
+        return bool(added or removed)
+
+    def sync(self, mtime_ns):
+        """Record to the directory's manifest (if any) that the index
+        reflects the directory as of modification time `mtime_ns`.
+
+        """
+        if self.manifest is not None:
+            with self.lock:
+                self.manifest.sync(self.names, mtime_ns)
+
+    @staticmethod
+    def _insert_(names, name):
+        position = bisect.bisect_left(names, name)
+
+        if position == len(names) or names[position] != name:
+            names.insert(position, name)
+            return True
+
+        return False
+
+    @staticmethod
+    def _remove_(names, name):
+        position = bisect.bisect_left(names, name)
+
+        if position < len(names) and names[position] == name:
+            del names[position]
+
+    def add(self, name):
+        with self.lock:
+            if not self._insert_(self.names, name):
+                return
+
+            for (pattern, names) in self.typed.items():
+                if pattern.search(name):
+                    self._insert_(names, name)
+
+        if self.manifest is not None:
+            self.manifest.add(name)
+
+    def discard(self, name):
+        with self.lock:
+            self._remove_(self.names, name)
+
+            for (pattern, names) in self.typed.items():
+                if pattern.search(name):
+                    self._remove_(names, name)
+
+        if self.manifest is not None:
+            self.manifest.discard(name)
+
+    def nlargest(self, limit, patterns=None):
+        """List the paths of the `limit` greatest entries, in descending
+        order.
+
+        If file name `patterns` are given, only those of these entries
+        matching any pattern are listed.
+
+        """
+        if limit <= 0:
+            return []
+
+        with self.lock:
+            if patterns is None:
+                names = self.names[-limit:]
+            else:
+                # least name among the `limit` greatest
+                floor = self.names[-limit] if limit < len(self.names) else ''
+
+                names = set()
+
+                for pattern in patterns:
+                    try:
+                        typed = self.typed[pattern]
+                    except KeyError:
+                        names.update(name for name in self.names[-limit:] if pattern.search(name))
+                    else:
+                        names.update(typed[bisect.bisect_left(typed, floor):])
+
+                names = sorted(names)
+
+        return [self.path / name for name in reversed(names)]
+
+
+class Inotify:
+    """Minimal interface to Linux inotify (via libc)."""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+
+        if self.fd < 0:
+            self._raise_()
+
+    @staticmethod
+    def _raise_(path=None):
+        code = ctypes.get_errno()
+        raise OSError(code, os.strerror(code), path)
+
+    def add_watch(self, path, mask):
+        descriptor = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+
+        if descriptor < 0:
+            self._raise_(path)
+
+        return descriptor
+
+    def pending(self):
+        """Whether events are pending (to be read)."""
+        (readable, _writable, _exceptional) = select.select([self.fd], [], [], 0)
+        return bool(readable)
+
+    def read(self, timeout):
+        """Generate `(descriptor, mask, name)` of pending events --
+        waiting at most `timeout` seconds for these.
+
+        """
+        (readable, _writable, _exceptional) = select.select([self.fd], [], [], timeout)
+
+        if not readable:
+            return
+
+        try:
+            buffer = os.read(self.fd, EVENT_BUFFER_SIZE)
+        except BlockingIOError:
+            return
+
+        offset = 0
+
+        while offset < len(buffer):
+            (descriptor, mask, _cookie, size) = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+
+            name = os.fsdecode(buffer[offset:offset + size].rstrip(b'\0'))
+            offset += size
+
+            yield (descriptor, mask, name)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class DirectoryWatcher(threading.Thread):
+    """Maintain the `DirectoryIndex` of each of the directories `dirs`
+    (additionally indexing entries matching each of the file name
+    `patterns`).
+
+    Directories not (yet) present are retried every `interval` seconds;
+    under polling, directories are checked for changes at this interval.
+
+    If a `manifest_dir` is specified, indexes are persisted to manifests
+    under this directory (see `DirectoryManifest`).
+
+    If an `on_change` callable is specified, it is invoked (by the
+    watcher's thread) following each batch of changes to the indexes.
+
+    """
+    def __init__(self, dirs, *, interval=5.0, patterns=(), manifest_dir=None, on_change=None):
+        super().__init__(name='dirwatcher', daemon=True)
+
+        self.indexes = {
+            path: DirectoryIndex(
+                path,
+                patterns,
+                manifest_dir and DirectoryManifest.for_dir(manifest_dir, path),
+            )
+            for path in dirs
+        }
+        self.interval = interval
+        self.on_change = on_change
+        self.stop_event = threading.Event()
+
+        # mode of watching: inotify or poll (once started)
+        self.mode = None
+
+    def get_index(self, path):
+        """Retrieve the ready index of directory `path` (if any)."""
+        index = self.indexes.get(path)
+        return index if index is not None and index.ready else None
+
+    def launch(self, stop_event=None):
+        if stop_event is not None:
+            self.stop_event = stop_event
+
+        self.start()
+        return self
+
+    @log.catch
+    def run(self):
+        try:
+            inotify = Inotify()
+        except (OSError, AttributeError) as exc:
+            log.info('dirwatcher | inotify unavailable ({}): polling', exc)
+            self.mode = 'poll'
+            self.poll()
+        else:
+            self.mode = 'inotify'
+
+            try:
+                self.watch(inotify)
+            finally:
+                inotify.close()
+
+    def _reset_(self, index, rescan=False):
+        try:
+            index.reset(rescan)
+        except OSError as exc:
+            log.debug('dirwatcher | cannot list {}: {}', index.path, exc)
+            return False
+
+        log.debug('dirwatcher | indexed {} entries of {}', len(index), index.path)
+        return True
+
+    def _refresh_(self, index):
+        try:
+            changed = index.refresh()
+        except OSError as exc:
+            log.debug('dirwatcher | cannot list {}: {}', index.path, exc)
+            return None
+
+        log.debug('dirwatcher | refreshed {} entries of {}', len(index), index.path)
+        return changed
+
+    def _notify_(self):
+        if self.on_change is not None:
+            try:
+                self.on_change()
+            except Exception:
+                log.exception('dirwatcher | change handler failed')
+
+    def watch(self, inotify):
+        watched = {}
+
+        while not self.stop_event.is_set():
+            changed = False
+
+            # (re-)establish missing watches
+            for index in self.indexes.values():
+                if index.path in watched.values():
+                    continue
+
+                try:
+                    descriptor = inotify.add_watch(index.path, WATCH_MASK)
+                except OSError as exc:
+                    if exc.errno not in (errno.ENOENT, errno.ENOTDIR):
+                        raise
+
+                    continue
+
+                watched[descriptor] = index.path
+
+                # list the directory *after* establishing its watch, such that no
+                # change is missed (events are idempotent of the listing)
+                changed = self._reset_(index) or changed
+
+            for (descriptor, mask, name) in inotify.read(self.interval):
+                if mask & IN_Q_OVERFLOW:
+                    log.warning('dirwatcher | event queue overflowed: re-listing directories')
+
+                    for path in watched.values():
+                        self._reset_(self.indexes[path], rescan=True)
+
+                    changed = True
+
+                    continue
+
+                try:
+                    path = watched[descriptor]
+                except KeyError:
+                    continue
+
+                index = self.indexes[path]
+
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    index.ready = False
+                    del watched[descriptor]
+                elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                    index.add(name)
+                    changed = True
+                elif mask & (IN_MOVED_FROM | IN_DELETE):
+                    index.discard(name)
+                    changed = True
+
+            self._sync_(inotify, [self.indexes[path] for path in watched.values()])
+
+            if changed:
+                self._notify_()
+
+    @staticmethod
+    def _sync_(inotify, indexes):
+        """Record to the manifests of `indexes` that these reflect their
+        directories -- if no events remain pending.
+
+        """
+        mtimes = {}
+
+        for index in indexes:
+            if index.manifest is not None and index.ready:
+                try:
+                    mtimes[index] = os.stat(index.path).st_mtime_ns
+                except OSError:
+                    continue
+
+        # changes preceding the directories' modification times are reflected
+        # only if their events have all been read
+        if mtimes and not inotify.pending():
+            for (index, mtime_ns) in mtimes.items():
+                index.sync(mtime_ns)
+
+    def poll(self):
+        mtimes = {}
+
+        while not self.stop_event.is_set():
+            changed = False
+
+            for index in self.indexes.values():
+                try:
+                    mtime = os.stat(index.path).st_mtime_ns
+                except OSError:
+                    index.ready = False
+                    mtimes.pop(index.path, None)
+                    continue
+
+                if mtimes.get(index.path) == mtime:
+                    continue
+
+                if index.path in mtimes:
+                    # (changed: apply the differences from the previous listing)
+                    refreshed = self._refresh_(index)
+                else:
+                    refreshed = self._reset_(index) or None
+
+                if refreshed is not None:
+                    mtimes[index.path] = mtime
+                    changed = changed or refreshed
+
+            if changed:
+                self._notify_()
+
+            self.stop_event.wait(self.interval)
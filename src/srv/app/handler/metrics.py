@@ -0,0 +1,12 @@
+from app import dashboard
+from app.data.file import DataFileBank
+
+
+@dashboard.get('/metrics/datafile')
+def get_datafile_metrics():
+    read_failures = DataFileBank.read_failures
+
+    return {
+        # negative cache of unreadable data files
+        'read_failures': None if read_failures is None else read_failures.stats(),
+    }
@@ -1,14 +1,70 @@
-from app import dashboard
+import math
+import re
+
+from bottle import abort, request
+
+from app import conf, dashboard
 from app.data.file import FlatDataFileBank, ONE_WEEK_S
 from app.lib.functional import apidefault
 
 
+def clean_resolution():
+    if not request.query.resolution:
+        return None
+
+    resolution_match = re.fullmatch(r'(\d+)(s|m|h)?', request.query.resolution.lower())
+
+    if not resolution_match:
+        abort(400, 'Bad request')
+
+    (resolution_value, resolution_unit) = resolution_match.groups()
+
+    resolution_seconds = int(resolution_value)
+
+    if resolution_unit == 'm':
+        resolution_seconds *= 60
+    elif resolution_unit == 'h':
+        resolution_seconds *= 3600
+
+    if resolution_seconds <= 0:
+        abort(400, 'Bad request')
+
+    return resolution_seconds
+
+
+def clean_max_points():
+    """Determine the maximum number of points to plot per series.
+
+    The maximum may be specified either directly, via query parameter
+    `max_points`, or via the plot's `resolution` (in seconds, minutes or
+    hours per point). Otherwise, the setting PLOT_MAX_POINTS applies.
+
+    Zero indicates no maximum.
+
+    """
+    if request.query.max_points:
+        try:
+            max_points = int(request.query.max_points)
+        except ValueError:
+            abort(400, 'Bad request')
+
+        if max_points < 0:
+            abort(400, 'Bad request')
+    elif (resolution := clean_resolution()) is not None:
+        max_points = math.ceil(ONE_WEEK_S / resolution)
+    else:
+        max_points = conf.PLOT_MAX_POINTS
+
+    return max_points or None
+
+
 def get_columns(*keys):
     return FlatDataFileBank(round_to=2).get_columns(
         keys,
         age_s=ONE_WEEK_S,
         reverse=True,
         decorate='Time',
+        max_points=clean_max_points(),
     )
 
 
@@ -6,11 +6,15 @@ from app.data.file import get_points, Last, StdDev, ONE_WEEK_S
 from app.lib.functional import apidefault
 
 
+# (defined once such that equivalent queries may share scans)
+is_nonnegative = partial(operator.le, 0)
+
+
 @dashboard.get('/stats/current')
 @apidefault('latency', 'ookla_dl', 'ookla_ul', FileNotFoundError)
 def get_current_stats():
     return get_points(
-        latency=Last('ping_latency.google_rtt_avg_ms', where=partial(operator.le, 0)),
+        latency=Last('ping_latency.google_rtt_avg_ms', where=is_nonnegative),
 
         # currently disabled
         # ndev_week=Last('connected_devices_arp.devices_1week'),
@@ -1,6 +1,9 @@
 import abc
+import collections
+import collections.abc
 import io
 import pathlib
+import sys
 
 from loguru import logger as log
 
@@ -39,6 +42,9 @@ class MemoryCache(SimpleCache):
 
         return result
 
+    def get_value(self, key: object) -> object:
+        return self.get(key)
+
     def set(self, key: object, value: object) -> bool:
         self._cache_[key] = value
         return True
@@ -46,6 +52,9 @@ class MemoryCache(SimpleCache):
     def discard(self, key: object) -> None:
         self._cache_.pop(key, None)
 
+    def clear(self) -> None:
+        self._cache_.clear()
+
 
 class FileSystemCache(SimpleCache):
 
@@ -60,17 +69,26 @@ class FileSystemCache(SimpleCache):
         self._get_path_(key).unlink(missing_ok=True)
 
     def get(self, key: pathlib.PurePath, decode=False) -> io.StringIO | io.BytesIO | None:
-        path = self._get_path_(key)
+        value = self.get_value(key)
+
+        if value is None:
+            return None
+
+        return io.StringIO(value.decode()) if decode else io.BytesIO(value)
 
+    def get_value(self, key: pathlib.PurePath) -> bytes | None:
+        """Retrieve the cached bytes of `key` (without wrapping these in a
+        stream).
+
+        """
         try:
-            with path.open('r' if decode else 'rb') as fd:
-                value = fd.read()
+            value = self._get_path_(key).read_bytes()
         except FileNotFoundError:
             self.misses += 1
             return None
         else:
             self.hits += 1
-            return io.StringIO(value) if decode else io.BytesIO(value)
+            return value
 
     def set(self,
             key: pathlib.PurePath,
@@ -96,3 +114,378 @@ class FileSystemCache(SimpleCache):
             key_path.write_text(value)
 
         return True
+
+
+def getsizeof_deep(value: object) -> int:
+    """Approximate the size in bytes of `value` -- including the sizes
+    of the items of (nested) dicts, lists and tuples.
+
+    """
+    size = sys.getsizeof(value)
+
+    if isinstance(value, dict):
+        for (key, item) in value.items():
+            size += getsizeof_deep(key) + getsizeof_deep(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += getsizeof_deep(item)
+
+    return size
+
+
+class EvictionPolicy(abc.ABC):
+    """Policy determining which keys a byte-budgeted cache retains.
+
+    Policies track keys and their sizes (but not values): the cache
+    discards those keys which its policy evicts.
+
+    """
+    def __init__(self, maxbytes: int) -> None:
+        self.maxbytes = maxbytes
+
+    @abc.abstractmethod
+    def access(self, key: object) -> None:
+        """Record a hit of `key`."""
+
+    @abc.abstractmethod
+    def insert(self, key: object, size: int) -> list[object]:
+        """Insert (new) `key` of `size` bytes.
+
+        Returns the keys evicted -- which may include `key` itself.
+
+        """
+
+    @abc.abstractmethod
+    def remove(self, key: object) -> None:
+        """Remove `key` (without its being evicted)."""
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        pass
+
+
+class LRUPolicy(EvictionPolicy):
+    """Evict the least-recently used keys."""
+
+    def __init__(self, maxbytes: int) -> None:
+        super().__init__(maxbytes)
+        self._order_ = collections.OrderedDict()
+        self._bytes_ = 0
+
+    def access(self, key: object) -> None:
+        self._order_.move_to_end(key)
+
+    def insert(self, key: object, size: int) -> list[object]:
+        self._order_[key] = size
+        self._bytes_ += size
+
+        evicted = []
+
+        while self._bytes_ > self.maxbytes:
+            (key0, size0) = self._order_.popitem(last=False)
+            self._bytes_ -= size0
+            evicted.append(key0)
+
+        return evicted
+
+    def remove(self, key: object) -> None:
+        self._bytes_ -= self._order_.pop(key)
+
+    def clear(self) -> None:
+        self._order_.clear()
+        self._bytes_ = 0
+
+
+class FrequencySketch:
+    """Count-min sketch of the (approximate, recent) frequencies of keys.
+
+    Counters saturate at 15; and, all counters are halved every `sample`
+    increments, such that frequencies reflect recent history.
+
+    Each row indexes keys by its own multiplicative hash of the key's
+    hash (taking the product's high bits): rows indexed by the hashes of
+    `(row, key)` would collide together -- as these differ by little
+    more than a constant.
+
+    """
+    DEPTH = 4
+
+    MAX_COUNT = 15
+
+    # odd multipliers of the rows' hashes
+    SEEDS = (0xc3a5c85c97cb3127, 0xb492b66fbe98f273, 0x9ae16a3b2f90404f, 0xcbf29ce484222325)
+
+    HASH_MASK = (1 << 64) - 1
+
+    def __init__(self, width: int = 4096, sample: int | None = None) -> None:
+        self.width = width
+        self.sample = 10 * width if sample is None else sample
+        self.rows = [bytearray(width) for _row in range(self.DEPTH)]
+        self.additions = 0
+
+    def _indexes_(self, key: object) -> list[int]:
+        key_hash = hash(key) & self.HASH_MASK
+
+        return [((key_hash * seed) & self.HASH_MASK) * self.width >> 64 for seed in self.SEEDS]
+
+    def frequency(self, key: object) -> int:
+        return min(row[index] for (row, index) in zip(self.rows, self._indexes_(key)))
+
+    def increment(self, key: object) -> None:
+        for (row, index) in zip(self.rows, self._indexes_(key)):
+            if row[index] < self.MAX_COUNT:
+                row[index] += 1
+
+        self.additions += 1
+
+        if self.additions >= self.sample:
+            self.rows = [bytearray(count >> 1 for count in row) for row in self.rows]
+            self.additions //= 2
+
+    def clear(self) -> None:
+        self.rows = [bytearray(self.width) for _row in range(self.DEPTH)]
+        self.additions = 0
+
+
+class TinyLFUPolicy(EvictionPolicy):
+    """Scan-resistant "W-TinyLFU" eviction.
+
+    New keys enter a small LRU "window". Keys evicted from the window are
+    admitted to the "main" cache only if they are more frequently used
+    (according to a `FrequencySketch`) than the keys they would displace.
+    The main cache is a segmented LRU: keys hit while on "probation" are
+    promoted to its "protected" segment.
+
+    A single scan of many (new) keys therefore cannot flush frequently-
+    used keys from the cache.
+
+    """
+    WINDOW_RATIO = 0.01
+
+    PROTECTED_RATIO = 0.8
+
+    def __init__(self, maxbytes: int, sketch_width: int = 4096) -> None:
+        super().__init__(maxbytes)
+
+        self.window_max = max(1, int(maxbytes * self.WINDOW_RATIO))
+        self.main_max = maxbytes - self.window_max
+        self.protected_max = int(self.main_max * self.PROTECTED_RATIO)
+
+        self.sketch = FrequencySketch(sketch_width)
+
+        self._window_ = collections.OrderedDict()
+        self._probation_ = collections.OrderedDict()
+        self._protected_ = collections.OrderedDict()
+
+        self._window_bytes_ = self._probation_bytes_ = self._protected_bytes_ = 0
+
+    def access(self, key: object) -> None:
+        self.sketch.increment(key)
+
+        if key in self._window_:
+            self._window_.move_to_end(key)
+        elif key in self._protected_:
+            self._protected_.move_to_end(key)
+        else:
+            # promote from probation
+            size = self._probation_.pop(key)
+            self._probation_bytes_ -= size
+
+            self._protected_[key] = size
+            self._protected_bytes_ += size
+
+            while self._protected_bytes_ > self.protected_max:
+                (key0, size0) = self._protected_.popitem(last=False)
+                self._protected_bytes_ -= size0
+
+                self._probation_[key0] = size0
+                self._probation_bytes_ += size0
+
+    def _pop_victim_(self) -> tuple[object, int]:
+        if self._probation_:
+            (key, size) = self._probation_.popitem(last=False)
+            self._probation_bytes_ -= size
+        else:
+            (key, size) = self._protected_.popitem(last=False)
+            self._protected_bytes_ -= size
+
+        return (key, size)
+
+    def _peek_victim_(self) -> object:
+        return next(iter(self._probation_ or self._protected_))
+
+    def _admit_(self, key: object, size: int) -> list[object]:
+        evicted = []
+
+        while self._probation_bytes_ + self._protected_bytes_ + size > self.main_max:
+            if not self._probation_ and not self._protected_:
+                # (too large for the main cache)
+                evicted.append(key)
+                return evicted
+
+            if self.sketch.frequency(key) <= self.sketch.frequency(self._peek_victim_()):
+                evicted.append(key)
+                return evicted
+
+            (key0, _size0) = self._pop_victim_()
+            evicted.append(key0)
+
+        self._probation_[key] = size
+        self._probation_bytes_ += size
+
+        return evicted
+
+    def insert(self, key: object, size: int) -> list[object]:
+        self.sketch.increment(key)
+
+        self._window_[key] = size
+        self._window_bytes_ += size
+
+        evicted = []
+
+        while self._window_bytes_ > self.window_max:
+            (key0, size0) = self._window_.popitem(last=False)
+            self._window_bytes_ -= size0
+            evicted.extend(self._admit_(key0, size0))
+
+        return evicted
+
+    def remove(self, key: object) -> None:
+        for segment in ('window', 'probation', 'protected'):
+            keys = getattr(self, f'_{segment}_')
+
+            if key in keys:
+                size = keys.pop(key)
+                setattr(self, f'_{segment}_bytes_', getattr(self, f'_{segment}_bytes_') - size)
+                return
+
+    def clear(self) -> None:
+        for keys in (self._window_, self._probation_, self._protected_):
+            keys.clear()
+
+        self._window_bytes_ = self._probation_bytes_ = self._protected_bytes_ = 0
+        self.sketch.clear()
+
+
+EVICTION_POLICIES = {
+    'lru': LRUPolicy,
+    'tinylfu': TinyLFUPolicy,
+}
+
+
+class BudgetCache(SimpleCache, collections.abc.MutableMapping):
+    """In-memory cache bounded by the (approximate) size in bytes of its
+    values.
+
+    Values are sized by `getsizeof` and retained according to the
+    eviction `policy` (see `EVICTION_POLICIES`). Values larger than the
+    cache itself are not cached.
+
+    In addition to `hits` and `misses`, `evictions` and `currsize` (in
+    bytes) are tracked.
+
+    The cache also implements the mapping interface (as expected by
+    `cachetools.cached`); its `__getitem__` counts hits and misses.
+
+    """
+    def __init__(self,
+                 maxbytes: int,
+                 policy: str = 'lru',
+                 getsizeof: collections.abc.Callable[[object], int] = getsizeof_deep) -> None:
+        super().__init__()
+
+        self.maxbytes = maxbytes
+        self.getsizeof = getsizeof
+        self.policy = EVICTION_POLICIES[policy](maxbytes)
+
+        self.evictions = 0
+        self.currsize = 0
+
+        self._cache_ = {}
+
+    def __len__(self) -> int:
+        return len(self._cache_)
+
+    def __iter__(self) -> collections.abc.Iterator[object]:
+        return iter(self._cache_)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._cache_
+
+    def __getitem__(self, key: object) -> object:
+        try:
+            (value, _size) = self._cache_[key]
+        except KeyError:
+            self.misses += 1
+            raise
+
+        self.hits += 1
+        self.policy.access(key)
+
+        return value
+
+    def __setitem__(self, key: object, value: object) -> None:
+        size = self.getsizeof(value)
+
+        if size > self.maxbytes:
+            raise ValueError('value too large')
+
+        if key in self._cache_:
+            self._discard_(key)
+
+        self._cache_[key] = (value, size)
+        self.currsize += size
+
+        for key0 in self.policy.insert(key, size):
+            (_value0, size0) = self._cache_.pop(key0)
+            self.currsize -= size0
+            self.evictions += 1
+
+    def __delitem__(self, key: object) -> None:
+        self._discard_(key)
+
+    def _discard_(self, key: object) -> None:
+        (_value, size) = self._cache_.pop(key)
+        self.currsize -= size
+        self.policy.remove(key)
+
+    def setdefault(self, key: object, default: object = None) -> object:
+        try:
+            (value, _size) = self._cache_[key]
+        except KeyError:
+            self[key] = default
+            return default
+
+        return value
+
+    def get(self, key: object) -> object:
+        try:
+            return self[key]
+        except KeyError:
+            return None
+
+    def set(self, key: object, value: object) -> bool:
+        try:
+            self[key] = value
+        except ValueError:
+            return False
+
+        return True
+
+    def discard(self, key: object) -> None:
+        if key in self._cache_:
+            self._discard_(key)
+
+    def clear(self) -> None:
+        self._cache_.clear()
+        self.policy.clear()
+        self.currsize = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'bytes': self.currsize,
+            'count': len(self._cache_),
+        }
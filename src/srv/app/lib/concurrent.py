@@ -1,3 +1,4 @@
+import collections
 import concurrent.futures
 import threading
 
@@ -13,3 +14,197 @@ def parallel(*funcs, max_workers=None):
 
         # check for doneness in case of early exception
         return [future.result() for future in futures if future.done()]
+
+
+class SingleFlight:
+    """Coalesce concurrent calls by key.
+
+    Of concurrent calls to `do` with the same `key`, only the first
+    invokes its function; the others wait upon and share its result (or
+    exception).
+
+    The number of calls so spared is counted by `shared`.
+
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.shared = 0
+
+    def do(self, key, func, *args, **kwargs):
+        with self.lock:
+            future = self.calls.get(key)
+
+            if leader := future is None:
+                future = self.calls[key] = concurrent.futures.Future()
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+
+class FairExecutor:
+    """Bounded pool of (at most) `max_workers` threads, shared by any
+    number of sessions (see `session`).
+
+    Tasks are submitted by way of sessions -- *e.g.* one per request.
+    Idle workers take the next task of each session with pending tasks
+    in turn, such that no session's tasks (however many) starve those of
+    another. Each session may further limit its own tasks in flight.
+
+    Threads are started as needed, and thereafter persist.
+
+    Queue depth, tasks in flight, *etc.* are reported by `stats`.
+
+    """
+    def __init__(self, max_workers, name='executor'):
+        if max_workers < 1:
+            raise ValueError(f"max_workers expects natural number not: {max_workers}")
+
+        self.max_workers = max_workers
+        self.name = name
+
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+
+        # sessions with pending tasks (in the order in which they are served)
+        self.sessions = collections.OrderedDict()
+
+        self.threads = []
+        self.idle = 0
+
+        self.queued = self.in_flight = 0
+        self.submitted = self.completed = 0
+        self.max_queued = self.max_in_flight = 0
+
+    def session(self, max_workers=None):
+        """Construct a `FairSession` by which to submit tasks -- of which
+        at most `max_workers` (if specified) are run at once.
+
+        """
+        return FairSession(self, max_workers)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'workers': len(self.threads),
+                'sessions': len(self.sessions),
+                'queued': self.queued,
+                'in_flight': self.in_flight,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'max_queued': self.max_queued,
+                'max_in_flight': self.max_in_flight,
+            }
+
+    def _submit_(self, session, func, args, kwargs):
+        future = concurrent.futures.Future()
+
+        with self.lock:
+            session.pending.append((future, func, args, kwargs))
+
+            self.sessions.setdefault(session, None)
+
+            self.queued += 1
+            self.submitted += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+            if self.idle:
+                self.ready.notify()
+            elif len(self.threads) < self.max_workers:
+                thread = threading.Thread(target=self._work_,
+                                          name=f'{self.name}_{len(self.threads)}',
+                                          daemon=True)
+                self.threads.append(thread)
+                thread.start()
+
+        return future
+
+    def _next_(self):
+        # (lock held) take the next task of the first session able to run one
+        for session in self.sessions:
+            if session.max_workers is None or session.running < session.max_workers:
+                break
+        else:
+            return None
+
+        task = session.pending.popleft()
+
+        if session.pending:
+            self.sessions.move_to_end(session)
+        else:
+            del self.sessions[session]
+
+        session.running += 1
+
+        self.queued -= 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        return (session, *task)
+
+    @staticmethod
+    def _run_(future, func, args, kwargs):
+        if future.set_running_or_notify_cancel():
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+    def _work_(self):
+        while True:
+            with self.lock:
+                while (task := self._next_()) is None:
+                    self.idle += 1
+                    self.ready.wait()
+                    self.idle -= 1
+
+            (session, *call) = task
+
+            self._run_(*call)
+
+            # release references to the task while idle
+            del task, call
+
+            with self.lock:
+                session.running -= 1
+
+                self.in_flight -= 1
+                self.completed += 1
+
+                # the session may again be able to run its pending tasks
+                if session.pending:
+                    self.ready.notify()
+
+
+class FairSession:
+    """Session of a `FairExecutor` by which tasks are submitted.
+
+    At most `max_workers` (if not `None`) of the session's tasks are run
+    at once.
+
+    """
+    def __init__(self, executor, max_workers=None):
+        self.executor = executor
+        self.max_workers = max_workers
+
+        self.pending = collections.deque()
+        self.running = 0
+
+    def submit(self, func, /, *args, **kwargs):
+        return self.executor._submit_(self, func, args, kwargs)
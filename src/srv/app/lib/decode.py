@@ -0,0 +1,106 @@
+"""Decoding of JSON documents straight from bytes.
+
+Documents are decoded from the bytes of files (or of cached values)
+rather than from text streams -- avoiding the intermediate decoding of
+these bytes to `str`, and their copying into `io.StringIO`.
+
+Decoders are pluggable: an optimized decoder (`orjson`) is used where
+installed, falling back to the standard library's `json`.
+
+"""
+import abc
+import json
+import mmap
+import os
+
+
+# files at least this large are decoded from a memory map rather than read
+# (where the decoder supports decoding from buffers without copying)
+MMAP_MIN_SIZE = 1 << 20
+
+
+class JSONDecoder(abc.ABC):
+
+    name = None
+
+    # whether buffers (such as memoryview) are decoded without being copied
+    decodes_buffers = False
+
+    @abc.abstractmethod
+    def loads(self, data):
+        """Decode the JSON document in `data` (bytes, a buffer or str)."""
+
+    def load_path(self, path):
+        """Decode the JSON document in the file at `path`."""
+        with open(path, 'rb') as fd:
+            if self.decodes_buffers and os.fstat(fd.fileno()).st_size >= MMAP_MIN_SIZE:
+                with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as contents:
+                    with memoryview(contents) as view:
+                        return self.loads(view)
+
+            return self.loads(fd.read())
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.name}>'
+
+
+class StdlibDecoder(JSONDecoder):
+
+    name = 'json'
+
+    def loads(self, data):
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+
+        return json.loads(data)
+
+
+class OrjsonDecoder(JSONDecoder):
+
+    name = 'orjson'
+
+    decodes_buffers = True
+
+    def __init__(self):
+        import orjson
+        self._loads_ = orjson.loads
+        self._error_ = orjson.JSONDecodeError
+
+    def loads(self, data):
+        try:
+            return self._loads_(data)
+        except self._error_:
+            #
+            # orjson is strict where json is not: it rejects NaN and Infinity, as well
+            # as integers beyond 64 bits. These are rare, but valid from json.dump;
+            # so, defer to the standard library to decode (or to reject) them.
+            #
+            return StdlibDecoder().loads(data)
+
+
+DECODERS = {decoder.name: decoder for decoder in (OrjsonDecoder, StdlibDecoder)}
+
+
+def get_decoder(name='auto'):
+    """Construct the JSON decoder of the given `name`.
+
+    Under `auto`, the first decoder whose dependencies are installed is
+    selected (in order of preference).
+
+    """
+    if name != 'auto':
+        try:
+            decoder_cls = DECODERS[name]
+        except KeyError:
+            raise ValueError(f"unknown JSON decoder {name!r} (expected one of: "
+                             f"{', '.join(('auto', *DECODERS))})")
+
+        return decoder_cls()
+
+    for decoder_cls in DECODERS.values():
+        try:
+            return decoder_cls()
+        except ModuleNotFoundError:
+            continue
+
+    raise LookupError("no JSON decoder available")
@@ -0,0 +1,5 @@
+import numbers
+
+
+def is_numeric(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
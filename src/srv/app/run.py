@@ -173,6 +173,9 @@ def init_tasks():
     worker = task.ItemExecutioner.launch(max_items=1, stop_event=stop_event)
     worker.queue.put(cache_job)
 
+    # watch data file directories, such that their listings remain fresh
+    datafile.watch_dirs(stop_event)
+
     return stop_event
 
 
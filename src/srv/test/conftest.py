@@ -0,0 +1,205 @@
+import json
+import operator
+import os
+import random
+import time
+from functools import partial
+
+import pytest
+
+
+#
+# configure the app for tests *prior* to its import: the local backend, without any
+# of its persistent stores (which are instead constructed by tests as required)
+#
+os.environ.update(
+    APP_LOG_LEVEL='WARNING',
+    DATAFILE_BACKEND='local',
+    DATAFILE_PENDING='',
+    DATAFILE_ARCHIVE='',
+    DATAFILE_BUNDLE_PATH='',
+    DATAFILE_COLUMN_PATH='',
+    DATAFILE_MANIFEST_PATH='',
+    DATAFILE_PROJECTION_PATH='',
+    DATAFILE_ROLLING='false',
+    DATAFILE_SCAN_SHARE='false',
+    DATAFILE_WATCH='false',
+)
+
+#
+# S3 is mocked (see test_s3) -- and its clients constructed upon import: ensure that these
+# never sign requests with real credentials
+#
+os.environ.update(
+    AWS_ACCESS_KEY_ID='testing',
+    AWS_SECRET_ACCESS_KEY='testing',
+    AWS_SESSION_TOKEN='testing',
+    AWS_DEFAULT_REGION='us-east-1',
+)
+
+
+from app.data.file import bundle, local  # noqa: E402
+from app.data.file.base import (  # noqa: E402
+    Count,
+    FlatFileBank,
+    Last,
+    Max,
+    Mean,
+    Min,
+    Multi,
+    ONE_WEEK_S,
+    StdDev,
+)
+
+
+# seconds between the data files of each type
+INTERVAL = 1800
+
+
+def write_data(path, name, data):
+    path.mkdir(parents=True, exist_ok=True)
+    (path / name).write_text(json.dumps(data))
+
+
+def generate_data(pending, archive, *, count=400, seed=1, now=None):
+    """Write `count` ping data files -- and ookla data files for every
+    fourth of these -- the most recent 50 of which to `pending`, and the
+    rest to `archive`.
+
+    Timestamps fall between (rather than upon) multiples of `INTERVAL`
+    before `now`, such that queries' time windows do not cut through
+    them as the clock advances.
+
+    """
+    rand = random.Random(seed)
+
+    if now is None:
+        now = int(time.time())
+
+    for index in range(count):
+        timestamp = now - (count - index) * INTERVAL + INTERVAL // 3
+        path = pending if index >= count - 50 else archive
+
+        ping = {
+            'Measurements': {
+                'ping_latency': {
+                    f'{host}_rtt_avg_ms': round(rand.random() * 50, 3)
+                    for host in ('google', 'amazon', 'wikipedia')
+                },
+            },
+            'Meta': {'Time': timestamp + rand.random(), 'Id': 'x'},
+        }
+
+        if index % 7 == 0:
+            del ping['Measurements']['ping_latency']['amazon_rtt_avg_ms']
+
+        write_data(path, f'result-{timestamp}-ping.json', ping)
+
+        if index % 4 == 0:
+            ookla = {
+                'Measurements': {
+                    'ookla': {
+                        'speedtest_ookla_download': rand.random() * 100,
+                        'speedtest_ookla_upload': rand.randint(1, 20),
+                        'server': 'abc',
+                    },
+                },
+                'Meta': {'Time': timestamp + 1.5},
+            }
+            write_data(path, f'result-{timestamp + 1}-ookla.json', ookla)
+
+    # an unreadable data file
+    (pending / f'result-{now}-bad.json').write_text('{bad')
+
+
+@pytest.fixture
+def data_dirs(tmp_path):
+    """Directories (pending, archive) of generated data files."""
+    pending = tmp_path / 'pending'
+    archive = tmp_path / 'archive'
+
+    generate_data(pending, archive)
+
+    return (pending, archive)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Clear the process-wide caches of data files' listings and contents
+    (which are keyed by file name, and so shared among tests' files).
+
+    """
+    bank_cls = local.LocalDataFileBank
+
+    yield
+
+    bank_cls.get_projection_cached.cache.clear()
+    bank_cls.sorted_dir.cache.clear()
+    bank_cls.projection_specs.clear()
+    bank_cls.merged_listings.clear()
+
+    if bank_cls.read_failures is not None:
+        bank_cls.read_failures.clear()
+
+    bundle.BUNDLE_READER.clear()
+
+
+class FlatBank(FlatFileBank, local.LocalDataFileBank):
+    pass
+
+
+def run_queries(dirs, **kwargs):
+    """Run queries typical of the dashboard against banks of the data
+    files of `dirs` (constructed with `kwargs`).
+
+    """
+    def bank(**options):
+        return local.LocalDataFileBank(dirs=dirs, **options, **kwargs)
+
+    def flat_bank(**options):
+        return FlatBank(dirs=dirs, **options, **kwargs)
+
+    return [
+        bank(round_to=1).get_points(
+            latency=Last('ping_latency.google_rtt_avg_ms', where=partial(operator.le, 10)),
+            download=Last('ookla.speedtest_ookla_download'),
+            upload=Last('ookla.speedtest_ookla_upload'),
+        ),
+        bank(round_to=1).get_points(
+            download_sd=StdDev('ookla.speedtest_ookla_download', ONE_WEEK_S),
+        ),
+        bank(round_to=3).get_points(
+            count=Count('ping_latency.amazon_rtt_avg_ms', ONE_WEEK_S),
+            mean=Mean('ping_latency.google_rtt_avg_ms', ONE_WEEK_S),
+            low=Min('ookla.speedtest_ookla_upload', ONE_WEEK_S),
+            high=Max('ookla.speedtest_ookla_upload', ONE_WEEK_S),
+        ),
+        flat_bank(round_to=2).get_columns(
+            ('ping_latency.google_rtt_avg_ms', 'ping_latency.amazon_rtt_avg_ms'),
+            ONE_WEEK_S,
+            reverse=True,
+            decorate='Time',
+        ),
+        flat_bank(round_to=2).get_columns('ookla.speedtest_ookla_upload',
+                                          ONE_WEEK_S,
+                                          decorate=['Time', 'Id']),
+        flat_bank().get_points(Last('ookla.speedtest_ookla_download')),
+        bank().get_points(Last('ookla.server'),
+                          Multi('ping_latency.google_rtt_avg_ms', 3600 * 5, decorate=('Time',))),
+    ]
+
+
+@pytest.fixture
+def query(data_dirs):
+    """Run the queries of `run_queries` against `data_dirs`."""
+    return partial(run_queries, data_dirs)
+
+
+@pytest.fixture
+def direct(query):
+    """Results of `run_queries` with the column store and rolling windows
+    disabled -- such that data files are read directly (by the current
+    code, rather than that preceding these stores).
+
+    """
+    return query(column_store=None, rolling_windows=None)
@@ -0,0 +1,186 @@
+import datetime
+import json
+
+import pytest
+
+from app.data.file import bundle, local
+from app.data.file.column import ColumnStore
+
+
+@pytest.fixture
+def bundles(tmp_path, monkeypatch, data_dirs):
+    """Directory of the bundles of the archive of `data_dirs`."""
+    (_pending, archive) = data_dirs
+
+    path_bundles = tmp_path / 'bundle'
+    path_bundles.mkdir()
+
+    monkeypatch.setattr(local, 'BUNDLE_DIRS', {archive: path_bundles})
+
+    return path_bundles
+
+
+def today():
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+
+def compact(data_dirs, path_bundles, **kwargs):
+    (_pending, archive) = data_dirs
+
+    results = bundle.compact_dir(archive, path_bundles, today(), block_size=16, **kwargs)
+
+    local.LocalDataFileBank.sorted_dir.cache.clear()
+
+    return results
+
+
+def test_matches_direct(data_dirs, bundles, query, direct):
+    (_pending, archive) = data_dirs
+
+    sources = sorted(archive.iterdir())
+
+    results = compact(data_dirs, bundles, remove=False)
+
+    assert results
+    assert sum(count for (_path, count) in results) <= len(sources)
+
+    # sources are kept
+    assert sorted(archive.iterdir()) == sources
+
+    assert query(column_store=None, rolling_windows=None) == direct
+
+    # (bundles' members are read in place of their sources)
+    bank = local.LocalDataFileBank(dirs=data_dirs)
+    assert any(bundle.is_member(path) for path in bank.iter_paths())
+
+    # nothing further to bundle
+    assert compact(data_dirs, bundles) == []
+
+
+def test_members(data_dirs, bundles):
+    (_pending, archive) = data_dirs
+
+    compact(data_dirs, bundles, remove=False)
+
+    members = [path for path in local.LocalDataFileBank(dirs=data_dirs).iter_paths()
+               if bundle.is_member(path)]
+
+    assert members
+
+    for path in members:
+        source = archive / path.name
+
+        assert bundle.load_json(path) == json.loads(source.read_text())
+        assert bundle.get_signature(path) == bundle.get_signature(source)
+
+        assert bundle.locate(bundles, path.name) is not None
+
+
+def test_late_file(data_dirs, bundles, query):
+    (_pending, archive) = data_dirs
+
+    ((path_first, _count), *_results) = compact(data_dirs, bundles, remove=False)
+
+    # a data file of a bundled day arrives late
+    (name,) = bundle.BUNDLE_READER.get_index(path_first).names[-1:]
+    timestamp = int(name.split('-')[1]) + 1
+
+    (archive / f'result-{timestamp}-ping.json').write_text(json.dumps({
+        'Measurements': {'ping_latency': {'google_rtt_avg_ms': 1.0}},
+        'Meta': {'Time': timestamp},
+    }))
+
+    [(path_late, count)] = compact(data_dirs, bundles, remove=False)
+
+    assert count == 1
+
+    assert path_late.name == path_first.name.replace('.ndjson', '-1.ndjson')
+    assert bundle.locate(bundles, f'result-{timestamp}-ping.json') == (
+        path_late / f'result-{timestamp}-ping.json'
+    )
+
+    local.LocalDataFileBank.sorted_dir.cache.clear()
+
+    expected = query(column_store=None, rolling_windows=None)
+
+    # (as though unbundled)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(local, 'BUNDLE_DIRS', {})
+        bundle.BUNDLE_READER.clear()
+
+        assert query(column_store=None, rolling_windows=None) == expected
+
+
+def test_remove(tmp_path, data_dirs, bundles, query, direct):
+    (_pending, archive) = data_dirs
+
+    count = len(list(archive.iterdir()))
+
+    results = compact(data_dirs, bundles)
+
+    # bundled data files are removed (by default)
+    assert results
+    assert len(list(archive.iterdir())) == count - sum(count for (_path, count) in results)
+
+    assert query(column_store=None, rolling_windows=None) == direct
+
+    store = ColumnStore(tmp_path / 'column')
+    local.LocalDataFileBank(dirs=data_dirs, column_store=store).ingest()
+
+    assert query(column_store=store, rolling_windows=None) == direct
+
+
+def test_unverified(monkeypatch, data_dirs, bundles):
+    (_pending, archive) = data_dirs
+
+    sources = sorted(archive.iterdir())
+
+    # bundles are written incompletely
+    monkeypatch.setattr(bundle.BundleIndex, 'read_block', lambda self, block: [])
+
+    assert compact(data_dirs, bundles) == []
+
+    # (and are discarded, leaving their data files in place)
+    assert list(bundles.iterdir()) == []
+    assert sorted(archive.iterdir()) == sources
+
+
+def test_merged_listing(monkeypatch, data_dirs, bundles):
+    (_pending, archive) = data_dirs
+
+    compact(data_dirs, bundles, remove=False)
+
+    bank_cls = local.LocalDataFileBank
+
+    listed = bank_cls.list_dir(archive, 10_000)
+
+    assert bank_cls.count_dir(archive, 10_000) == len(listed)
+
+    # merged listings are reused until either directory is modified
+    def fail(_paths):
+        raise AssertionError('bundles merged')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(bundle, 'iter_bundled', fail)
+
+        assert bank_cls.list_dir(archive, 10_000) == listed
+        assert bank_cls.count_dir(archive, 10_000) == len(listed)
+
+    (archive / 'result-0-ping.json').write_text('{}')
+    bank_cls.sorted_dir.cache.clear()
+
+    assert len(bank_cls.list_dir(archive, 10_000)) == len(listed) + 1
+
+
+def test_moved(data_dirs, bundles):
+    (_pending, archive) = data_dirs
+
+    bank = local.LocalDataFileBank(dirs=data_dirs)
+    paths = [path for path in bank.iter_paths() if path.parent == archive]
+
+    compact(data_dirs, bundles)
+
+    # data files listed prior to their removal are found in their bundles
+    moved = [bank.locate_moved(path) for path in paths]
+
+    assert all(path is not None and bundle.is_member(path) for path in moved[-10:])
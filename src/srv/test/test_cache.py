@@ -0,0 +1,156 @@
+import pytest
+
+from app.data.file import local
+from app.data.file.base import Last
+from app.data.file.persist import ProjectionStore
+from app.lib.cache import BudgetCache, FrequencySketch
+
+
+def unit_size(_value):
+    return 1
+
+
+@pytest.mark.parametrize('policy', ['lru', 'tinylfu'])
+def test_budget(policy):
+    cache = BudgetCache(1000, policy, getsizeof=len)
+
+    for index in range(100):
+        cache[index] = b'x' * 50
+
+    assert cache.currsize <= 1000
+    assert cache.currsize == sum(len(cache._cache_[key][0]) for key in cache)
+    assert cache.evictions == 100 - len(cache)
+
+    # replacement is sized anew
+    (key,) = list(cache)[-1:]
+    cache[key] = b'y'
+
+    assert cache.currsize == sum(len(cache._cache_[key][0]) for key in cache)
+
+
+@pytest.mark.parametrize('policy', ['lru', 'tinylfu'])
+def test_oversized(policy):
+    cache = BudgetCache(10, policy, getsizeof=len)
+
+    with pytest.raises(ValueError):
+        cache['key'] = b'x' * 11
+
+    assert cache.set('key', b'x' * 11) is False
+    assert 'key' not in cache
+    assert cache.currsize == 0
+
+
+def test_lru():
+    cache = BudgetCache(3, 'lru', getsizeof=unit_size)
+
+    for key in 'abc':
+        cache[key] = key
+
+    cache['a']
+    cache['d'] = 'd'
+
+    assert sorted(cache) == ['a', 'c', 'd']
+
+
+@pytest.mark.parametrize('policy, retained', [('lru', False), ('tinylfu', True)])
+def test_scan_resistance(policy, retained):
+    cache = BudgetCache(100, policy, getsizeof=unit_size)
+
+    hot = [f'hot{index}' for index in range(10)]
+
+    for key in hot:
+        cache[key] = key
+
+    for _count in range(5):
+        for key in hot:
+            assert cache[key] == key
+
+    # a single scan of many keys
+    for index in range(1000):
+        cache.set(f'scan{index}', index)
+
+    assert all(key in cache for key in hot) is retained
+    assert len(cache) <= 100
+
+
+def test_stats():
+    cache = BudgetCache(2, getsizeof=unit_size)
+
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.set('c', 3)
+
+    assert cache.get('a') is None
+    assert cache.get('c') == 3
+
+    cache.discard('b')
+    cache.discard('missing')
+
+    assert cache.stats() == {
+        'hits': 1,
+        'misses': 1,
+        'evictions': 1,
+        'bytes': 1,
+        'count': 1,
+    }
+
+    cache.clear()
+
+    assert cache.stats()['bytes'] == cache.stats()['count'] == 0
+
+
+def test_frequency_sketch():
+    sketch = FrequencySketch(width=64, sample=100)
+
+    for _count in range(20):
+        sketch.increment('a')
+
+    # (saturated)
+    assert sketch.frequency('a') == FrequencySketch.MAX_COUNT
+    assert sketch.frequency('b') <= sketch.frequency('a')
+
+    for index in range(80):
+        sketch.increment(index)
+
+    # (aged)
+    assert sketch.frequency('a') < FrequencySketch.MAX_COUNT
+
+
+def test_frequency_sketch_rows():
+    sketch = FrequencySketch()
+
+    indexes = {key: sketch._indexes_(key) for key in [*range(200), *map(str, range(200))]}
+
+    # keys colliding in one row do not (generally) collide in others
+    collisions = sum(
+        sum(index0 == index1 for (index0, index1) in zip(indexes0, indexes1)) > 1
+        for (key0, indexes0) in indexes.items()
+        for (key1, indexes1) in indexes.items()
+        if key0 != key1
+    )
+
+    assert collisions < 4
+
+
+def test_projections_oversized(monkeypatch, tmp_path, data_dirs):
+    store = ProjectionStore(tmp_path / 'projection.sqlite')
+    monkeypatch.setattr(local, 'PROJECTION_STORE', store)
+
+    bank_cls = local.LocalDataFileBank
+    bank = bank_cls(dirs=data_dirs, column_store=None, rolling_windows=None)
+
+    expected = bank.get_points(Last('ookla.speedtest_ookla_download'))
+
+    # projections exceeding the cache are neither cached nor fatal
+    bank_cls.get_projection_cached.cache.clear()
+    monkeypatch.setattr(local.PROJECTION_CACHE, 'maxbytes', 1)
+
+    # (populated)
+    bank_cls.populate_caches(dirs=data_dirs)
+    store.flush()
+
+    # (restored from the projection store)
+    bank_cls.populate_caches(dirs=data_dirs)
+
+    assert len(bank_cls.get_projection_cached.cache) == 0
+    assert bank.get_points(Last('ookla.speedtest_ookla_download')) == expected
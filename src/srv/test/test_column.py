@@ -0,0 +1,206 @@
+import json
+
+from app.data.file import local
+from app.data.file.base import Count, Last, ONE_WEEK_S, StdDev
+from app.data.file.column import ColumnStore
+
+
+def load(path):
+    return json.loads(path.read_text())
+
+
+def write(path, timestamp, value):
+    path.write_text(json.dumps({
+        'Measurements': {'x': {'v': value, 'big': 2 ** 60}},
+        'Meta': {'Time': timestamp},
+    }))
+
+
+def ingest(data_dirs, store):
+    return local.LocalDataFileBank(dirs=data_dirs, column_store=store).ingest()
+
+
+def test_matches_direct(tmp_path, data_dirs, query, direct):
+    store = ColumnStore(tmp_path / 'column')
+
+    assert ingest(data_dirs, store) > 0
+    assert query(column_store=store, rolling_windows=None) == direct
+
+    # (as reloaded from disk)
+    store = ColumnStore(tmp_path / 'column')
+
+    assert ingest(data_dirs, store) == 0
+    assert query(column_store=store, rolling_windows=None) == direct
+
+
+def test_queries_read_store(monkeypatch, tmp_path, data_dirs):
+    store = ColumnStore(tmp_path / 'column')
+    ingest(data_dirs, store)
+
+    def read(*_args):
+        raise AssertionError('data file read')
+
+    monkeypatch.setattr(local.LocalDataFileBank, '_get_projection_', read)
+
+    bank = local.LocalDataFileBank(dirs=data_dirs, column_store=store, rolling_windows=None)
+
+    points = bank.get_points(
+        count=Count('ping_latency.amazon_rtt_avg_ms', ONE_WEEK_S),
+        sd=StdDev('ookla.speedtest_ookla_download', ONE_WEEK_S),
+        last=Last('ookla.speedtest_ookla_upload'),
+    )
+
+    assert points['count'] > 0
+    assert points['sd'] > 0
+    assert points['last'] > 0
+
+
+def test_queries_do_not_ingest(monkeypatch, tmp_path, data_dirs, query):
+    store = ColumnStore(tmp_path / 'column')
+    ingest(data_dirs, store)
+
+    requests = []
+
+    def request_ingestion(bank):
+        requests.append(bank)
+
+    monkeypatch.setattr(local.LocalDataFileBank, 'request_ingestion', request_ingestion)
+
+    (pending, _archive) = data_dirs
+    (name,) = sorted(path.name for path in pending.glob('*-ping.json'))[-1:]
+    timestamp = int(name.split('-')[1]) + 60
+    write(pending / f'result-{timestamp}-ping.json', timestamp, 1)
+
+    local.LocalDataFileBank.sorted_dir.cache.clear()
+
+    stop = store.stop
+    expected = query(column_store=None, rolling_windows=None)
+
+    # data files are read directly until ingested (in the background)
+    assert query(column_store=store, rolling_windows=None) == expected
+    assert store.stop == stop
+    assert requests
+
+    assert ingest(data_dirs, store) == 1
+    assert query(column_store=store, rolling_windows=None) == expected
+
+
+def test_request_ingestion(tmp_path, data_dirs, query, direct):
+    store = ColumnStore(tmp_path / 'column')
+    bank = local.LocalDataFileBank(dirs=data_dirs, column_store=store, rolling_windows=None)
+
+    assert bank.select_columns([]) is None
+
+    bank.request_ingestion().join(10)
+
+    assert store.ingested == bank.ingestion_version
+    assert bank.select_columns([]) is store
+    assert query(column_store=store, rolling_windows=None) == direct
+
+
+def test_integers(tmp_path, data_dirs):
+    store = ColumnStore(tmp_path / 'column')
+    store.update(local.LocalDataFileBank(dirs=data_dirs).iter_paths(), load)
+
+    values = [values['ookla']['speedtest_ookla_upload']
+              for (values, _meta) in store.iter_datasets(['ookla.speedtest_ookla_upload'])
+              if values]
+
+    assert values
+    assert all(type(value) is int for value in values)
+
+
+def test_late_file(tmp_path):
+    files = tmp_path / 'files'
+    files.mkdir()
+
+    for index in (1, 2, 4, 5):
+        write(files / f'result-{index}.json', 1000 + index, index)
+
+    store = ColumnStore(tmp_path / 'column')
+
+    assert store.update(files.iterdir(), load) == 4
+
+    # arrives after later files were ingested
+    write(files / 'result-3.json', 1003, 3)
+
+    assert store.update(files.iterdir(), load) == 3
+
+    datasets = list(store.iter_datasets(['x.v']))
+
+    assert [meta['Meta']['Time'] for (_values, meta) in datasets] == [1005, 1004, 1003, 1002, 1001]
+    assert [values['x']['v'] for (values, _meta) in datasets] == [5, 4, 3, 2, 1]
+
+    # (as reloaded from disk)
+    store = ColumnStore(tmp_path / 'column')
+
+    assert store.update(files.iterdir(), load) == 0
+    assert len(list(store.iter_datasets(['x.v']))) == 5
+
+
+def test_covers(tmp_path):
+    files = tmp_path / 'files'
+    files.mkdir()
+    write(files / 'result-1.json', 1001, 1)
+
+    store = ColumnStore(tmp_path / 'column')
+    store.update(files.iterdir(), load)
+
+    assert store.covers(['x.v'])
+
+    # unknown keys
+    assert not store.covers(['x.unknown'])
+    assert not store.covers(['x.v'], ['Unknown'])
+
+    # keys of values which are not stored (too large to store exactly), and branches
+    assert not store.covers(['x.big'])
+    assert not store.covers(['x'])
+
+
+def test_missing_state(tmp_path):
+    files = tmp_path / 'files'
+    files.mkdir()
+
+    for index in range(1, 4):
+        write(files / f'result-{index}.json', 1000 + index, index)
+
+    ColumnStore(tmp_path / 'column').update(files.iterdir(), load)
+
+    (tmp_path / 'column' / 'state.json').unlink()
+
+    # columns are rebuilt rather than appended to
+    store = ColumnStore(tmp_path / 'column')
+
+    assert store.update(files.iterdir(), load) == 3
+    assert [values['x']['v'] for (values, _meta) in store.iter_datasets(['x.v'])] == [3, 2, 1]
+
+
+def test_populate_caches_parses_once(tmp_path, monkeypatch, data_dirs):
+    store = ColumnStore(tmp_path / 'column')
+    monkeypatch.setattr(local, 'COLUMN_STORE', store)
+
+    bank_cls = local.LocalDataFileBank
+
+    # a query to be warmed
+    bank_cls.projection_specs[(frozenset(['ping_latency.google_rtt_avg_ms']),
+                               'Measurements',
+                               'Meta')] = True
+
+    reads = []
+
+    def get_json(path):
+        reads.append(path)
+        return load(path)
+
+    monkeypatch.setattr(bank_cls, 'get_json', staticmethod(get_json))
+
+    bank_cls.populate_caches(dirs=data_dirs)
+
+    # column store rows are taken from the warming of projections
+    assert reads == []
+
+    readable = [path for path in bank_cls(dirs=data_dirs).iter_paths()
+                if not path.name.endswith('-bad.json')]
+
+    assert store.stop - store.start == len(readable)
+    assert len(bank_cls.get_projection_cached.cache) == len(readable)
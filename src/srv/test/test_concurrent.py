@@ -0,0 +1,150 @@
+import threading
+import time
+
+import pytest
+
+from app.lib.concurrent import FairExecutor, SingleFlight
+
+
+def test_single_flight():
+    flight = SingleFlight()
+
+    release = threading.Event()
+    calls = []
+
+    def func(value):
+        calls.append(value)
+        release.wait(5)
+        return value * 2
+
+    results = [None] * 5
+
+    def run(index):
+        results[index] = flight.do('key', func, 21)
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(5)]
+
+    for thread in threads:
+        thread.start()
+
+    while flight.shared < 4:
+        time.sleep(0.01)
+
+    release.set()
+
+    for thread in threads:
+        thread.join()
+
+    assert calls == [21]
+    assert results == [42] * 5
+
+    # (calls are not coalesced once complete)
+    assert flight.do('key', func, 1) == 2
+    assert not flight.calls
+
+
+def test_single_flight_error():
+    flight = SingleFlight()
+
+    release = threading.Event()
+
+    def func():
+        release.wait(5)
+        raise KeyError('missing')
+
+    errors = [None] * 3
+
+    def run(index):
+        try:
+            flight.do('key', func)
+        except KeyError as exc:
+            errors[index] = exc
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(3)]
+
+    for thread in threads:
+        thread.start()
+
+    while flight.shared < 2:
+        time.sleep(0.01)
+
+    release.set()
+
+    for thread in threads:
+        thread.join()
+
+    assert all(isinstance(exc, KeyError) for exc in errors)
+    assert not flight.calls
+
+
+def test_invalid_workers():
+    with pytest.raises(ValueError):
+        FairExecutor(0)
+
+
+def test_fairness():
+    executor = FairExecutor(1)
+
+    # occupy the only worker while tasks are queued
+    release = threading.Event()
+    blocker = executor.session().submit(release.wait, 5)
+
+    order = []
+
+    greedy = executor.session()
+    modest = executor.session()
+
+    futures = [greedy.submit(order.append, ('greedy', index)) for index in range(5)]
+    futures += [modest.submit(order.append, ('modest', index)) for index in range(2)]
+
+    release.set()
+
+    for future in (blocker, *futures):
+        future.result(5)
+
+    # sessions' tasks are taken in turn
+    assert order[:4] == [('greedy', 0), ('modest', 0), ('greedy', 1), ('modest', 1)]
+    assert order[4:] == [('greedy', index) for index in range(2, 5)]
+
+    stats = executor.stats()
+
+    assert stats['submitted'] == stats['completed'] == 8
+    assert stats['queued'] == stats['in_flight'] == 0
+    assert stats['workers'] == 1
+
+
+def test_session_limit():
+    executor = FairExecutor(4)
+    session = executor.session(max_workers=2)
+
+    lock = threading.Lock()
+    running = []
+    peak = [0]
+
+    def task():
+        with lock:
+            running.append(None)
+            peak[0] = max(peak[0], len(running))
+
+        time.sleep(0.05)
+
+        with lock:
+            running.pop()
+
+    futures = [session.submit(task) for _count in range(8)]
+
+    for future in futures:
+        future.result(5)
+
+    assert peak[0] == 2
+
+
+def test_task_error():
+    executor = FairExecutor(2)
+
+    future = executor.session().submit(int, 'x')
+
+    with pytest.raises(ValueError):
+        future.result(5)
+
+    assert executor.session().submit(int, '1').result(5) == 1
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from app.lib import decode
+from app.lib.decode import StdlibDecoder, get_decoder
+
+
+DOCUMENT = {
+    'Measurements': {'ookla': {'speedtest_ookla_download': 90.5, 'server': 'abc'}},
+    'Meta': {'Time': 1700000000.5},
+}
+
+
+@pytest.fixture(params=list(decode.DECODERS))
+def decoder(request):
+    try:
+        return get_decoder(request.param)
+    except ModuleNotFoundError:
+        pytest.skip(f'{request.param} not installed')
+
+
+def test_loads(decoder):
+    data = json.dumps(DOCUMENT).encode()
+
+    assert decoder.loads(data) == DOCUMENT
+    assert decoder.loads(memoryview(data)) == DOCUMENT
+    assert decoder.loads(data.decode()) == DOCUMENT
+
+
+@pytest.mark.parametrize('mmap_min_size', [0, decode.MMAP_MIN_SIZE])
+def test_load_path(monkeypatch, tmp_path, decoder, mmap_min_size):
+    monkeypatch.setattr(decode, 'MMAP_MIN_SIZE', mmap_min_size)
+
+    path = tmp_path / 'result-1700000000-ookla.json'
+    path.write_text(json.dumps(DOCUMENT))
+
+    assert decoder.load_path(path) == DOCUMENT
+
+
+def test_loads_lenient(decoder):
+    # documents valid from json.dump (if not strictly JSON) are decoded by any decoder
+    data = json.dumps({'nan': float('nan'), 'big': 1 << 70}).encode()
+
+    decoded = decoder.loads(data)
+
+    assert decoded['nan'] != decoded['nan']
+    assert decoded['big'] == 1 << 70
+
+    with pytest.raises(ValueError):
+        decoder.loads(b'{bad')
+
+
+def test_get_decoder():
+    assert get_decoder('auto').name in decode.DECODERS
+    assert isinstance(get_decoder('json'), StdlibDecoder)
+
+    with pytest.raises(ValueError):
+        get_decoder('missing')
@@ -0,0 +1,77 @@
+import io
+import json
+import os
+import wsgiref.util
+
+from app import dashboard
+from app.data.file import local
+from app.data.file.base import Last
+from app.handler import metrics  # noqa: F401
+
+
+def query(data_dirs):
+    bank = local.LocalDataFileBank(dirs=data_dirs, column_store=None, rolling_windows=None)
+    return bank.get_points(last=Last('ping_latency.google_rtt_avg_ms'))['last']
+
+
+def request(path):
+    environ = {'wsgi.input': io.BytesIO()}
+    wsgiref.util.setup_testing_defaults(environ)
+    environ['PATH_INFO'] = path
+
+    statuses = []
+
+    def start_response(status, _headers, _exc_info=None):
+        statuses.append(status)
+
+    body = b''.join(dashboard(environ, start_response))
+
+    return (statuses[0], json.loads(body))
+
+
+def test_unreadable_file(data_dirs):
+    (pending, _archive) = data_dirs
+
+    # the latest data file is truncated
+    (path,) = sorted(pending.glob('*-ping.json'))[-1:]
+    path.write_text(path.read_text()[:10])
+
+    failures = local.LocalDataFileBank.read_failures
+    stats0 = failures.stats()
+
+    expected = query(data_dirs)
+
+    assert path in failures.files
+    assert failures.failures == stats0['failures'] + 1
+
+    # (not read again)
+    assert query(data_dirs) == expected
+    assert failures.failures == stats0['failures'] + 1
+    assert failures.skips > stats0['skips']
+
+    # ...until changed
+    path.write_text(json.dumps({
+        'Measurements': {'ping_latency': {'google_rtt_avg_ms': 1.5}},
+        'Meta': {'Time': 0},
+    }))
+    os.utime(path, ns=(0, 0))
+
+    assert query(data_dirs) == 1.5
+    assert path not in failures.files
+
+
+def test_metrics(data_dirs):
+    (pending, _archive) = data_dirs
+
+    (path,) = sorted(pending.glob('*-ping.json'))[-1:]
+    path.write_text('{')
+
+    query(data_dirs)
+    query(data_dirs)
+
+    (status, body) = request('/metrics/datafile')
+
+    assert status.startswith('200')
+    assert body['read_failures'] == local.LocalDataFileBank.read_failures.stats()
+    assert body['read_failures']['count'] == 1
+    assert body['read_failures']['skips'] >= 1
@@ -0,0 +1,237 @@
+import json
+import os
+import time
+
+import pytest
+
+from app.data.file import bundle, local
+from app.data.file.base import FILE_PATTERNS, Last, Multi, StdDev, get_file_patterns, project
+from app.data.file.watch import DirectoryWatcher
+
+
+def make_bank(data_dirs, **kwargs):
+    return local.LocalDataFileBank(dirs=data_dirs, column_store=None, rolling_windows=None,
+                                   **kwargs)
+
+
+def test_iter_paths_since(data_dirs):
+    bank = make_bank(data_dirs)
+
+    since = time.time() - 3600 * 30
+
+    paths = list(bank.iter_paths(since=since))
+
+    # paths are generated only until the window's edge
+    assert paths
+    assert paths == [path for path in bank.iter_paths()
+                     if bank.get_path_time(path) >= since]
+
+    # (of either directory)
+    assert {path.parent for path in paths} == set(data_dirs)
+
+
+def test_path_time(data_dirs):
+    (pending, _archive) = data_dirs
+
+    path = pending / 'unlabeled.json'
+    path.write_text('{}')
+    os.utime(path, (1e9, 1e9))
+
+    # (bounded by modification time where the name has no timestamp)
+    assert local.LocalDataFileBank.get_path_time(path) == 1e9
+    assert local.LocalDataFileBank.path_precedes(path, time.time() - 60)
+
+    assert local.LocalDataFileBank.get_path_time(pending / 'result-1700000000-ping.json') == (
+        1700000000 + 3600
+    )
+
+
+def test_since_not_read(monkeypatch, data_dirs):
+    ops = dict(
+        multi=Multi('ping_latency.google_rtt_avg_ms', 3600 * 5, decorate=('Time',)),
+        sd=StdDev('ookla.speedtest_ookla_download', 3600 * 24),
+    )
+
+    bank = make_bank(data_dirs)
+
+    get_datablob = local.LocalDataFileBank.get_datablob
+    read = []
+
+    def spy(self, path, keys=()):
+        read.append(path)
+        return get_datablob(self, path, keys)
+
+    monkeypatch.setattr(local.LocalDataFileBank, 'get_datablob', spy)
+
+    expected = bank.get_points(**ops)
+
+    # files outside of the aggregators' window are not read
+    since = time.time() - 3600 * 24
+
+    assert read
+    assert all(bank.get_path_time(path) >= since for path in read)
+
+    # (with results as though they had been)
+    monkeypatch.setattr(local.LocalDataFileBank, 'get_since', staticmethod(lambda _ops: None))
+
+    read.clear()
+
+    assert bank.get_points(**ops) == expected
+    assert any(bank.get_path_time(path) < since for path in read)
+
+
+def test_project():
+    full_data = {
+        'Measurements': {
+            'ookla': {'speedtest_ookla_download': 90.5, 'server': {'id': 1, 'host': 'x'}},
+            'ping_latency': {'google_rtt_avg_ms': 12.5},
+        },
+        'Meta': {'Time': 1700000000.5},
+    }
+
+    keys = frozenset(('ookla.speedtest_ookla_download', 'ookla.missing'))
+
+    # only the keys (and meta data) are retained
+    assert project(full_data, keys) == {
+        'Measurements': {'ookla': {'speedtest_ookla_download': 90.5}},
+        'Meta': {'Time': 1700000000.5},
+    }
+
+    # (a file missing its prefix retains only its meta data)
+    assert project({'Meta': {'Time': 0}}, keys) == {'Meta': {'Time': 0}}
+
+
+def test_projection_cached(monkeypatch, data_dirs):
+    bank_cls = local.LocalDataFileBank
+    bank = make_bank(data_dirs)
+
+    ops = dict(
+        download=Last('ookla.speedtest_ookla_download'),
+        sd=StdDev('ookla.speedtest_ookla_download', 3600 * 24),
+    )
+
+    expected = bank.get_points(**ops)
+
+    # projections rather than documents are cached, by file name and keys
+    cache = bank_cls.get_projection_cached.cache
+
+    assert len(cache) > 0
+
+    for (name, keys, prefix, meta_prefix) in cache:
+        assert name.endswith('-ookla.json')
+        assert keys == {'ookla.speedtest_ookla_download'}
+        assert set(cache[(name, keys, prefix, meta_prefix)]['Measurements']['ookla']) == {
+            'speedtest_ookla_download',
+        }
+
+    # (and data files are not read again)
+    def fail(_path):
+        raise AssertionError('data file read')
+
+    monkeypatch.setattr(bundle, 'load_json', fail)
+
+    assert bank.get_points(**ops) == expected
+
+
+def test_file_patterns():
+    (ping, ookla, _ndt7) = (file_pattern for (_key_pattern, file_pattern) in FILE_PATTERNS)
+
+    assert get_file_patterns(['ookla.speedtest_ookla_download']) == {ookla}
+    assert get_file_patterns(['ookla.server', 'ping_latency.google_rtt_avg_ms']) == {ping, ookla}
+
+    # (all files are inspected for keys matching no pattern)
+    assert get_file_patterns(['ookla.server', 'other.key']) is None
+    assert get_file_patterns([]) is None
+
+
+@pytest.mark.parametrize('watched', [False, True])
+def test_iter_paths_keys(monkeypatch, data_dirs, watched):
+    if watched:
+        # (listed from the watcher's index of each type)
+        file_patterns = [file_pattern for (_key_pattern, file_pattern) in FILE_PATTERNS]
+        watcher = DirectoryWatcher(data_dirs, patterns=file_patterns)
+
+        for index in watcher.indexes.values():
+            index.reset()
+
+        monkeypatch.setattr(local, 'DIRECTORY_WATCHER', watcher)
+
+    bank = make_bank(data_dirs, file_limit=200)
+
+    keys = ['ookla.speedtest_ookla_download']
+
+    paths = list(bank.iter_paths(keys))
+
+    # only files of types which may contain the keys are generated
+    assert paths
+    assert all(path.name.endswith('-ookla.json') for path in paths)
+
+    # (excluded files counting toward the file limit)
+    assert paths == [path for path in bank.iter_paths() if path.name.endswith('-ookla.json')]
+
+
+def test_keys_not_read(monkeypatch, data_dirs):
+    get_datablob = local.LocalDataFileBank.get_datablob
+    read = []
+
+    def spy(self, path, keys=()):
+        read.append(path)
+        return get_datablob(self, path, keys)
+
+    monkeypatch.setattr(local.LocalDataFileBank, 'get_datablob', spy)
+
+    make_bank(data_dirs).get_points(StdDev('ookla.speedtest_ookla_download', 3600 * 24))
+
+    # files of other types are not read
+    assert read
+    assert all(path.name.endswith('-ookla.json') for path in read)
+
+
+def test_moved_cached(monkeypatch, data_dirs):
+    (pending, archive) = data_dirs
+
+    bank = make_bank(data_dirs)
+    op = StdDev('ookla.speedtest_ookla_download', 3600 * 24 * 3)
+
+    expected = bank.get_points(op)
+
+    cache = local.LocalDataFileBank.get_projection_cached.cache
+    cached = set(cache)
+
+    # data files moved from pending to archive remain cached (by name)
+    for path in pending.glob('*-ookla.json'):
+        path.rename(archive / path.name)
+
+    local.LocalDataFileBank.sorted_dir.cache.clear()
+
+    def fail(_path):
+        raise AssertionError('data file read')
+
+    monkeypatch.setattr(bundle, 'load_json', fail)
+
+    assert bank.get_points(op) == expected
+    assert set(cache) == cached
+
+
+def test_moved_listed(data_dirs):
+    (pending, archive) = data_dirs
+
+    bank = make_bank(data_dirs)
+
+    expected = list(bank.iter_paths())
+
+    # a data file found in both directories (mid-move) is generated once
+    (path,) = sorted(pending.glob('*-ping.json'))[:1]
+    (archive / path.name).write_bytes(path.read_bytes())
+
+    local.LocalDataFileBank.sorted_dir.cache.clear()
+
+    assert [path.name for path in bank.iter_paths()] == [path.name for path in expected]
+
+    # (and a data file moved since listing is read from its new directory)
+    path.unlink()
+
+    assert bank.get_projection(path, ['ping_latency.google_rtt_avg_ms']) == project(
+        json.loads((archive / path.name).read_text()),
+        ['ping_latency.google_rtt_avg_ms'],
+    )
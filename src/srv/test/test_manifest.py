@@ -0,0 +1,131 @@
+import os
+
+import pytest
+
+from app.data.file import watch
+from app.data.file.manifest import DirectoryManifest
+from app.data.file.watch import DirectoryIndex
+
+
+NAMES = [f'result-{1700000000 + count}-ping.json' for count in range(5)]
+
+
+@pytest.fixture
+def record(tmp_path):
+    return DirectoryManifest.for_dir(tmp_path / 'manifest', tmp_path / 'data')
+
+
+def test_load(record):
+    assert record.load(1) is None
+
+    record.write(NAMES, 1)
+
+    # (as upon restart)
+    record = DirectoryManifest(record.path)
+
+    assert record.load(1) == NAMES
+
+    # manifests not reflecting the directory as of its modification time are not loaded
+    assert record.load(2) is None
+
+
+def test_append(record):
+    record.write(NAMES[:3], 1)
+
+    record.add(NAMES[3])
+    record.add(NAMES[4])
+
+    # (names appended are loaded only once synced)
+    assert DirectoryManifest(record.path).load(1) is None
+
+    record.sync(NAMES, 2)
+
+    assert record.path.read_text().splitlines()[-4:] == [
+        '/sync 1',
+        NAMES[3],
+        NAMES[4],
+        '/sync 2',
+    ]
+    assert DirectoryManifest(record.path).load(2) == NAMES
+
+
+@pytest.mark.parametrize('change', ['discard', 'out_of_order'])
+def test_rewrite(record, change):
+    record.write(NAMES[1:], 1)
+
+    if change == 'discard':
+        names = NAMES[1:-1]
+        record.discard(NAMES[-1])
+    else:
+        names = NAMES
+        record.add(NAMES[0])
+
+    # manifests which may not be appended to are rewritten
+    assert record.dirty
+
+    record.sync(names, 2)
+
+    assert record.path.read_text().splitlines() == [*names, '/sync 2']
+    assert DirectoryManifest(record.path).load(2) == names
+
+
+def test_rewrite_growth(record):
+    record.write(NAMES[:1], 1)
+
+    for mtime_ns in range(2, 5):
+        record.sync(NAMES[:1], mtime_ns)
+
+    # (manifests of many sync points are rewritten)
+    assert record.path.read_text().splitlines() == [NAMES[0], '/sync 4']
+
+
+def test_disabled(tmp_path):
+    (tmp_path / 'file').write_text('')
+
+    record = DirectoryManifest(tmp_path / 'file' / 'manifest')
+
+    record.write(NAMES, 1)
+
+    assert record.enabled is False
+    assert record.load(1) is None
+
+
+def test_index(monkeypatch, tmp_path, record):
+    path_dir = tmp_path / 'data'
+    path_dir.mkdir()
+
+    for name in NAMES:
+        (path_dir / name).write_text('{}')
+
+    DirectoryIndex(path_dir, manifest=record).reset()
+
+    # upon restart, the index is loaded from the manifest rather than listed
+    def fail(_path):
+        raise AssertionError('directory listed')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(watch.os, 'scandir', fail)
+
+        index = DirectoryIndex(path_dir, manifest=DirectoryManifest(record.path))
+        index.reset()
+
+    assert index.names == NAMES
+
+    # (as maintained upon changes)
+    (path_dir / NAMES[0]).unlink()
+    (path_dir / 'result-1800000000-ping.json').write_text('{}')
+
+    index.refresh()
+
+    names = sorted(os.listdir(path_dir))
+
+    assert index.names == names
+    assert DirectoryManifest(record.path).load(os.stat(path_dir).st_mtime_ns) == names
+
+    # ...unless the directory has since changed
+    (path_dir / NAMES[1]).unlink()
+
+    index = DirectoryIndex(path_dir, manifest=DirectoryManifest(record.path))
+    index.reset()
+
+    assert index.names == names[1:]
@@ -0,0 +1,187 @@
+import sqlite3
+
+import pytest
+
+from app.data.file import bundle, local
+from app.data.file.base import Last, StdDev
+from app.data.file.persist import ProjectionStore
+
+
+SPEC = (frozenset(('ping_latency.google_rtt_avg_ms',)), 'Measurements', 'Meta')
+
+SPEC1 = (frozenset(('ookla.speedtest_ookla_download',)), 'Measurements', 'Meta')
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ProjectionStore(tmp_path / 'store' / 'projection.sqlite')
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / 'result-1700000000-ping.json'
+    path.write_text('{}')
+    return path
+
+
+def load(store, path, value, spec=SPEC):
+    made = []
+
+    def make():
+        made.append(path)
+        return value
+
+    return (store.load(path, spec, make), made)
+
+
+def test_load(store, path):
+    assert load(store, path, {'a': 1}) == ({'a': 1}, [path])
+
+    store.flush()
+
+    # (as upon restart)
+    store = ProjectionStore(store.path)
+
+    assert load(store, path, None) == ({'a': 1}, [])
+    assert store.get(path, SPEC) == {'a': 1}
+    assert store.get(path, SPEC1) is None
+
+    # (stored projections are retrieved in bulk)
+    rows = store.get_rows([path.name, 'missing'], SPEC)
+
+    assert list(rows) == [path.name]
+    assert store.get(path, SPEC, rows) == {'a': 1}
+
+
+def test_signature(tmp_path, store, path):
+    load(store, path, {'a': 1})
+    store.flush()
+
+    # stored projections are retained by files moved to another directory
+    path_moved = tmp_path / 'archive' / path.name
+    path_moved.parent.mkdir()
+    path.rename(path_moved)
+
+    assert store.get(path_moved, SPEC) == {'a': 1}
+
+    # ...but not by files changed
+    path_moved.write_text('{"changed": true}')
+
+    assert load(store, path_moved, {'a': 2}) == ({'a': 2}, [path_moved])
+
+
+def test_batch(path):
+    store = ProjectionStore(path.parent / 'projection.sqlite', batch_size=2, interval=60)
+
+    load(store, path, {'a': 1})
+
+    assert store.pending
+
+    load(store, path, {'b': 1}, SPEC1)
+
+    # (written upon reaching the batch size)
+    assert not store.pending
+    assert store.get(path, SPEC1) == {'b': 1}
+
+
+def test_specs(store, path):
+    load(store, path, {'a': 1})
+    load(store, path, {'b': 1}, SPEC1)
+    store.flush()
+
+    store.touch_specs([SPEC])
+
+    assert store.get_specs(1) == [SPEC]
+    assert set(store.get_specs(10)) == {SPEC, SPEC1}
+
+
+def test_prune(tmp_path, store, path):
+    path1 = tmp_path / 'result-1700000001-ping.json'
+    path1.write_text('{}')
+
+    for spec in (SPEC1, SPEC):
+        load(store, path, {'a': 1}, spec)
+        load(store, path1, {'a': 1}, spec)
+
+    store.flush()
+    store.touch_specs([SPEC])
+
+    # projections of other files, and of specs other than the most recently-used, are discarded
+    store.prune([path.name], 1)
+
+    assert store.get(path, SPEC) == {'a': 1}
+    assert store.get(path, SPEC1) is None
+    assert store.get(path1, SPEC) is None
+    assert store.get_specs(10) == [SPEC]
+
+
+def test_version(store, path):
+    load(store, path, {'a': 1})
+    store.flush()
+
+    with sqlite3.connect(store.path) as connection:
+        connection.execute('pragma user_version = 999')
+
+    # (incompatible stores are discarded)
+    assert ProjectionStore(store.path).get(path, SPEC) is None
+
+
+def test_disabled(tmp_path, path):
+    (tmp_path / 'file').write_text('')
+
+    store = ProjectionStore(tmp_path / 'file' / 'projection.sqlite')
+
+    # (an unusable store is disabled rather than fatal)
+    assert load(store, path, {'a': 1}) == ({'a': 1}, [path])
+
+    store.flush()
+
+    assert store.enabled is False
+    assert load(store, path, {'a': 1}) == ({'a': 1}, [path])
+
+
+def test_restore(monkeypatch, tmp_path, data_dirs):
+    store = ProjectionStore(tmp_path / 'projection.sqlite')
+    monkeypatch.setattr(local, 'PROJECTION_STORE', store)
+
+    bank_cls = local.LocalDataFileBank
+    bank = bank_cls(dirs=data_dirs, column_store=None, rolling_windows=None)
+
+    ops = dict(
+        latency=Last('ping_latency.google_rtt_avg_ms'),
+        download_sd=StdDev('ookla.speedtest_ookla_download', 3600 * 24 * 3),
+    )
+
+    expected = bank.get_points(**ops)
+
+    store.flush()
+
+    names = [path.name for path_dir in data_dirs for path in path_dir.iterdir()]
+    stored = {name for spec in store.get_specs(10) for name in store.get_rows(names, spec)}
+
+    assert stored
+
+    # upon restart, stored projections are restored rather than read from data files
+    bank_cls.get_projection_cached.cache.clear()
+    bank_cls.projection_specs.clear()
+
+    monkeypatch.setattr(local, 'PROJECTION_STORE', ProjectionStore(store.path))
+
+    load_json = bundle.load_json
+    read = set()
+
+    def spy(path):
+        read.add(path.name)
+        return load_json(path)
+
+    monkeypatch.setattr(bundle, 'load_json', spy)
+
+    bank_cls.populate_caches(dirs=data_dirs)
+
+    assert not read & stored
+    assert len(bank_cls.get_projection_cached.cache) >= len(stored)
+
+    read.clear()
+
+    assert bank.get_points(**ops) == expected
+    assert not read
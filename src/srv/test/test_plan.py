@@ -0,0 +1,173 @@
+import threading
+import time
+
+import pytest
+
+from app.data.file import local
+from app.data.file.plan import ScanError, ScanPlanner
+
+
+class Op:
+
+    def __init__(self, scan_key):
+        self.scan_key = scan_key
+
+
+class Bank:
+    """Stand-in data file bank whose reduction is given by `func`."""
+
+    flat = False
+
+    def __init__(self, func, scan_key='bank', data_version=None):
+        self.func = func
+        self.scan_key = scan_key
+        self.data_version = data_version
+        self.calls = 0
+
+    def reduce(self, ops, flats):
+        self.calls += 1
+        return self.func(ops)
+
+
+def results(ops):
+    return {query_key: op.scan_key for (query_key, op) in ops.items()}
+
+
+def test_matches_direct(monkeypatch, query, direct):
+    planner = ScanPlanner(delay=0.01, ttl=5)
+    monkeypatch.setattr(local.LocalDataFileBank, 'planner', planner)
+
+    assert query(column_store=None, rolling_windows=None) == direct
+
+    # reused
+    assert query(column_store=None, rolling_windows=None) == direct
+    assert planner.hits
+
+
+def test_lone_query_not_delayed():
+    planner = ScanPlanner(delay=5, ttl=0)
+    bank = Bank(results)
+
+    time0 = time.monotonic()
+
+    assert planner.reduce(bank, {'a': Op('a')}) == {'a': 'a'}
+    assert time.monotonic() - time0 < 1
+
+
+def test_reuse_and_invalidation():
+    planner = ScanPlanner(delay=0, ttl=60)
+    bank = Bank(results, data_version=1)
+
+    planner.reduce(bank, {'a': Op('a')})
+    planner.reduce(bank, {'a': Op('a')})
+
+    assert bank.calls == 1
+
+    # data files have changed
+    bank.data_version = 2
+    planner.reduce(bank, {'a': Op('a')})
+
+    assert bank.calls == 2
+
+
+def test_no_reuse_without_ttl():
+    planner = ScanPlanner(delay=0, ttl=0)
+    bank = Bank(results)
+
+    planner.reduce(bank, {'a': Op('a')})
+    planner.reduce(bank, {'a': Op('a')})
+
+    assert bank.calls == 2
+
+
+def test_shared_scan_error():
+    planner = ScanPlanner(delay=0.5, ttl=0)
+
+    # a query in progress, such that the next scan awaits others' queries
+    release = threading.Event()
+
+    def block(ops):
+        release.wait(5)
+        return results(ops)
+
+    other = threading.Thread(target=planner.reduce, args=(Bank(block, 'other'), {'o': Op('o')}))
+    other.start()
+
+    while not planner.active:
+        time.sleep(0.01)
+
+    failing = Bank(lambda ops: {}['missing'], 'failing')
+
+    errors = [None] * 3
+
+    def run(index):
+        try:
+            planner.reduce(failing, {f'q{index}': Op(f'q{index}')})
+        except Exception as exc:
+            errors[index] = exc
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(3)]
+
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+
+    for thread in threads:
+        thread.join()
+
+    release.set()
+    other.join()
+
+    # one reduction of all three queries
+    assert failing.calls == 1
+
+    leaders = [exc for exc in errors if isinstance(exc, KeyError)]
+    followers = [exc for exc in errors if isinstance(exc, ScanError)]
+
+    assert len(leaders) == 1
+    assert len(followers) == 2
+
+    # each follower raises its own exception, chained to the leader's
+    assert followers[0] is not followers[1]
+    assert all(exc.__cause__ is leaders[0] for exc in followers)
+
+
+def test_concurrent_queries_merged():
+    planner = ScanPlanner(delay=0.2, ttl=0)
+
+    def scan(ops):
+        time.sleep(0.1)
+        return results(ops)
+
+    bank = Bank(scan)
+
+    start = threading.Barrier(6)
+    points = [None] * 6
+
+    def run(index):
+        start.wait()
+        points[index] = planner.reduce(bank, {'a': Op(index)})
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(6)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert points == [{'a': index} for index in range(6)]
+    assert bank.calls < 6
+
+
+@pytest.mark.parametrize('delay', [0, 0.01])
+def test_query_keys(delay):
+    planner = ScanPlanner(delay=delay, ttl=5)
+    bank = Bank(results)
+
+    # equivalent aggregators (by scan key) are answered by one result
+    assert planner.reduce(bank, {'a': Op('x'), 'b': Op('x'), 'c': Op('y')}) == {
+        'a': 'x',
+        'b': 'x',
+        'c': 'y',
+    }
@@ -0,0 +1,128 @@
+import concurrent.futures
+import json
+
+import pytest
+
+from app.data.file import local
+from app.data.file.base import ONE_WEEK_S, Last, Multi, StdDev
+from app.data.file.column import ColumnStore
+from app.data.file.rolling import RollingWindows
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ColumnStore(tmp_path / 'column')
+
+
+@pytest.fixture
+def windows(store):
+    return RollingWindows(store)
+
+
+def ingest(data_dirs, store, windows):
+    bank = local.LocalDataFileBank(dirs=data_dirs, column_store=store, rolling_windows=windows)
+    return bank.ingest()
+
+
+def write(path, timestamp, value):
+    path.write_text(json.dumps({
+        'Measurements': {'ping_latency': {'google_rtt_avg_ms': value}},
+        'Meta': {'Time': timestamp},
+    }))
+
+
+def test_matches_direct(data_dirs, store, windows, query, direct):
+    ingest(data_dirs, store, windows)
+
+    # seeded
+    assert query(column_store=store, rolling_windows=windows) == direct
+    assert windows.windows
+
+    # maintained
+    assert query(column_store=store, rolling_windows=windows) == direct
+
+
+def test_reads_windows(monkeypatch, data_dirs, store, windows):
+    ingest(data_dirs, store, windows)
+
+    bank = local.LocalDataFileBank(dirs=data_dirs, column_store=store, rolling_windows=windows)
+
+    ops = dict(
+        last=Last('ookla.speedtest_ookla_download'),
+        sd=StdDev('ookla.speedtest_ookla_download', ONE_WEEK_S),
+        multi=Multi('ping_latency.google_rtt_avg_ms', 3600 * 5, decorate=('Time',)),
+    )
+
+    # seeded
+    expected = bank.get_points(**ops)
+
+    assert expected['multi']
+
+    # (thereafter, queries neither list data files nor read rows)
+    def fail(*_args, **_kwargs):
+        raise AssertionError('rows read')
+
+    monkeypatch.setattr(local.LocalDataFileBank, 'iter_paths', fail)
+    monkeypatch.setattr(ColumnStore, 'iter_rows', fail)
+    monkeypatch.setattr(ColumnStore, 'iter_blocks', fail)
+
+    assert bank.get_points(**ops) == expected
+
+
+def test_new_files(data_dirs, store, windows, query, direct):
+    ingest(data_dirs, store, windows)
+
+    assert query(column_store=store, rolling_windows=windows) == direct
+
+    (pending, _archive) = data_dirs
+
+    (name_last,) = sorted(path.name for path in pending.glob('*-ping.json'))[-1:]
+    timestamp = int(name_last.split('-')[1]) + 60
+
+    write(pending / f'result-{timestamp}-ping.json', timestamp, 42.0)
+
+    local.LocalDataFileBank.sorted_dir.cache.clear()
+
+    assert ingest(data_dirs, store, windows) == 1
+    assert windows.stop == store.stop
+
+    expected = query(column_store=None, rolling_windows=None)
+
+    assert expected != direct
+    assert query(column_store=store, rolling_windows=windows) == expected
+
+
+def test_late_file(data_dirs, store, windows, query):
+    ingest(data_dirs, store, windows)
+    query(column_store=store, rolling_windows=windows)
+
+    (pending, _archive) = data_dirs
+
+    # a data file arriving late discards the rows following it
+    (name,) = sorted(path.name for path in pending.glob('*-ping.json'))[-1:]
+    timestamp = int(name.split('-')[1]) - 1
+
+    write(pending / f'result-{timestamp}-ping.json', timestamp, 42.0)
+
+    local.LocalDataFileBank.sorted_dir.cache.clear()
+
+    ingest(data_dirs, store, windows)
+
+    # (windows are discarded, to be re-seeded)
+    assert not windows.windows
+
+    expected = query(column_store=None, rolling_windows=None)
+
+    assert query(column_store=store, rolling_windows=windows) == expected
+
+
+def test_concurrent_seeding(data_dirs, store, windows, query, direct):
+    ingest(data_dirs, store, windows)
+
+    with concurrent.futures.ThreadPoolExecutor(4) as executor:
+        futures = [executor.submit(query, column_store=store, rolling_windows=windows)
+                   for _count in range(8)]
+
+        results = [future.result() for future in futures]
+
+    assert all(result == direct for result in results)
@@ -0,0 +1,454 @@
+import datetime
+import itertools
+import json
+import threading
+import time
+
+import pytest
+
+from app import conf
+from app.data.file.base import get_name_time
+from app.data.file.s3 import listing
+from app.data.file.s3.caching import S3IndexCacheFile
+from app.data.file.s3.index import DeviceKeyIndex
+from app.data.file.s3.listing import S3Lister
+from app.lib.cache import FileSystemCache, MemoryCache
+
+
+moto = pytest.importorskip('moto')
+
+
+BUCKET = 'netrics'
+
+DEVICE = 'd1'
+
+
+@pytest.fixture
+def client():
+    import boto3
+
+    with moto.mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+
+        for device in ('d1', 'd2', 'd3'):
+            for date in ('20240130', '20240131'):
+                for index in range(5):
+                    client.put_object(Bucket=BUCKET,
+                                      Key=f'topic/{device}/{date}/result-{index}.json',
+                                      Body=b'{}')
+
+        client.put_object(Bucket=BUCKET, Key='topic/README', Body=b'')
+
+        yield client
+
+
+def test_list_dirs(client):
+    lister = listing.S3Lister(client)
+
+    assert lister.list_dirs(BUCKET) == ['topic']
+    assert lister.list_dirs(BUCKET, 'topic/') == ['d1', 'd2', 'd3']
+    assert lister.list_dirs(BUCKET, 'topic/d2/') == ['20240130', '20240131']
+
+    assert lister.list_dirs(BUCKET, 'topic/', start_after='topic/d1/~') == ['d2', 'd3']
+
+    assert lister.list_dirs(BUCKET, 'missing/') == []
+
+
+def test_list_keys(client):
+    lister = listing.S3Lister(client)
+
+    keys = lister.list_keys(BUCKET, 'topic/d1/20240131/')
+
+    assert keys == [f'/{BUCKET}/topic/d1/20240131/result-{index}.json' for index in range(5)]
+    assert all(isinstance(key, listing.S3ObjectKey) for key in keys)
+
+    assert keys[0].name == 'result-0.json'
+    assert str(keys[0].path) == keys[0]
+
+    # (objects directly under the prefix only)
+    assert lister.list_keys(BUCKET, 'topic/') == [f'/{BUCKET}/topic/README']
+
+
+def test_pagination(monkeypatch, client):
+    monkeypatch.setattr(listing, 'PAGE_SIZE', 2)
+
+    lister = listing.S3Lister(client)
+
+    assert lister.list_dirs(BUCKET, 'topic/') == ['d1', 'd2', 'd3']
+    assert len(lister.list_keys(BUCKET, 'topic/d3/20240130/')) == 5
+
+    assert lister.requests == 2 + 3
+
+
+def test_cache(client):
+    lister = listing.S3Lister(client, MemoryCache())
+
+    dirs = lister.list_dirs(BUCKET, 'topic/', cache=True)
+    keys = lister.list_keys(BUCKET, 'topic/d1/20240130/', cache=True)
+
+    assert lister.requests == 2
+
+    assert lister.list_dirs(BUCKET, 'topic/', cache=True) == dirs
+    assert lister.list_keys(BUCKET, 'topic/d1/20240130/', cache=True) == keys
+
+    assert lister.requests == 2
+
+    # listings after a key, or not requested of the cache, are listed anew
+    lister.list_dirs(BUCKET, 'topic/', start_after='topic/d1/~', cache=True)
+    lister.list_dirs(BUCKET, 'topic/')
+
+    assert lister.requests == 4
+
+
+@pytest.fixture
+def index_cache(tmp_path):
+    DeviceKeyIndex.clear()
+
+    yield S3IndexCacheFile(tmp_path / 'index')
+
+    DeviceKeyIndex.clear()
+
+
+def test_index(index_cache):
+    dirs = ['/netrics/topic/d1', '/netrics/other/d1']
+
+    index = DeviceKeyIndex.get(index_cache, 'd1', dirs)
+
+    assert index.listed_through is None
+    assert index.dates == {}
+
+    index.record_listing('20240131', ['20240130', '20240131'])
+    index.record_date('20240130', ['/netrics/topic/d1/20240130/result-0.json'])
+    index.record_date('20240131', [])
+
+    assert DeviceKeyIndex.get(index_cache, 'd1', reversed(dirs)) is index
+
+    # (as reloaded)
+    DeviceKeyIndex.clear()
+
+    index = DeviceKeyIndex.get(index_cache, 'd1', dirs)
+
+    assert index.listed_through == '20240131'
+    assert index.listed == {'20240130', '20240131'}
+    assert index.dates == {
+        '20240130': ['/netrics/topic/d1/20240130/result-0.json'],
+        '20240131': [],
+    }
+
+
+def test_index_partial_date(index_cache):
+    index = DeviceKeyIndex.get(index_cache, 'd1', ['/netrics/topic/d1'])
+    index.record_date('20240130', ['a'])
+
+    # keys not followed by their date's line
+    index_cache.append('d1', ['b'])
+
+    DeviceKeyIndex.clear()
+
+    assert DeviceKeyIndex.get(index_cache, 'd1', ['/netrics/topic/d1']).dates == {
+        '20240130': ['a'],
+    }
+
+
+def test_index_dirs_changed(index_cache):
+    index = DeviceKeyIndex.get(index_cache, 'd1', ['/netrics/topic/d1'])
+    index.record_date('20240130', ['a'])
+
+    index = DeviceKeyIndex.get(index_cache, 'd1', ['/netrics/topic/d1', '/netrics/other/d1'])
+
+    assert index.dates == {}
+    assert index_cache.get('d1') == [index.header]
+
+
+def test_index_rewrite(index_cache):
+    index = DeviceKeyIndex.get(index_cache, 'd1', ['/netrics/topic/d1'])
+
+    for date in ('20240129', '20240130', '20240131'):
+        index.record_listing(date, [date])
+
+    index.record_date('20240131', ['a'])
+
+    for _count in range(10):
+        index.record_date('20240131', ['a'])
+
+    DeviceKeyIndex.clear()
+
+    index = DeviceKeyIndex.get(index_cache, 'd1', ['/netrics/topic/d1'])
+
+    # superseded lines are dropped
+    assert index_cache.get('d1') == [
+        index.header,
+        '/listing 20240131 20240131',
+        'a',
+        '/date 20240131',
+    ]
+    assert index.dates == {'20240131': ['a']}
+
+
+def test_index_listing_new_dates(index_cache):
+    index = DeviceKeyIndex.get(index_cache, 'd1', ['/netrics/topic/d1'])
+
+    index.record_listing('20240130', ['20240129', '20240130'])
+    index.record_listing('20240131', ['20240129', '20240130', '20240131'])
+    index.record_listing('20240201', ['20240129', '20240130', '20240131'])
+
+    # only dates newly listed are written
+    assert index_cache.get('d1') == [
+        index.header,
+        '/listing 20240130 20240129 20240130',
+        '/listing 20240131 20240131',
+        '/listing 20240201',
+    ]
+
+    DeviceKeyIndex.clear()
+
+    index = DeviceKeyIndex.get(index_cache, 'd1', ['/netrics/topic/d1'])
+
+    assert index.listed_through == '20240201'
+    assert index.listed == {'20240129', '20240130', '20240131'}
+
+    # (dates omitted are rewritten)
+    index.record_listing('20240202', ['20240131'])
+
+    assert index_cache.get('d1') == [index.header, '/listing 20240202 20240131']
+
+
+def test_index_rewrite_size(index_cache):
+    index = DeviceKeyIndex.get(index_cache, 'd1', ['/netrics/topic/d1'])
+
+    keys = [f'/netrics/topic/d1/20240131/json/result-{count}.json' for count in range(100)]
+    index.record_date('20240131', keys)
+
+    # many (short) listing lines do not outweigh the index's keys
+    for count in range(200):
+        index.record_listing(f'2024{count:04}', [])
+
+    DeviceKeyIndex.clear()
+
+    lines = index_cache.get('d1')
+
+    DeviceKeyIndex.get(index_cache, 'd1', ['/netrics/topic/d1'])
+
+    assert index_cache.get('d1') == lines
+
+    # (whereas superseded keys do)
+    index.record_date('20240131', keys)
+    index.record_date('20240131', keys)
+
+    DeviceKeyIndex.clear()
+
+    index = DeviceKeyIndex.get(index_cache, 'd1', ['/netrics/topic/d1'])
+
+    assert len(index_cache.get('d1')) == 2 + len(keys) + 1
+
+
+def test_index_stored_dirs(index_cache):
+    assert DeviceKeyIndex.get(index_cache, 'd1') is None
+
+    index = DeviceKeyIndex.get(index_cache, 'd1', ['/netrics/topic/d1'])
+
+    DeviceKeyIndex.clear()
+
+    # (device directories as recorded)
+    assert DeviceKeyIndex.get(index_cache, 'd1').dirs == index.dirs
+
+
+def days_ago(days):
+    return f'{datetime.date.today() - datetime.timedelta(days):%Y%m%d}'
+
+
+def days_ago_timestamp(days):
+    return int(datetime.datetime.strptime(days_ago(days), '%Y%m%d').timestamp())
+
+
+@pytest.fixture
+def s3_bank(monkeypatch, tmp_path, index_cache):
+    """S3 data file bank module, configured to list a mock bucket of the
+    data files of device `DEVICE` over the past week (and more).
+
+    """
+    import boto3
+
+    from app.data.file.s3 import bank, caching
+
+    with moto.mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+
+        for (topic, days) in (('topic0', range(4, 8)), ('topic1', range(-1, 4))):
+            for day in days:
+                date = days_ago(day)
+                timestamp = days_ago_timestamp(day)
+
+                for index in range(3):
+                    client.put_object(
+                        Bucket=BUCKET,
+                        Key=f'exp/{topic}/host-{DEVICE}/{date}/json/'
+                            f'result-{timestamp + index}-ping.json',
+                        Body=json.dumps({
+                            'Measurements': {'ping_latency': {'google_rtt_avg_ms': day}},
+                            'Meta': {'Time': timestamp + index},
+                        }).encode(),
+                    )
+
+        monkeypatch.setattr(conf, 'DATAFILE_S3_BUCKET', BUCKET)
+
+        # (the bank's clients, constructed upon import, are not mocked)
+        monkeypatch.setattr(bank, 'S3_LISTER', S3Lister(client, caching.S3_LIST_CACHE))
+        monkeypatch.setattr(bank, 'S3_INDEX_CACHE', index_cache)
+        monkeypatch.setattr(caching.CachingS3Path, '_get_cache_', FileSystemCache(tmp_path / 'get'))
+
+        caching.S3_LIST_CACHE.clear()
+
+        yield bank
+
+        caching.S3_LIST_CACHE.clear()
+
+
+def test_bank_device_dirs(monkeypatch, s3_bank):
+    paths = list(s3_bank.S3DataFileBank(device_id=DEVICE).iter_paths())
+
+    assert len(paths) == 3 * 9
+    assert paths == sorted(paths, key=lambda path: path.name, reverse=True)
+
+    # device directories are recorded to the index (rather than searched upon each request)
+    DeviceKeyIndex.clear()
+
+    def fail(_self):
+        raise AssertionError('device directories searched')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(s3_bank.S3DataFileBank, '_search_device_dirs_', fail)
+
+        assert list(s3_bank.S3DataFileBank(device_id=DEVICE).iter_paths()) == paths
+
+    # (but are searched upon the next update of the index's listing)
+    bank = s3_bank.S3DataFileBank(device_id=DEVICE)
+
+    DeviceKeyIndex.get(s3_bank.S3_INDEX_CACHE, bank.index_key).listed_through = days_ago(3)
+
+    search = s3_bank.S3DataFileBank._search_device_dirs_
+    searched = []
+
+    def spy(self):
+        searched.append(self)
+        return search(self)
+
+    monkeypatch.setattr(s3_bank.S3DataFileBank, '_search_device_dirs_', spy)
+
+    assert list(bank.iter_paths()) == paths
+    assert searched == [bank]
+
+
+def test_bank_since(monkeypatch, s3_bank):
+    bank_cls = s3_bank.S3DataFileBank
+
+    since = days_ago_timestamp(2)
+
+    list_date = bank_cls._list_date_
+    listed = []
+
+    def spy(self, date_prefixes):
+        listed.append(date_prefixes[0][-9:-1])
+        return list_date(self, date_prefixes)
+
+    monkeypatch.setattr(bank_cls, '_list_date_', spy)
+
+    paths = list(bank_cls(device_id=DEVICE).iter_paths(since=since))
+
+    # paths are generated only until the window's edge
+    assert len(paths) == 3 * 4
+    assert all(get_name_time(path.name) >= since for path in paths)
+
+    # (and earlier date directories are not listed)
+    assert min(listed) == days_ago(3)
+
+
+def test_bank_lazy(monkeypatch, s3_bank):
+    bank_cls = s3_bank.S3DataFileBank
+
+    list_date = bank_cls._list_date_
+    listed = []
+
+    def spy(self, date_prefixes):
+        listed.append(date_prefixes[0][-9:-1])
+        return list_date(self, date_prefixes)
+
+    monkeypatch.setattr(bank_cls, '_list_date_', spy)
+
+    # date directories are listed only once reached
+    paths = bank_cls(device_id=DEVICE).iter_paths()
+
+    timestamp = days_ago_timestamp(-1)
+
+    assert [path.name for path in itertools.islice(paths, 3)] == [
+        f'result-{timestamp + index}-ping.json' for index in (2, 1, 0)
+    ]
+    assert listed == [days_ago(-1)]
+
+    paths.close()
+
+    # (and those closed, only until indexed)
+    listed.clear()
+
+    assert len(list(bank_cls(device_id=DEVICE).iter_paths())) == 3 * 9
+    assert listed == [days_ago(day) for day in range(-1, 8)]
+
+    listed.clear()
+
+    assert len(list(bank_cls(device_id=DEVICE).iter_paths())) == 3 * 9
+    assert listed == [days_ago(day) for day in range(-1, 2)]
+
+
+@pytest.mark.parametrize('since', [None, 0])
+def test_bank_read_ahead(monkeypatch, s3_bank, since):
+    monkeypatch.setattr(s3_bank, 'READ_AHEAD_MIN', 2)
+
+    bank_cls = s3_bank.S3DataFileBank
+
+    iter_paths = bank_cls.iter_paths
+    drawn = []
+
+    def spy_paths(self, keys=(), since=None):
+        for path in iter_paths(self, keys, since):
+            drawn.append(path)
+            yield path
+
+    gate = threading.Event()
+    started = []
+
+    def get_datablob(_self, path, _keys=()):
+        started.append(path)
+
+        # (all but the first request are held in flight)
+        if len(started) > 1:
+            gate.wait(5)
+
+        return {'path': path}
+
+    monkeypatch.setattr(bank_cls, 'iter_paths', spy_paths)
+    monkeypatch.setattr(bank_cls, 'get_datablob', get_datablob)
+
+    datablobs = bank_cls(device_id=DEVICE).iter_datablobs(since=since, max_workers=4)
+
+    try:
+        assert next(datablobs) == {'path': drawn[0]}
+
+        # data files are read ahead within a window: small, unless data since some time are
+        # consumed (up to 1.5 times the get workers)
+        assert len(drawn) == (4 if since is None else 7)
+
+        # should the consumer stop early, outstanding requests are abandoned (not awaited)
+        start = time.monotonic()
+        datablobs.close()
+
+        assert time.monotonic() - start < 1
+    finally:
+        gate.set()
+
+    # (those pending a worker are cancelled)
+    time.sleep(0.1)
+
+    if since is not None:
+        assert len(started) <= 1 + 4 < len(drawn)
@@ -0,0 +1,86 @@
+import math
+
+import pytest
+
+from app.data.file.base import ONE_WEEK_S
+from app.data.file.sample import lttb
+
+from conftest import FlatBank
+
+
+def test_small_series():
+    assert lttb([1, 2, 3], [[5, 6, 7]], 3) == [0, 1, 2]
+    assert lttb([1, 2, 3], [[5, 6, 7]], 10) == [0, 1, 2]
+
+    assert lttb([1, 2, 3], [[5, 6, 7]], 2) == [0, 2]
+    assert lttb([1, 2, 3], [[5, 6, 7]], 0) == []
+
+
+def test_selection():
+    xs = list(range(1000))
+    values = [math.sin(x / 50) for x in xs]
+    values[333] = 100
+
+    selected = lttb(xs, [values], 50)
+
+    assert len(selected) == 50
+    assert selected == sorted(set(selected))
+
+    # first and last points, and the peak, are retained
+    assert selected[0] == 0
+    assert selected[-1] == 999
+    assert 333 in selected
+
+
+def test_missing_values():
+    xs = list(range(100))
+    values = [None if x % 3 == 0 else x % 10 for x in xs]
+
+    selected = lttb(xs, [values, [None] * 100], 10)
+
+    assert len(selected) == 10
+    assert (selected[0], selected[-1]) == (0, 99)
+
+    # x-values which are not numeric are replaced by indices
+    assert lttb([None] * 100, [values], 10) == selected
+
+
+def test_series_share_selection():
+    xs = list(range(300))
+    low = [0] * 300
+    high = [0] * 300
+    low[100] = -1
+    high[200] = 1000
+
+    # (each series is normalized by its range, such that neither dominates)
+    selected = lttb(xs, [low, high], 5)
+
+    assert 100 in selected
+    assert 200 in selected
+
+
+@pytest.mark.parametrize('decorate', [None, 'Time', ['Id', 'Time']])
+def test_get_columns(data_dirs, decorate):
+    bank = FlatBank(dirs=data_dirs, column_store=None, rolling_windows=None)
+
+    columns = bank.get_columns('ping_latency.google_rtt_avg_ms', ONE_WEEK_S, decorate=decorate)
+    sampled = bank.get_columns('ping_latency.google_rtt_avg_ms',
+                               ONE_WEEK_S,
+                               decorate=decorate,
+                               max_points=40)
+
+    if decorate is None:
+        (columns, sampled) = ((columns,), (sampled,))
+
+    assert len(columns[0]) > 40
+    assert len(sampled[0]) == 40
+
+    # each point selected is a point of the full columns
+    points = list(zip(*columns))
+    assert all(point in points for point in zip(*sampled))
+
+    # (no downsampling where already within max_points)
+    assert bank.get_columns('ping_latency.google_rtt_avg_ms',
+                            ONE_WEEK_S,
+                            max_points=10_000) == bank.get_columns('ping_latency.google_rtt_avg_ms',
+                                                                   ONE_WEEK_S)
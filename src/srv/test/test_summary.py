@@ -0,0 +1,157 @@
+import math
+import random
+import statistics
+
+import pytest
+
+from app.data.file import local
+from app.data.file.base import (
+    Count,
+    Max,
+    Mean,
+    Min,
+    Multi,
+    ONE_WEEK_S,
+    Percentile,
+    StdDev,
+)
+from app.data.file.summary import (
+    MeanSummary,
+    QuantileSketch,
+    StdDevSummary,
+    VarianceSummary,
+)
+
+
+KEY = 'ping_latency.google_rtt_avg_ms'
+
+
+def summarize(summary, values):
+    for value in values:
+        summary.add(value)
+
+    return summary
+
+
+def test_variance():
+    values = [random.Random(1).gauss(10, 3) for _count in range(1000)]
+
+    assert summarize(VarianceSummary(), values).result() == pytest.approx(
+        statistics.variance(values)
+    )
+    assert summarize(StdDevSummary(), values).result() == pytest.approx(statistics.stdev(values))
+
+    assert VarianceSummary().result() is None
+    assert summarize(VarianceSummary(), [1.0]).result() is None
+
+
+@pytest.mark.parametrize('summary_type', [MeanSummary, VarianceSummary, QuantileSketch])
+def test_merge(summary_type):
+    rand = random.Random(2)
+    values = [rand.uniform(-100, 100) for _count in range(999)]
+
+    whole = summarize(summary_type(), values)
+
+    merged = summary_type()
+    for start in range(0, len(values), 100):
+        merged.merge(summarize(summary_type(), values[start:start + 100]))
+
+    assert merged.result() == pytest.approx(whole.result())
+
+
+@pytest.mark.parametrize('quantile', [0, 0.01, 0.25, 0.5, 0.9, 0.99, 1])
+def test_quantile_accuracy(quantile):
+    rand = random.Random(3)
+    values = sorted([rand.lognormvariate(0, 2) for _count in range(5000)] +
+                    [-rand.lognormvariate(0, 1) for _count in range(500)] +
+                    [0.0] * 50)
+
+    sketch = summarize(QuantileSketch(relative_accuracy=0.01), values)
+
+    exact = values[math.floor(quantile * (len(values) - 1))]
+
+    assert sketch.quantile(quantile) == pytest.approx(exact, rel=0.01, abs=1e-12)
+
+
+def test_quantile_bounded():
+    sketch = summarize(QuantileSketch(max_buckets=64),
+                       (10 ** (exponent / 100) for exponent in range(-1000, 1000)))
+
+    assert len(sketch.positive) <= 64
+
+    # (the accuracy of the largest values is retained)
+    assert sketch.quantile(1) == pytest.approx(10 ** 9.99, rel=0.01)
+
+
+def test_quantile_invalid():
+    with pytest.raises(ValueError):
+        QuantileSketch(1.5)
+
+    with pytest.raises(ValueError):
+        QuantileSketch().merge(QuantileSketch(relative_accuracy=0.05))
+
+    assert QuantileSketch().result() is None
+
+
+def test_quantile_not_finite():
+    sketch = summarize(QuantileSketch(), [1.0, math.inf, -math.inf, math.nan, 2.0, 3.0])
+
+    assert sketch.count == 3
+    assert sketch.zero == 0
+    assert sketch.quantile(0) == pytest.approx(1.0, rel=0.01)
+    assert sketch.result() == pytest.approx(2.0, rel=0.01)
+    assert sketch.quantile(1) == pytest.approx(3.0, rel=0.01)
+
+
+@pytest.mark.parametrize('op_type', [Count, Mean, StdDev])
+def test_iter_numeric_finite(op_type):
+    op = op_type(('a', 'b', 'c', 'd', 'e'), ONE_WEEK_S)
+
+    assert list(op.iter_numeric([1, math.inf, None, math.nan, -math.inf])) == [1]
+    assert list(op_type('a', ONE_WEEK_S).iter_numeric(math.nan)) == []
+
+
+@pytest.mark.parametrize('batch', [True, False])
+def test_aggregators_match_values(data_dirs, batch):
+    bank = local.LocalDataFileBank(dirs=data_dirs,
+                                   column_store=None,
+                                   rolling_windows=None,
+                                   batch=batch)
+
+    # values of the window as collected by Multi
+    values = [value for value in bank.get_points(multi=Multi(KEY, ONE_WEEK_S))['multi']
+              if value is not None]
+
+    points = bank.get_points(
+        count=Count(KEY, ONE_WEEK_S),
+        mean=Mean(KEY, ONE_WEEK_S),
+        low=Min(KEY, ONE_WEEK_S),
+        high=Max(KEY, ONE_WEEK_S),
+        sd=StdDev(KEY, ONE_WEEK_S),
+        median=Percentile(KEY, ONE_WEEK_S, 50),
+    )
+
+    assert points['count'] == len(values)
+    assert points['mean'] == pytest.approx(statistics.fmean(values))
+    assert points['low'] == min(values)
+    assert points['high'] == max(values)
+    assert points['sd'] == pytest.approx(statistics.stdev(values))
+
+    median = sorted(values)[(len(values) - 1) // 2]
+    assert points['median'] == pytest.approx(median, rel=0.01)
+
+
+def test_stddev_signature(data_dirs):
+    bank = local.LocalDataFileBank(dirs=data_dirs, column_store=None, rolling_windows=None)
+
+    keys = ('ping_latency.google_rtt_avg_ms', 'ping_latency.amazon_rtt_avg_ms')
+
+    values = [value
+              for point in bank.get_points(multi=Multi(keys, ONE_WEEK_S))['multi']
+              for value in point
+              if value is not None]
+
+    # (as accepted when StdDev collected its values as a Multi)
+    sd = bank.get_points(sd=StdDev(keys, ONE_WEEK_S, reverse=True))['sd']
+
+    assert sd == pytest.approx(statistics.stdev(values))
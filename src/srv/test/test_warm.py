@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from app import conf
+from app.data.file import bundle, local, warm
+from app.data.file.base import Last, project
+from app.data.file.column import extract_row
+
+
+SPEC = (frozenset(('ping_latency.google_rtt_avg_ms',)), 'Measurements', 'Meta')
+
+ROW_SPEC = ('Measurements', 'Meta')
+
+
+def make_items(data_dirs, row_spec=None):
+    return [(path, [SPEC], row_spec)
+            for path_dir in data_dirs
+            for path in sorted(path_dir.glob('*-ping.json'))]
+
+
+def test_project_file(data_dirs):
+    (pending, _archive) = data_dirs
+
+    (path,) = sorted(pending.glob('*-ping.json'))[-1:]
+
+    (signature, encoded, row, error) = warm.project_file(path, [SPEC], ROW_SPEC)
+
+    full_data = json.loads(path.read_text())
+
+    assert signature == bundle.get_signature(path)
+    assert [json.loads(projection) for projection in encoded] == [project(full_data, *SPEC)]
+    assert row == extract_row(full_data, *ROW_SPEC)
+    assert error is None
+
+    # (of undecodable files, the error)
+    (path_bad,) = pending.glob('*-bad.json')
+
+    (_signature, encoded, row, error) = warm.project_file(path_bad, [SPEC])
+
+    assert encoded is row is None
+    assert isinstance(error, ValueError)
+
+    # (and of unreadable files, nothing)
+    assert warm.project_file(pending / 'missing.json', [SPEC]) is None
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_iter_projections(data_dirs, processes):
+    items = make_items(data_dirs, ROW_SPEC)
+
+    results = warm.iter_projections(items, processes=processes, chunk_size=16, min_items=0)
+
+    # (in no particular order)
+    results = sorted(results, key=lambda result: result[0])
+
+    assert results == sorted(
+        ((path, *warm.project_file(path, specs, row_spec)) for (path, specs, row_spec) in items),
+        key=lambda result: result[0],
+    )
+
+
+def test_min_items(monkeypatch, data_dirs):
+    def fail(*_args):
+        raise AssertionError('pool started')
+
+    monkeypatch.setattr(warm, 'iter_pool', fail)
+
+    items = make_items(data_dirs)
+
+    # few files are parsed in process
+    assert len(list(warm.iter_projections(items, processes=4, min_items=len(items) + 1))) == (
+        len(items)
+    )
+
+
+def test_populate(monkeypatch, data_dirs):
+    monkeypatch.setattr(conf, 'DATAFILE_WARM_PROCESSES', 2)
+
+    bank_cls = local.LocalDataFileBank
+    bank = bank_cls(dirs=data_dirs, column_store=None, rolling_windows=None)
+
+    op = Last('ping_latency.google_rtt_avg_ms')
+
+    expected = bank.get_points(op)
+
+    bank_cls.get_projection_cached.cache.clear()
+
+    # caches are populated by worker processes
+    items = []
+    iter_projections = warm.iter_projections
+
+    def spy(items_, **kwargs):
+        items.extend(items_)
+        return iter_projections(items_, **kwargs, min_items=0)
+
+    monkeypatch.setattr(warm, 'iter_projections', spy)
+
+    bank_cls.populate_caches(dirs=data_dirs)
+
+    assert items
+    assert len(bank_cls.get_projection_cached.cache) >= len(items) - 1
+
+    def fail(_path):
+        raise AssertionError('data file read')
+
+    monkeypatch.setattr(bundle, 'load_json', fail)
+
+    assert bank.get_points(op) == expected
@@ -0,0 +1,123 @@
+import re
+import threading
+import time
+
+import pytest
+
+from app.data.file import watch
+from app.data.file.watch import DirectoryIndex, DirectoryWatcher
+
+
+PING = re.compile(r'-ping\.json$')
+
+
+def touch(path_dir, *names):
+    for name in names:
+        (path_dir / name).write_text('{}')
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('condition not met')
+
+        time.sleep(0.01)
+
+
+def listed(index, *args):
+    return [path.name for path in index.nlargest(len(index), *args)]
+
+
+def test_index(tmp_path):
+    touch(tmp_path, 'result-2-ping.json', 'result-1-ookla.json', 'result-1-ping.json')
+
+    index = DirectoryIndex(tmp_path, [PING])
+    index.reset()
+
+    assert listed(index) == ['result-2-ping.json', 'result-1-ping.json', 'result-1-ookla.json']
+    assert listed(index, [PING]) == ['result-2-ping.json', 'result-1-ping.json']
+
+    index.add('result-3-ookla.json')
+    index.discard('result-2-ping.json')
+
+    assert listed(index) == ['result-3-ookla.json', 'result-1-ping.json', 'result-1-ookla.json']
+    assert listed(index, [PING]) == ['result-1-ping.json']
+
+    # (of the greatest entries only)
+    assert [path.name for path in index.nlargest(1, [PING])] == []
+
+
+def test_refresh(monkeypatch, tmp_path):
+    touch(tmp_path, *(f'result-{count:02}-ping.json' for count in range(10)))
+
+    index = DirectoryIndex(tmp_path, [PING])
+    index.reset()
+
+    touch(tmp_path, 'result-10-ookla.json', 'result-11-ping.json')
+    (tmp_path / 'result-00-ping.json').unlink()
+
+    # only the changes are applied (rather than the index rebuilt)
+    with monkeypatch.context() as patch:
+        patch.setattr(DirectoryIndex, '_set_names_', None)
+
+        assert index.refresh() is True
+        assert index.refresh() is False
+
+    assert listed(index) == sorted((path.name for path in tmp_path.iterdir()), reverse=True)
+    assert 'result-11-ping.json' in listed(index, [PING])
+    assert 'result-00-ping.json' not in listed(index, [PING])
+
+    # (many changes rebuild the index)
+    monkeypatch.setattr(watch, 'REFRESH_LIMIT', 1)
+
+    touch(tmp_path, 'result-12-ping.json', 'result-13-ping.json')
+
+    assert index.refresh() is True
+    assert listed(index)[:2] == ['result-13-ping.json', 'result-12-ping.json']
+
+
+@pytest.mark.parametrize('mode', ['inotify', 'poll'])
+def test_watcher(monkeypatch, tmp_path, mode):
+    if mode == 'poll':
+        def unavailable():
+            raise OSError('unavailable')
+
+        monkeypatch.setattr(watch, 'Inotify', unavailable)
+
+    path_dir = tmp_path / 'data'
+
+    changes = threading.Semaphore(0)
+
+    watcher = DirectoryWatcher([path_dir],
+                               interval=0.01,
+                               patterns=[PING],
+                               on_change=changes.release)
+
+    watcher.launch(threading.Event())
+
+    try:
+        # (directories are indexed once present)
+        path_dir.mkdir()
+        touch(path_dir, 'result-1-ping.json')
+
+        wait_for(lambda: watcher.get_index(path_dir) is not None)
+
+        assert watcher.mode == mode
+
+        index = watcher.get_index(path_dir)
+
+        touch(path_dir, 'result-2-ping.json', 'result-2-ookla.json')
+        wait_for(lambda: len(index) == 3)
+
+        (path_dir / 'result-1-ping.json').unlink()
+        wait_for(lambda: len(index) == 2)
+
+        assert listed(index, [PING]) == ['result-2-ping.json']
+
+        # changes are reported
+        assert changes.acquire(timeout=5)
+    finally:
+        watcher.stop_event.set()
+        watcher.join(5)